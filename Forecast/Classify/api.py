@@ -1,11 +1,24 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 import torch
 import tiktoken
 import os
-from classify import GPTModel, eval, id2label
+from classify import PAD_MODES, GPTModel, classify_many, eval_batch, id2label
+from batching import MicroBatcher, QueueFull
+from executor import InferenceExecutor, Overloaded
+from merchant_cache import MerchantCache
+from optimize import optimize_for_inference
 
-app = FastAPI()
+# Loads the model and label cache and runs the batcher (startup_event / shutdown_event below)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_event()
+    yield
+    await shutdown_event()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configuration
 BASE_CONFIG = {
@@ -18,6 +31,21 @@ BASE_CONFIG = {
     "qkv_bias": True
 }
 
+# Bulk classification
+BULK_MAX_TEXTS = int(os.getenv("CLASSIFY_BULK_MAX_TEXTS", "5000"))
+BULK_BATCH_SIZE = int(os.getenv("CLASSIFY_BULK_BATCH_SIZE", "64"))
+BULK_BUCKET_PADDING = os.getenv("CLASSIFY_BUCKET_PADDING", "0").lower() in ("1", "true", "yes")
+
+# fp32 | any of sdpa,int8,compile (see optimize.py); validate against fp32 before enabling
+INFERENCE_MODE = os.getenv("CLASSIFY_INFERENCE_MODE", "fp32")
+# right (as trained) | gather (pad to the longest text, read its last real token; validate first)
+PAD_MODE = os.getenv("CLASSIFY_PAD_MODE", "right").lower()
+if PAD_MODE not in PAD_MODES:
+    raise ValueError(f"CLASSIFY_PAD_MODE must be one of {PAD_MODES}, got {PAD_MODE!r}")
+
+# Labels keyed on normalised merchant text; set CLASSIFY_CACHE_PATH to keep them across restarts
+label_cache = MerchantCache(path=os.getenv("CLASSIFY_CACHE_PATH"), tag=f"{INFERENCE_MODE}/{PAD_MODE}/normalised")
+
 # Global model and tokenizer
 model = None
 tokenizer = None
@@ -40,13 +68,31 @@ def load_model():
     model.load_state_dict(model_state_dict)
     model.to(device)
     model.eval()
+    model = optimize_for_inference(model, INFERENCE_MODE, device)
     
     tokenizer = tiktoken.get_encoding("gpt2")
-    print("Model loaded successfully")
+    print(f"Model loaded successfully (mode={INFERENCE_MODE})")
+
+# Inference runs on worker threads; the event loop only queues and batches
+executor = InferenceExecutor()
+
+async def _infer(texts):
+    return await executor.run(eval_batch, texts, model, tokenizer, device, pad_mode=PAD_MODE)
+
+batcher = MicroBatcher(_infer, concurrency=executor.workers)
 
-@app.on_event("startup")
 async def startup_event():
     load_model()
+    label_cache.load()
+    batcher.start()
+
+async def shutdown_event():
+    await batcher.stop()
+    executor.shutdown()
+    label_cache.save()
+
+def _overloaded(e: Overloaded, status_code: int) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=f"Classifier busy: {e}", headers={"Retry-After": "1"})
 
 class ClassificationRequest(BaseModel):
     text: str
@@ -59,12 +105,76 @@ async def classify_text(request: ClassificationRequest):
     if model is None or tokenizer is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
     
+    # The model sees the normalised text, so every spelling that shares a cache entry gets the same label
+    key = label_cache.key(request.text)
+    category = label_cache.get(key)
+    if category is not None:
+        return ClassificationResponse(category=category)
     try:
-        category = eval(request.text, model, tokenizer, device)
+        category = await batcher.submit(key)
+        label_cache.put(key, category)
         return ClassificationResponse(category=category)
+    except QueueFull as e:
+        raise _overloaded(e, 429)
+    except Overloaded as e:
+        raise _overloaded(e, 503)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class TopCategory(BaseModel):
+    category: str
+    prob: float
+
+class BatchClassificationRequest(BaseModel):
+    texts: List[str]
+    top_k: int = Field(0, ge=0, le=len(id2label), description="Also return the k most likely categories")
+
+class BatchClassificationResult(BaseModel):
+    category: str
+    top_k: List[TopCategory] = []
+
+class BatchClassificationResponse(BaseModel):
+    results: List[BatchClassificationResult]
+
+@app.post("/classify/batch", response_model=BatchClassificationResponse)
+async def classify_batch(request: BatchClassificationRequest):
+    if model is None or tokenizer is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if len(request.texts) > BULK_MAX_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_TEXTS} texts per request")
+
+    # Cached labels only carry the category, so requests asking for top_k always run the model
+    keys = [label_cache.key(text) for text in request.texts]
+    out = [None] * len(request.texts)
+    if not request.top_k:
+        for i, key in enumerate(keys):
+            label = label_cache.get(key)
+            if label is not None:
+                out[i] = (label, [])
+    misses = [i for i, o in enumerate(out) if o is None]
+
+    if misses:
+        try:
+            computed = await executor.run(
+                classify_many, [keys[i] for i in misses], model, tokenizer, device,
+                batch_size=BULK_BATCH_SIZE, bucket_padding=BULK_BUCKET_PADDING, top_k=request.top_k, pad_mode=PAD_MODE,
+            )
+        except Overloaded as e:
+            raise _overloaded(e, 503)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        for i, result in zip(misses, computed):
+            out[i] = result
+            label_cache.put(keys[i], result[0])
+    return BatchClassificationResponse(results=[
+        BatchClassificationResult(category=label, top_k=[TopCategory(category=c, prob=p) for c, p in top])
+        for label, top in out
+    ])
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "model_loaded": model is not None}
+    return {"status": "ok", "model_loaded": model is not None, "inference_mode": INFERENCE_MODE, "pad_mode": PAD_MODE}
+
+@app.get("/metrics")
+async def metrics():
+    return {"batching": batcher.stats(), "executor": executor.stats(), "cache": label_cache.stats()}
@@ -0,0 +1,157 @@
+import asyncio
+import inspect
+import os
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+
+from executor import Overloaded
+
+# Configuration
+MAX_BATCH = int(os.getenv("CLASSIFY_MAX_BATCH", "16"))          # items per forward pass
+MAX_WAIT_MS = float(os.getenv("CLASSIFY_MAX_WAIT_MS", "5"))     # how long the first item waits for company
+MAX_QUEUE = int(os.getenv("CLASSIFY_MAX_QUEUE", "256"))         # queued texts before new ones are refused
+
+
+class QueueFull(Overloaded):
+    """The batcher's own queue is full (as opposed to the workers being busy)."""
+
+
+class MicroBatcher:
+    """
+    Collects concurrent classify calls into one batched forward pass.
+
+    The first queued text opens a batch; the batch is run as soon as it holds
+    `max_batch` texts or `max_wait_ms` has passed, whichever comes first.
+    Each caller awaits its own future and gets back its own label.
+
+    `infer` may be a plain function or a coroutine function (e.g. one that
+    hands the batch to an InferenceExecutor). Up to `concurrency` batches run
+    at once; a new batch only starts collecting when one of those slots is
+    free, so texts that arrive meanwhile join a bigger batch. Once
+    `max_queue` texts are waiting, submit() raises QueueFull.
+    """
+
+    def __init__(self, infer: Callable[[List[str]], Union[List[str], Awaitable[List[str]]]],
+                 max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS,
+                 max_queue: int = MAX_QUEUE, concurrency: int = 1):
+        self.infer = infer
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_queue = max(1, int(max_queue))
+        self.concurrency = max(1, int(concurrency))
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatching: set = set()
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.last_batch_ms = 0.0
+        self.in_flight = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, text: str) -> str:
+        if self._task is None:
+            self.start()
+        if self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(f"{self._queue.qsize()} texts already queued")
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, fut))
+        return await fut
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            # Take whatever is already queued without waiting
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batch(self, texts: List[str]) -> List[str]:
+        result = self.infer(texts)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = [t for t, _ in batch]
+        self.in_flight += len(batch)
+        t0 = time.perf_counter()
+        try:
+            labels = await self._run_batch(texts)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            for (_, fut), label in zip(batch, labels):
+                if not fut.done():
+                    fut.set_result(label)
+        finally:
+            self.in_flight -= len(batch)
+            self.last_batch_ms = (time.perf_counter() - t0) * 1000.0
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self._slots.release()
+
+    async def _run(self) -> None:
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            # Callers that gave up (client disconnect) don't need a slot
+            batch = [(t, f) for t, f in batch if not f.done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._dispatching.add(task)
+            task.add_done_callback(self._dispatching.discard)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
@@ -20,6 +20,8 @@ class MultiHeadAttention(nn.Module):
         self.out_proj = nn.Linear(d_out, d_out)  # Linear layer to combine head outputs
         self.dropout = nn.Dropout(dropout)
         self.register_buffer('mask', torch.triu(torch.ones(context_length, context_length), diagonal=1))
+        # Inference-only switch: use the fused causal kernel instead of the explicit mask/softmax
+        self.use_sdpa = False
 
     def forward(self, x):
         b, num_tokens, d_in = x.shape
@@ -39,6 +41,11 @@ class MultiHeadAttention(nn.Module):
         queries = queries.transpose(1, 2)
         values = values.transpose(1, 2)
 
+        if self.use_sdpa:
+            context_vec = nn.functional.scaled_dot_product_attention(queries, keys, values, is_causal=True)
+            context_vec = context_vec.transpose(1, 2).reshape(b, num_tokens, self.d_out)
+            return self.out_proj(context_vec)
+
         # Compute scaled dot-product attention (aka self-attention) with a causal mask
         attn_scores = queries @ keys.transpose(2, 3)  # Dot product for each head
 
@@ -60,6 +67,32 @@ class MultiHeadAttention(nn.Module):
 
         return context_vec
 
+    def forward_query(self, x, pos):
+        """
+        Attention output for one query position per row (pos: LongTensor of shape (b,)).
+        Keys/values still cover every token; the causal mask hides tokens after `pos`.
+        Returns shape (b, d_out).
+        """
+        b, num_tokens, d_in = x.shape
+        rows = torch.arange(b, device=x.device)
+
+        keys = self.W_key(x).view(b, num_tokens, self.num_heads, self.head_dim).transpose(1, 2)
+        values = self.W_value(x).view(b, num_tokens, self.num_heads, self.head_dim).transpose(1, 2)
+        queries = self.W_query(x[rows, pos]).view(b, 1, self.num_heads, self.head_dim).transpose(1, 2)
+
+        # (b, 1, 1, num_tokens): True where the key comes after the query position
+        future = (torch.arange(num_tokens, device=x.device)[None, :] > pos[:, None])[:, None, None, :]
+
+        if self.use_sdpa:
+            context_vec = nn.functional.scaled_dot_product_attention(queries, keys, values, attn_mask=~future)
+        else:
+            attn_scores = (queries @ keys.transpose(2, 3)).masked_fill(future, -torch.inf)
+            attn_weights = torch.softmax(attn_scores / keys.shape[-1]**0.5, dim=-1)
+            attn_weights = self.dropout(attn_weights)
+            context_vec = attn_weights @ values
+
+        return self.out_proj(context_vec.reshape(b, self.d_out))
+
 
 class LayerNorm(nn.Module):
     def __init__(self, emb_dim):
@@ -78,10 +111,12 @@ class LayerNorm(nn.Module):
 class GELU(nn.Module):
     def __init__(self):
         super().__init__()
+        # Computed once instead of on every call; not part of the checkpoint
+        self.register_buffer('sqrt_2_over_pi', torch.sqrt(torch.tensor(2.0 / torch.pi)), persistent=False)
 
     def forward(self, x):
         return 0.5 * x * (1 + torch.tanh(
-            torch.sqrt(torch.tensor(2.0 / torch.pi)) *
+            self.sqrt_2_over_pi *
             (x + 0.044715 * torch.pow(x, 3))
         ))
 
@@ -131,6 +166,21 @@ class TransformerBlock(nn.Module):
 
         return x
 
+    def forward_last(self, x, pos):
+        """Block output for position `pos` of each row only, shape (b, emb_size)."""
+        shortcut = x[torch.arange(x.shape[0], device=x.device), pos]
+        x = self.att.forward_query(self.norm1(x), pos)
+        x = self.drop_resid(x)
+        x = x + shortcut
+
+        shortcut = x
+        x = self.norm2(x)
+        x = self.ff(x)
+        x = self.drop_resid(x)
+        x = x + shortcut
+
+        return x
+
 
 class GPTModel(nn.Module):
     def __init__(self, cfg):
@@ -156,6 +206,27 @@ class GPTModel(nn.Module):
         logits = self.out_head(x)
         return logits
 
+    def forward_last(self, in_idx, pos=None):
+        """
+        Classification forward pass: logits for one position per row only.
+
+        `pos` (LongTensor (b,)) picks the position to classify from, default the
+        last one, which is what `eval` reads. Every block but the last runs as
+        usual; the last block computes keys/values for all tokens but the query,
+        feed-forward, final norm and head only for that position.
+        """
+        batch_size, seq_len = in_idx.shape
+        if pos is None:
+            pos = torch.full((batch_size,), seq_len - 1, dtype=torch.long, device=in_idx.device)
+        tok_embeds = self.tok_emb(in_idx)
+        pos_embeds = self.pos_emb(torch.arange(seq_len, device=in_idx.device))
+        x = tok_embeds + pos_embeds
+        x = self.drop_emb(x)
+        x = self.trf_blocks[:-1](x)
+        x = self.trf_blocks[-1].forward_last(x, pos)
+        x = self.final_norm(x)
+        return self.out_head(x)
+
 #category mapping
 id2label = {0: 'Education',
  1: 'Entertainment',
@@ -204,6 +275,105 @@ def eval(text, model, tokenizer, device, max_length=30, pad_token_id=50256):
     
     return id2label[predicted_label]
 
+# How sequences are padded and which position is classified:
+#   right  - pad after the text to max_length and read the last position (as `eval`; what the checkpoint was trained on)
+#   gather - pad only to the longest text in the batch and read each text's last real token;
+#            later pads are hidden by the causal mask. Changes the read-out position, so validate first.
+PAD_MODES = ("right", "gather")
+
+def _pad_batch(batch_ids, pad_len, pad_token_id):
+    return [ids + [pad_token_id] * (pad_len - len(ids)) for ids in batch_ids]
+
+def _batch_logits(model, batch_ids, max_length, pad_token_id, device, pad_mode="right", pad_len=None, last_only=True):
+    """Logits (b, num_classes) for already truncated token id lists."""
+    if pad_mode == "gather":
+        batch_ids = [ids or [pad_token_id] for ids in batch_ids]
+        pad_len = max(len(ids) for ids in batch_ids)
+        pos = torch.tensor([len(ids) - 1 for ids in batch_ids], device=device)
+    elif pad_mode == "right":
+        pad_len = pad_len or max_length
+        pos = None
+    else:
+        raise ValueError(f"Unknown pad_mode {pad_mode!r}; expected one of {PAD_MODES}")
+    input_tensor = torch.tensor(_pad_batch(batch_ids, pad_len, pad_token_id), device=device)
+    if last_only and hasattr(model, "forward_last"):
+        return model.forward_last(input_tensor, pos)
+    logits = model(input_tensor)
+    if pos is None:
+        return logits[:, -1, :]
+    return logits[torch.arange(len(batch_ids), device=device), pos]
+
+def eval_batch(texts, model, tokenizer, device, max_length=30, pad_token_id=50256, pad_mode="right", last_only=True):
+    """
+    Same as `eval` for a list of texts, run as a single forward pass.
+    `last_only=False` computes logits for every position like `eval` (reference path).
+    """
+    model.eval()
+    if not texts:
+        return []
+
+    supported_context_length = model.pos_emb.weight.shape[0]
+    assert max_length <= supported_context_length, (
+        f"max_length ({max_length}) exceeds model's supported context length ({supported_context_length})."
+    )
+
+    # Truncate and pad every text exactly like `eval` so labels match one-by-one calls
+    batch = [ids[:max_length] for ids in tokenizer.encode_batch(list(texts))]
+    with torch.no_grad():
+        logits = _batch_logits(model, batch, max_length, pad_token_id, device, pad_mode, last_only=last_only)
+    return [id2label[i] for i in torch.argmax(logits, dim=-1).tolist()]
+
+def classify_many(texts, model, tokenizer, device, max_length=30, pad_token_id=50256,
+                  batch_size=64, bucket_padding=False, top_k=0, pad_mode="right"):
+    """
+    Classify a large list of texts (e.g. a statement import).
+
+    Texts are tokenized in bulk and duplicates are classified once. By default
+    every sequence is padded to `max_length`, as in `eval`. With
+    `bucket_padding`, texts are sorted by token length and each chunk is
+    padded only to its own longest text (still capped at `max_length`). That
+    moves the position of the last token the head reads, so enable it only
+    after checking the labels against the default mode for your checkpoint.
+    With pad_mode="gather" chunks are padded to their longest text anyway and
+    bucketing just keeps that padding small.
+
+    Returns a list of (label, [(label, prob), ...top_k]) in input order.
+    """
+    model.eval()
+    texts = list(texts)
+    if not texts:
+        return []
+
+    supported_context_length = model.pos_emb.weight.shape[0]
+    assert max_length <= supported_context_length, (
+        f"max_length ({max_length}) exceeds model's supported context length ({supported_context_length})."
+    )
+
+    unique = list(dict.fromkeys(texts))
+    encoded = [ids[:max_length] for ids in tokenizer.encode_batch(unique)]
+    order = sorted(range(len(unique)), key=lambda i: len(encoded[i])) if bucket_padding else list(range(len(unique)))
+
+    k = max(0, min(int(top_k), len(id2label)))
+    results = [None] * len(unique)
+    with torch.no_grad():
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            batch_ids = [encoded[i] for i in chunk]
+            pad_len = max(1, max(len(ids) for ids in batch_ids)) if bucket_padding else max_length
+            logits = _batch_logits(model, batch_ids, max_length, pad_token_id, device, pad_mode, pad_len)
+            labels = torch.argmax(logits, dim=-1).tolist()
+            if k:
+                probs, idx = torch.softmax(logits, dim=-1).topk(k, dim=-1)
+                tops = [[(id2label[j], round(p, 4)) for j, p in zip(ji, pi)]
+                        for ji, pi in zip(idx.tolist(), probs.tolist())]
+            else:
+                tops = [[] for _ in chunk]
+            for i, label, top in zip(chunk, labels, tops):
+                results[i] = (id2label[label], top)
+
+    pos = {t: i for i, t in enumerate(unique)}
+    return [results[pos[t]] for t in texts]
+
 if __name__ == "__main__":
 
     CHOOSE_MODEL = "gpt2-small (124M)"
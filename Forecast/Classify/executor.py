@@ -0,0 +1,68 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+# Configuration
+WORKERS = int(os.getenv("CLASSIFY_WORKERS", "1"))                 # concurrent forward passes
+TORCH_THREADS = int(os.getenv("CLASSIFY_TORCH_THREADS", "0"))     # intra-op threads per worker, 0 = torch default
+MAX_PENDING = int(os.getenv("CLASSIFY_MAX_PENDING", "8"))         # jobs queued or running before we refuse more
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing more work than the service can absorb."""
+
+
+class InferenceExecutor:
+    """
+    Runs model calls on a bounded worker thread pool so the event loop stays
+    free for other requests (and /health) while a forward pass is running.
+    PyTorch releases the GIL inside its kernels, so worker threads run in
+    parallel and share one copy of the weights.
+    """
+
+    def __init__(self, workers: int = WORKERS, torch_threads: int = TORCH_THREADS,
+                 max_pending: int = MAX_PENDING):
+        self.workers = max(1, int(workers))
+        self.torch_threads = int(torch_threads)
+        self.max_pending = max(1, int(max_pending))
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="classify",
+            initializer=self._init_worker,
+        )
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _init_worker(self) -> None:
+        if self.torch_threads > 0:
+            torch.set_num_threads(self.torch_threads)
+
+    async def run(self, fn, *args, **kwargs):
+        # Only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(f"{self.pending} inference jobs already pending")
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "torch_threads": self.torch_threads or torch.get_num_threads(),
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
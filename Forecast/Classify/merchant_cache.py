@@ -0,0 +1,156 @@
+# merchant_cache.py (LRU/TTL cache of results keyed on normalised merchant text)
+#
+# Card statement descriptors repeat with small variations:
+#   "KAUFLAND 1234 CHISINAU", "Kaufland #0871 Chisinau 12/03/2024", "KAUFLAND CHISINAU *4821"
+# all normalise to "KAUFLAND CHISINAU", so one classification answers them all.
+# Values must be computed from the normalised key, not from whichever spelling
+# arrived first, or the cached answer would depend on arrival order.
+#
+# Used by Classify/api.py (model labels) and ml_api.py (/analyze categories).
+# Pure Python on purpose: ml_api imports it without pulling in torch.
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+# Configuration
+MAX_SIZE = int(os.getenv("MERCHANT_CACHE_SIZE", "50000"))       # entries per cache
+TTL = float(os.getenv("MERCHANT_CACHE_TTL", "86400"))           # seconds an entry stays valid, 0 = forever
+
+_DATE = re.compile(r"\b\d{1,4}[./-]\d{1,2}(?:[./-]\d{1,4})?\b")            # 12/03/2024, 2024-03-12, 12.03
+_TIME = re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b")
+_CARD = re.compile(r"(?:\*+|X{2,}|\bCARD\s*)\d{2,}\b|\b(?:CARD|CARDUL)\b")  # *4821, XXXX4821, CARD 4821
+_NUMBER = re.compile(r"[#№]?\b\d+\b")                                       # store / terminal numbers
+_NOISE = re.compile(r"[^\w&]+")
+
+
+def normalise_merchant(text: Optional[str]) -> str:
+    """Upper-case `text` and drop dates, times, card suffixes, store numbers and punctuation."""
+    if not text:
+        return ""
+    s = text.upper()
+    s = _DATE.sub(" ", s)
+    s = _TIME.sub(" ", s)
+    s = _CARD.sub(" ", s)
+    s = _NUMBER.sub(" ", s)
+    s = _NOISE.sub(" ", s)
+    return " ".join(s.split())
+
+
+def _key(text: Optional[str]) -> str:
+    # Descriptors that are nothing but numbers keep their own key
+    return normalise_merchant(text) or (text or "").strip().upper()
+
+
+class MerchantCache:
+    """
+    Bounded LRU cache with a per-entry TTL, keyed on `normalise_merchant(text)`.
+
+    Thread-safe. With `path` set, load() restores entries saved by save(), so
+    the cache survives restarts; `tag` identifies what produced the values
+    (e.g. model and inference mode) and a file saved under another tag is ignored.
+    """
+
+    def __init__(self, max_size: int = MAX_SIZE, ttl: float = TTL,
+                 path: Optional[str] = None, tag: str = ""):
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl)
+        self.path = path or None
+        self.tag = tag
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(text: Optional[str]) -> str:
+        """The normalised text `text` is cached under; compute values from this, not from `text`."""
+        return _key(text)
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def get(self, text: Optional[str]) -> Optional[Any]:
+        key = _key(text)
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, text: Optional[str], value: Any) -> None:
+        key = _key(text)
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, text: Optional[str], compute: Callable[[str], Any]) -> Any:
+        """Cached value for `text`, else `compute(key(text))`, stored."""
+        key = _key(text)
+        value = self.get(key)
+        if value is None:
+            value = compute(key)
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def save(self) -> None:
+        """Write the live entries to `path` (atomically); no-op without a path."""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[k, v, t] for k, (v, t) in self._data.items() if not self._expired(t, now)]
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"tag": self.tag, "entries": entries}, f)
+        os.replace(tmp, self.path)
+
+    def load(self) -> int:
+        """Restore entries from `path`; returns how many were loaded."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring merchant cache file {self.path}: {e}")
+            return 0
+        if saved.get("tag") != self.tag:
+            return 0
+        now = time.time()
+        with self._lock:
+            for key, value, stored_at in saved.get("entries", [])[-self.max_size:]:
+                if not self._expired(stored_at, now):
+                    self._data[key] = (value, stored_at)
+            return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "persisted": bool(self.path),
+        }
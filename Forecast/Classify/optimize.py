@@ -0,0 +1,125 @@
+# optimize.py (opt-in faster CPU inference for the category classifier)
+#
+# Modes (comma-separated, e.g. "sdpa,int8"):
+#   fp32     - the model as trained (default, no changes)
+#   sdpa     - fused scaled_dot_product_attention instead of the explicit mask + softmax
+#   int8     - dynamic int8 quantization of every nn.Linear (CPU only)
+#   compile  - torch.compile the model (needs a working C++ toolchain for inductor)
+#
+# Check a mode against fp32 labels on held-out texts before enabling it:
+#   python optimize.py --mode sdpa,int8 --texts heldout.txt
+#
+# The reference always runs the full forward pass with right padding to 30
+# tokens (exactly as `eval`); --pad-mode gather checks that padding mode too.
+
+import argparse
+import os
+import sys
+import time
+from typing import List, Tuple
+
+import torch
+import torch.nn as nn
+
+from classify import PAD_MODES, GPTModel, MultiHeadAttention, eval_batch
+
+MODES = ("fp32", "sdpa", "int8", "compile")
+
+
+def parse_mode(mode: str) -> List[str]:
+    parts = [p.strip().lower() for p in (mode or "fp32").split(",") if p.strip()]
+    unknown = [p for p in parts if p not in MODES]
+    if unknown:
+        raise ValueError(f"Unknown inference mode(s) {unknown}; expected any of {MODES}")
+    return [p for p in parts if p != "fp32"]
+
+
+def optimize_for_inference(model: GPTModel, mode: str, device: str = "cpu") -> nn.Module:
+    """Return `model` prepared for inference in `mode` (the input model may be modified)."""
+    model.eval()
+    parts = parse_mode(mode)
+    if "sdpa" in parts:
+        for m in model.modules():
+            if isinstance(m, MultiHeadAttention):
+                m.use_sdpa = True
+    if "int8" in parts:
+        if device != "cpu":
+            print(f"Warning: int8 dynamic quantization is CPU-only; skipping on {device}")
+        else:
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    if "compile" in parts:
+        # Compile the methods on the module itself: a torch.compile wrapper module would
+        # pass `forward_last` (the serving path) through to the eager method
+        try:
+            model.forward_last = torch.compile(model.forward_last, dynamic=True)
+            model.forward = torch.compile(model.forward, dynamic=True)
+        except Exception as e:
+            print(f"Warning: torch.compile unavailable ({e}); running eagerly")
+    return model
+
+
+def compare_labels(reference: nn.Module, candidate: nn.Module, texts: List[str], tokenizer, device: str,
+                   batch_size: int = 64, pad_mode: str = "right") -> Tuple[float, List[Tuple[str, str, str]]]:
+    """
+    Fraction of texts where `candidate` (last-token path, `pad_mode`) agrees with
+    `reference` (full forward pass, right padding), plus the disagreements.
+    """
+    diffs = []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        ref = eval_batch(chunk, reference, tokenizer, device, last_only=False)
+        got = eval_batch(chunk, candidate, tokenizer, device, pad_mode=pad_mode)
+        diffs.extend((t, r, g) for t, r, g in zip(chunk, ref, got) if r != g)
+    agreement = 1.0 - len(diffs) / len(texts) if texts else 1.0
+    return agreement, diffs
+
+
+def _time_per_text(model: nn.Module, texts: List[str], tokenizer, device: str, batch_size: int, **kwargs) -> float:
+    eval_batch(texts[:batch_size], model, tokenizer, device, **kwargs)  # warm-up (and compile)
+    t0 = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        eval_batch(texts[start:start + batch_size], model, tokenizer, device, **kwargs)
+    return (time.perf_counter() - t0) / max(1, len(texts))
+
+
+def _read_texts(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    import tiktoken
+    from api import BASE_CONFIG
+
+    parser = argparse.ArgumentParser(description="Check an optimized inference mode against fp32 labels.")
+    parser.add_argument("--mode", required=True, help=f"comma-separated, any of {MODES}")
+    parser.add_argument("--texts", required=True, help="held-out texts, one per line")
+    parser.add_argument("--weights", default=os.path.join(os.path.dirname(__file__), "category_classifier.pth"))
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--pad-mode", default="right", choices=PAD_MODES)
+    args = parser.parse_args()
+
+    device = "cpu"
+    tokenizer = tiktoken.get_encoding("gpt2")
+    state = torch.load(args.weights, map_location=device, weights_only=True)
+
+    def _load() -> GPTModel:
+        m = GPTModel(BASE_CONFIG)
+        m.out_head = nn.Linear(in_features=BASE_CONFIG["emb_dim"], out_features=16)
+        m.load_state_dict(state)
+        return m.eval()
+
+    texts = _read_texts(args.texts)
+    reference = _load()
+    candidate = optimize_for_inference(_load(), args.mode, device)
+
+    label = f"{args.mode}/{args.pad_mode}"
+    agreement, diffs = compare_labels(reference, candidate, texts, tokenizer, device, args.batch_size, args.pad_mode)
+    ref_t = _time_per_text(reference, texts, tokenizer, device, args.batch_size, last_only=False)
+    cand_t = _time_per_text(candidate, texts, tokenizer, device, args.batch_size, pad_mode=args.pad_mode)
+
+    print(f"texts: {len(texts)}  agreement with fp32: {agreement:.2%}")
+    print(f"fp32: {ref_t * 1000:.2f} ms/text  {label}: {cand_t * 1000:.2f} ms/text  speedup: {ref_t / cand_t:.2f}x")
+    for t, r, g in diffs[:20]:
+        print(f"  {t!r}: fp32={r} {label}={g}")
+    sys.exit(0 if agreement >= 0.99 else 1)
@@ -1,8 +1,12 @@
-
 # current_budget_series_model.py (series-only, Holt trend, robust matching for string-stored ints)
+import logging
+import os
+import threading
+import time
+import zlib
 import pandas as pd
 import numpy as np
-from typing import List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 UUID_1 = "698841bd-189c-4407-b582-9d5fa2689336"
 UUID_2 = "5c8251ce-1fe3-4225-97e8-33ec05f85927"
@@ -30,13 +34,356 @@ def load_series(series_path: str) -> pd.DataFrame:
         raise ValueError(f"Series file missing columns: {missing}")
     return df
 
-def _resolve_user_key(user_index: Union[str, int], series_df: pd.DataFrame) -> str:
-    """Return the key to filter on series_df['user_id'] after casting to str."""
-    unique_str = set(series_df['user_id'].astype(str).dropna().unique().tolist())
+# ----------------------------
+# Per-user index
+# ----------------------------
+
+_NAT = np.iinfo(np.int64).min
+
+def normalise_user_ids(user_ids: pd.Series) -> np.ndarray:
+    """Cast user_id values to the string keys used for lookups ("884.0" -> "884"); NULL stays missing."""
+    keys = user_ids.astype(str).str.strip()
+    keys = keys.str.replace(r"^(\d+)\.0+$", r"\1", regex=True)
+    # astype(str) spells NULL "None"/"nan" on pandas 2 and keeps it missing on 3
+    return keys.where(user_ids.notna(), None).to_numpy(dtype=object)
+
+class SeriesIndex:
+    """
+    The series sorted by (user_id, date, tx_id) with one contiguous slice per user.
+    `series(key)` returns a view of that user's current_budget values, so the cost
+    of a lookup depends on the user's history length, not on the table size.
+    """
+
+    def __init__(self, keys: np.ndarray, offsets: np.ndarray, values: np.ndarray,
+                 dates: np.ndarray, tx_ids: np.ndarray):
+        self.keys = keys
+        self.offsets = offsets
+        self.values = values
+        self.dates = dates      # int64 ns since epoch, NaT sorted last
+        self.tx_ids = tx_ids
+        self._pos = {k: i for i, k in enumerate(keys.tolist())}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "SeriesIndex":
+        codes, keys = pd.factorize(normalise_user_ids(df['user_id']), sort=True)
+        dates = pd.to_datetime(df['date']).to_numpy(dtype="datetime64[ns]").view(np.int64)
+        date_key = np.where(dates == _NAT, np.iinfo(np.int64).max, dates)
+        tx_ids = df['tx_id'].to_numpy()
+        if np.issubdtype(tx_ids.dtype, np.number):
+            tx_key = tx_ids  # NaN sorts last
+        else:
+            tx_codes, tx_uniques = pd.factorize(tx_ids, sort=True)
+            tx_key = np.where(tx_codes < 0, len(tx_uniques), tx_codes)  # NULL last, like sort_values
+        order = np.lexsort((tx_key, date_key, codes))
+        # Rows without a user_id (code -1, sorted first) belong to nobody: leave them out
+        order = order[codes[order] >= 0]
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes[codes >= 0], minlength=len(keys)), out=offsets[1:])
+        values = np.ascontiguousarray(df['current_budget'].to_numpy(dtype=float)[order])
+        return cls(np.asarray(keys, dtype=object), offsets, values, dates[order], tx_ids[order])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._pos
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.offsets[-1])
+
+    def position(self, key: str) -> Optional[int]:
+        """Row of `key` in keys/offsets (and in arrays aligned with them), or None."""
+        return self._pos.get(key)
+
+    def series(self, key: str) -> np.ndarray:
+        i = self._pos[key]
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def to_frame(self) -> pd.DataFrame:
+        """Rebuild a DataFrame with the load_series columns, in index order."""
+        return pd.DataFrame({
+            'user_id': np.repeat(np.asarray(self.keys, dtype=object), np.diff(self.offsets)),
+            'tx_id': np.asarray(self.tx_ids),
+            'date': pd.to_datetime(np.asarray(self.dates).view("datetime64[ns]")),
+            'current_budget': np.asarray(self.values),
+        })
+
+# ----------------------------
+# Per-user spending profile
+# ----------------------------
+
+PROFILE_WINDOW = int(os.getenv("PROFILE_WINDOW", "90"))            # most recent budget changes per user
+PROFILE_MIN_POINTS = int(os.getenv("PROFILE_MIN_POINTS", "10"))    # expenses needed before a profile is used
+
+class SpendingProfiles:
+    """
+    Each user's typical expense, from the drops in their current_budget over
+    their last `window` changes: count, mean and std as float arrays aligned
+    with the SeriesIndex keys, so a lookup is one dict probe and three reads.
+    Built with a few vectorized passes over the whole index (see `from_index`).
+    """
+
+    def __init__(self, index: SeriesIndex, count: np.ndarray, mean: np.ndarray, std: np.ndarray,
+                 window: int, min_points: int):
+        self.index = index
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.window = window
+        self.min_points = min_points
+
+    @classmethod
+    def from_index(cls, index: SeriesIndex, window: Optional[int] = None,
+                   min_points: Optional[int] = None) -> "SpendingProfiles":
+        window = PROFILE_WINDOW if window is None else int(window)
+        min_points = PROFILE_MIN_POINTS if min_points is None else int(min_points)
+        n_users = len(index)
+        values = np.asarray(index.values, dtype=float)
+        offsets = np.asarray(index.offsets)
+
+        # Row r (r > 0 within its user) carries the change values[r] - values[r-1]
+        codes = np.repeat(np.arange(n_users), np.diff(offsets))
+        delta = np.empty_like(values)
+        delta[0:1] = np.nan
+        np.subtract(values[1:], values[:-1], out=delta[1:])
+        delta[offsets[:-1][np.diff(offsets) > 0]] = np.nan  # first row of each user
+        from_end = offsets[codes + 1] - 1 - np.arange(len(values))
+        use = (from_end < window) & (delta < 0)  # NaN compares False
+
+        spend = -delta[use]
+        c = codes[use]
+        count = np.bincount(c, minlength=n_users).astype(float)
+        total = np.bincount(c, weights=spend, minlength=n_users)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            var = np.bincount(c, weights=(spend - mean[c])**2, minlength=n_users) / count
+        return cls(index, count, mean, np.sqrt(var), window, min_points)
+
+    def lookup(self, key: str) -> Optional[Tuple[float, float, int]]:
+        """(mean, std, count) of the user's recent expenses, or None without enough history."""
+        i = self.index.position(key)
+        if i is None or self.count[i] < self.min_points:
+            return None
+        return float(self.mean[i]), float(self.std[i]), int(self.count[i])
+
+# ----------------------------
+# Process-wide series store
+# ----------------------------
+
+SERIES_CACHE_TTL = float(os.getenv("SERIES_CACHE_TTL", "300"))  # seconds, 0 = no TTL
+# Supabase refreshes only pull rows at/after the newest date already held; a
+# full re-pull (to pick up edits and deletes) happens this often.
+SERIES_FULL_RELOAD = float(os.getenv("SERIES_FULL_RELOAD", "86400"))
+# After a failed load, callers get the last good data (or SeriesUnavailable) until
+# this many seconds have passed, instead of every request retrying the load
+SERIES_RETRY_SECONDS = float(os.getenv("SERIES_RETRY_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+
+class SeriesUnavailable(RuntimeError):
+    """The series has never loaded successfully and the next retry is not due yet."""
+
+def _append_new_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Supabase rows with date >= the newest date in `df`, merged into `df`."""
+    from supabase_client import fetch_series_from_supabase
+    watermark = df['date'].max()
+    new = fetch_series_from_supabase(since=watermark.isoformat())
+    if new.empty:
+        return df
+    new['date'] = pd.to_datetime(new['date'])
+    merged = pd.concat([df, new], ignore_index=True)
+    return merged.drop_duplicates(subset=['user_id', 'tx_id'], keep='last').reset_index(drop=True)
+
+class _Snapshot:
+    __slots__ = ("df", "index", "mtime", "loaded_at", "full_loaded_at", "profiles")
+
+    def __init__(self, df: Optional[pd.DataFrame], index: SeriesIndex, mtime: Optional[float], loaded_at: float,
+                 full_loaded_at: Optional[float] = None):
+        self.df = df
+        self.index = index
+        self.mtime = mtime
+        self.loaded_at = loaded_at
+        self.full_loaded_at = loaded_at if full_loaded_at is None else full_loaded_at
+        self.profiles: Optional[SpendingProfiles] = None
+
+class SeriesStore:
+    """
+    Keeps one parsed copy of the series in memory and reloads it when the CSV
+    mtime changes or the TTL expires. A reload builds a new snapshot and swaps
+    the reference in one assignment, so readers never see a half-loaded frame.
+    While a reload is running, other readers keep getting the previous snapshot.
+    """
+
+    def __init__(self, series_path: str, ttl: Optional[float] = None):
+        self.series_path = series_path
+        self.ttl = SERIES_CACHE_TTL if ttl is None else float(ttl)
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+        self.last_load_ms = 0.0
+        self.last_error: Optional[str] = None
+        self.retry_seconds = SERIES_RETRY_SECONDS
+        self._failed_at: Optional[float] = None   # last failed load of the current failure streak
+        self.holt_cache = HoltStateCache()
+
+    def _mtime(self) -> Optional[float]:
+        if self.series_path == "SUPABASE":
+            return None
+        path = self.series_path
+        if os.path.isdir(path):
+            path = os.path.join(path, "manifest.json")  # columnar snapshot
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _is_stale(self, snap: _Snapshot) -> bool:
+        if self.ttl > 0 and time.time() - snap.loaded_at >= self.ttl:
+            return True
+        return snap.mtime is not None and self._mtime() != snap.mtime
+
+    def _load(self) -> _Snapshot:
+        t0 = time.perf_counter()
+        mtime = self._mtime()
+        prev = self._snapshot
+        full_loaded_at = None
+        if os.path.isdir(self.series_path):
+            from series_snapshot import read_snapshot
+            index = read_snapshot(self.series_path)
+            self.last_load_ms = (time.perf_counter() - t0) * 1000.0
+            self.loads += 1
+            self.last_error = None
+            return _Snapshot(None, index, mtime, time.time())
+        if (self.series_path == "SUPABASE" and prev is not None and not prev.df.empty
+                and pd.notna(prev.df['date'].max())
+                and time.time() - prev.full_loaded_at < SERIES_FULL_RELOAD):
+            df = _append_new_rows(prev.df)
+            full_loaded_at = prev.full_loaded_at
+        else:
+            df = load_series(self.series_path)
+        index = SeriesIndex.from_frame(df)
+        self.last_load_ms = (time.perf_counter() - t0) * 1000.0
+        self.loads += 1
+        self.last_error = None
+        return _Snapshot(df, index, mtime, time.time(), full_loaded_at)
+
+    def _retry_in(self) -> float:
+        """Seconds until a failed load may be retried (0 when not backing off)."""
+        if self._failed_at is None:
+            return 0.0
+        return max(0.0, self._failed_at + self.retry_seconds - time.time())
+
+    def _current(self) -> _Snapshot:
+        snap = self._snapshot
+        if snap is not None and (not self._is_stale(snap) or self._retry_in() > 0):
+            self.hits += 1
+            return snap
+        if snap is None and self._retry_in() > 0:
+            raise SeriesUnavailable(f"series not loaded ({self.last_error}); "
+                                    f"next retry in {self._retry_in():.0f}s")
+        if snap is not None:
+            # Someone else is already reloading: serve the current data meanwhile
+            if not self._lock.acquire(blocking=False):
+                self.hits += 1
+                return snap
+        else:
+            self._lock.acquire()
+        try:
+            snap = self._snapshot
+            if snap is None or self._is_stale(snap):
+                if snap is None and self._retry_in() > 0:
+                    raise SeriesUnavailable(f"series not loaded ({self.last_error}); "
+                                            f"next retry in {self._retry_in():.0f}s")
+                try:
+                    snap = self._load()
+                except Exception as e:
+                    self.last_error = str(e)
+                    if self._failed_at is None:
+                        logger.warning("Could not load series from %s: %s (retrying every %gs)",
+                                       self.series_path, e, self.retry_seconds)
+                    self._failed_at = time.time()
+                    if self._snapshot is None:
+                        raise
+                    snap = self._snapshot  # keep serving the last good data
+                else:
+                    if self._failed_at is not None:
+                        logger.info("Series from %s loaded again", self.series_path)
+                    self._failed_at = None
+                self._snapshot = snap
+            return snap
+        finally:
+            self._lock.release()
+
+    def get(self) -> pd.DataFrame:
+        snap = self._current()
+        if snap.df is None:
+            snap.df = snap.index.to_frame()  # snapshots are loaded as arrays only
+        return snap.df
+
+    def index(self) -> SeriesIndex:
+        return self._current().index
+
+    def profiles(self) -> SpendingProfiles:
+        """Spending profiles of the current snapshot, built on first use after each reload."""
+        snap = self._current()
+        if snap.profiles is None:
+            snap.profiles = SpendingProfiles.from_index(snap.index)
+        return snap.profiles
+
+    def invalidate(self) -> None:
+        """Force a full reload on the next get()."""
+        self._snapshot = None
+        self._failed_at = None
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        out = {
+            "series_path": self.series_path,
+            "ttl_s": self.ttl,
+            "loaded": snap is not None,
+            "loads": self.loads,
+            "hits": self.hits,
+            "last_load_ms": round(self.last_load_ms, 2),
+            "last_error": self.last_error,
+            "retry_in_s": round(self._retry_in(), 1),
+        }
+        if snap is not None:
+            out.update(
+                rows=snap.index.n_rows,
+                users=len(snap.index),
+                loaded_at=snap.loaded_at,
+                age_s=round(time.time() - snap.loaded_at, 3),
+                mtime=snap.mtime,
+            )
+        out["holt_cache"] = self.holt_cache.stats()
+        return out
+
+_STORES: Dict[str, SeriesStore] = {}
+_STORES_LOCK = threading.Lock()
+
+def get_series_store(series_path: str) -> SeriesStore:
+    """Return the shared SeriesStore for `series_path`, creating it on first use."""
+    store = _STORES.get(series_path)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.setdefault(series_path, SeriesStore(series_path))
+    return store
+
+SeriesSource = Union[pd.DataFrame, SeriesIndex]
+
+def _as_index(series: SeriesSource) -> SeriesIndex:
+    return series if isinstance(series, SeriesIndex) else SeriesIndex.from_frame(series)
+
+def _resolve_user_key(user_index: Union[str, int], series: SeriesSource) -> str:
+    """Return the normalised user_id key for `user_index` in the series index."""
+    index = _as_index(series)
     if isinstance(user_index, str):
         if user_index not in (UUID_1, UUID_2):
             raise ValueError(f"Unknown string index: {user_index!r}. Expected {UUID_1} or {UUID_2}.")
-        if user_index not in unique_str:
+        if user_index not in index:
             raise ValueError(f"String index {user_index!r} not found in series user_id values.")
         return user_index
     elif isinstance(user_index, (int, np.integer)):
@@ -44,9 +391,9 @@ def _resolve_user_key(user_index: Union[str, int], series_df: pd.DataFrame) -> s
         if uid < 3:
             raise ValueError("Numeric user_index must be >= 3 (first two are strings)." )
         key = str(uid)
-        if key not in unique_str:
+        if key not in index:
             # Build a small sample of available integer-like ids
-            ints_avail = sorted([int(v) for v in unique_str if v.isdigit()])
+            ints_avail = sorted([int(v) for v in index.keys if v.isdigit()])
             raise ValueError(f"user_id {uid} not present in series. Sample ints present: {ints_avail[:10]}")
         return key
     else:
@@ -67,41 +414,269 @@ def _holt_one_step(y: np.ndarray, alpha: float, beta: float) -> Tuple[np.ndarray
         l, b = new_l, new_b
     return fitted, l, b
 
-def _holt_cv_select(y: np.ndarray, grid_alpha=None, grid_beta=None, val_frac: float=0.2) -> Tuple[float,float]:
-    if grid_alpha is None: grid_alpha = [0.1, 0.2, 0.3, 0.5, 0.7, 0.9]
-    if grid_beta  is None: grid_beta  = [0.1, 0.2, 0.3, 0.5, 0.7, 0.9]
+HOLT_GRID = [0.1, 0.2, 0.3, 0.5, 0.7, 0.9]
+
+def _holt_grid_mse(y: np.ndarray, grid_alpha, grid_beta, split: int) -> np.ndarray:
+    """
+    Validation MSE of every (alpha, beta) pair, alpha-major, in one pass over y.
+    Level/trend are carried as arrays with one slot per candidate and all
+    candidates are advanced together at each time step, using the same
+    arithmetic as _holt_one_step so the errors match the scalar loop exactly.
+    `y` may also be a (n_series, T) stack of equal-length series, in which case
+    the result has shape (n_series, n_alpha*n_beta).
+    """
+    a = np.repeat(np.asarray(grid_alpha, dtype=float), len(grid_beta))
+    b = np.tile(np.asarray(grid_beta, dtype=float), len(grid_alpha))
+    one_a, one_b = 1 - a, 1 - b
+    Y = np.atleast_2d(y)
+    l = np.repeat(Y[:, :1], len(a), axis=1)
+    t = np.repeat(Y[:, 1:2] - Y[:, :1], len(a), axis=1)
+    preds = np.empty((Y.shape[0], len(a), Y.shape[1] - split))
+    for i in range(Y.shape[1]):
+        yt = Y[:, i, None]
+        if i >= split:
+            preds[:, :, i - split] = l + t
+        new_l = a*yt + one_a*(l + t)
+        t = b*(new_l - l) + one_b*t
+        l = new_l
+    mse = ((preds - Y[:, None, split:])**2).mean(axis=-1)
+    return mse if np.ndim(y) == 2 else mse[0]
+
+def _holt_final_state(Y: np.ndarray, alpha: np.ndarray, beta: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """_holt_one_step's final (level, trend) for a (n_series, T) stack, one (alpha, beta) per series."""
+    l = Y[:, 0].copy()
+    t = (Y[:, 1] - Y[:, 0]) if Y.shape[1] >= 2 else np.zeros(len(Y))
+    for i in range(Y.shape[1]):
+        new_l = alpha*Y[:, i] + (1-alpha)*(l + t)
+        t = beta*(new_l - l) + (1-beta)*t
+        l = new_l
+    return l, t
+
+def _select_from_mse(mse: np.ndarray, grid_alpha, grid_beta) -> Tuple[float, float, Optional[float]]:
+    mse = np.where(np.isnan(mse), np.inf, mse)
+    best = int(np.argmin(mse))  # first minimum, same tie-break as the nested loops
+    if not mse[best] < np.inf:
+        return 0.5, 0.3, None
+    return float(grid_alpha[best // len(grid_beta)]), float(grid_beta[best % len(grid_beta)]), float(mse[best])
+
+def _holt_cv_search(y: np.ndarray, grid_alpha=None, grid_beta=None, val_frac: float=0.2) -> Tuple[float, float, Optional[float]]:
+    """(alpha, beta, validation MSE of that pair); MSE is None when the defaults were used."""
+    if grid_alpha is None: grid_alpha = HOLT_GRID
+    if grid_beta  is None: grid_beta  = HOLT_GRID
     T = len(y)
     if T < 4:  # tiny series
-        return 0.5, 0.3
+        return 0.5, 0.3, None
     split = max(2, int(T*(1.0 - val_frac)))
-    y_train, y_val = y[:split], y[split:]
-    best = (float('inf'), 0.5, 0.3)
-    for a in grid_alpha:
-        for b in grid_beta:
-            _, lT, bT = _holt_one_step(y_train, a, b)
-            l, t = lT, bT
-            preds = []
-            for yt in y_val:
-                pred = l + t
-                new_l = a*yt + (1-a)*(l+t)
-                new_t = b*(new_l - l) + (1-b)*t
-                l, t = new_l, new_t
-                preds.append(pred)
-            se = ((np.array(preds) - y_val)**2).mean()
-            if se < best[0]:
-                best = (se, a, b)
-    return best[1], best[2]
-
-def predict_from_series_holt(user_index: Union[str,int], n: int, series_df: pd.DataFrame, min_points: int = 3) -> List[float]:
-    key = _resolve_user_key(user_index, series_df)
-    s = series_df[series_df['user_id'].astype(str) == key].sort_values(['date','tx_id'])
-    if s.empty:
+    mse = _holt_grid_mse(np.asarray(y, dtype=float), grid_alpha, grid_beta, split)
+    return _select_from_mse(mse, grid_alpha, grid_beta)
+
+def _holt_cv_select(y: np.ndarray, grid_alpha=None, grid_beta=None, val_frac: float=0.2) -> Tuple[float,float]:
+    a, b, _ = _holt_cv_search(y, grid_alpha, grid_beta, val_frac)
+    return a, b
+
+# ----------------------------
+# Fitted Holt state cache
+# ----------------------------
+
+HOLT_REFIT_SECONDS = float(os.getenv("HOLT_REFIT_SECONDS", "86400"))  # re-run grid selection at least this often
+HOLT_DRIFT_RATIO = float(os.getenv("HOLT_DRIFT_RATIO", "2.0"))        # ...or when new-row MSE exceeds this x validation MSE
+HOLT_DRIFT_MIN_POINTS = int(os.getenv("HOLT_DRIFT_MIN_POINTS", "5"))
+
+def _digest(y: np.ndarray, prev: int = 0) -> int:
+    """CRC-32 of the float values in `y`, continuing `prev` (the digest of the rows before them)."""
+    return zlib.crc32(np.ascontiguousarray(y, dtype=np.float64), prev)
+
+
+class HoltState:
+    """
+    Chosen (alpha, beta) for one user plus the (level, trend) after its first
+    n_obs rows; `digest` (CRC-32 of those rows) detects edits anywhere in them.
+    """
+    __slots__ = ("alpha", "beta", "level", "trend", "n_obs", "digest", "val_mse", "err_sum", "err_n", "fitted_at")
+
+    def __init__(self, alpha: float, beta: float, level: float, trend: float, n_obs: int, digest: int,
+                 val_mse: Optional[float], err_sum: float = 0.0, err_n: int = 0, fitted_at: Optional[float] = None):
+        self.alpha = alpha
+        self.beta = beta
+        self.level = level
+        self.trend = trend
+        self.n_obs = n_obs
+        self.digest = digest
+        self.val_mse = val_mse
+        self.err_sum = err_sum
+        self.err_n = err_n
+        self.fitted_at = time.time() if fitted_at is None else fitted_at
+
+class HoltStateCache:
+    """
+    Per-user Holt parameters and final states, so a forecast after a few new
+    transactions only advances the stored (level, trend) over the new rows.
+    Grid selection is re-run when the entry is older than `refit_seconds`, when
+    the one-step MSE on rows seen since the last selection exceeds
+    `drift_ratio` x the validation MSE, or when the stored history no longer
+    matches the series (rows removed, or any stored row rewritten).
+    """
+
+    def __init__(self, refit_seconds: Optional[float] = None, drift_ratio: Optional[float] = None,
+                 drift_min_points: Optional[int] = None):
+        self.refit_seconds = HOLT_REFIT_SECONDS if refit_seconds is None else float(refit_seconds)
+        self.drift_ratio = HOLT_DRIFT_RATIO if drift_ratio is None else float(drift_ratio)
+        self.drift_min_points = HOLT_DRIFT_MIN_POINTS if drift_min_points is None else int(drift_min_points)
+        self._states: Dict[str, HoltState] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.advanced_rows = 0
+        self.refits = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+    def advance(self, key: str, y: np.ndarray) -> Optional[Tuple[float, float]]:
+        """(level, trend) after all of y, or None if the user needs a fresh grid selection."""
+        st = self._states.get(key)
+        if st is None or st.n_obs > len(y) or _digest(y[:st.n_obs]) != st.digest:
+            return None
+        if st.val_mse is None and len(y) >= 4:
+            return None  # provisional defaults from a tiny series
+        if time.time() - st.fitted_at >= self.refit_seconds:
+            return None
+        if st.n_obs == len(y):
+            self.hits += 1
+            return st.level, st.trend
+
+        a, b = st.alpha, st.beta
+        l, t = st.level, st.trend
+        err_sum, err_n = st.err_sum, st.err_n
+        for yt in y[st.n_obs:]:
+            err_sum += (l + t - yt)**2
+            err_n += 1
+            new_l = a*yt + (1-a)*(l + t)
+            t = b*(new_l - l) + (1-b)*t
+            l = new_l
+        if (st.val_mse is not None and err_n >= self.drift_min_points
+                and err_sum / err_n > self.drift_ratio * st.val_mse):
+            return None
+        self.advanced_rows += len(y) - st.n_obs
+        self.hits += 1
+        with self._lock:
+            self._states[key] = HoltState(a, b, l, t, len(y), _digest(y[st.n_obs:], st.digest), st.val_mse,
+                                          err_sum, err_n, st.fitted_at)
+        return l, t
+
+    def store(self, key: str, alpha: float, beta: float, level: float, trend: float,
+              y: np.ndarray, val_mse: Optional[float]) -> None:
+        self.refits += 1
+        with self._lock:
+            self._states[key] = HoltState(alpha, beta, level, trend, len(y), _digest(y), val_mse)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._states),
+            "hits": self.hits,
+            "refits": self.refits,
+            "advanced_rows": self.advanced_rows,
+            "refit_seconds": self.refit_seconds,
+            "drift_ratio": self.drift_ratio,
+        }
+
+def predict_from_series_holt(user_index: Union[str,int], n: int, series_df: SeriesSource, min_points: int = 3,
+                             grid_alpha=None, grid_beta=None, cache: Optional[HoltStateCache] = None) -> List[float]:
+    """
+    `series_df` may be the raw frame or a prebuilt SeriesIndex (much faster per call).
+    `grid_alpha`/`grid_beta` override the default Holt search grid.
+    With `cache`, the user's fitted state is reused and only advanced over new rows;
+    the cache holds default-grid fits only, so it is not used when a grid is passed.
+    """
+    if grid_alpha is not None or grid_beta is not None:
+        cache = None
+    index = _as_index(series_df)
+    key = _resolve_user_key(user_index, index)
+    y = index.series(key)
+    if len(y) == 0:
         raise ValueError(f"user_id {user_index} has no rows in the series dataset")
-    y = s['current_budget'].astype(float).to_numpy()
     last_val = float(y[-1])
     if len(y) < min_points:
         return [round(last_val, 2) for _ in range(n)]
-    a, b = _holt_cv_select(y)
-    _, lT, bT = _holt_one_step(y, a, b)
+    state = cache.advance(key, y) if cache is not None else None
+    if state is not None:
+        lT, bT = state
+    else:
+        a, b, val_mse = _holt_cv_search(y, grid_alpha, grid_beta)
+        _, lT, bT = _holt_one_step(y, a, b)
+        if cache is not None:
+            cache.store(key, a, b, float(lT), float(bT), y, val_mse)
     preds = [lT + (h+1)*bT for h in range(n)]
     return [round(float(v), 2) for v in preds]
+
+def predict_many_holt(requests: List[Tuple[Union[str,int], int]], series_df: SeriesSource, min_points: int = 3,
+                      grid_alpha=None, grid_beta=None, val_frac: float = 0.2,
+                      cache: Optional[HoltStateCache] = None) -> List[Tuple[Optional[List[float]], Optional[str]]]:
+    """
+    Forecast many (user_index, n) pairs at once. Returns one (values, error)
+    tuple per request, in order; a bad user only fails its own entry.
+
+    Users with the same history length share a train/validation split, so they
+    are stacked into a (n_users, T) array and the grid search and final fit run
+    for the whole group together. Results are identical to calling
+    predict_from_series_holt once per user. With `cache`, users whose stored
+    state is still valid skip the fit and are only advanced over new rows
+    (default grid and val_frac only: the cache is not used when either is passed).
+    """
+    if grid_alpha is not None or grid_beta is not None or val_frac != 0.2:
+        cache = None
+    if grid_alpha is None: grid_alpha = HOLT_GRID
+    if grid_beta  is None: grid_beta  = HOLT_GRID
+    index = _as_index(series_df)
+
+    keys: List[Optional[str]] = []
+    errors: List[Optional[str]] = []
+    for user_index, _ in requests:
+        try:
+            keys.append(_resolve_user_key(user_index, index))
+            errors.append(None)
+        except (ValueError, TypeError) as e:
+            keys.append(None)
+            errors.append(str(e))
+
+    # Final (level, trend) per distinct key; short series just repeat the last value
+    state: Dict[str, Tuple[float, float]] = {}
+    by_len: Dict[int, List[str]] = {}
+    for key in dict.fromkeys(k for k in keys if k is not None):
+        y = index.series(key)
+        if len(y) < min_points:
+            state[key] = (float(y[-1]), 0.0)
+            continue
+        cached = cache.advance(key, y) if cache is not None else None
+        if cached is not None:
+            state[key] = cached
+        else:
+            by_len.setdefault(len(y), []).append(key)
+
+    for T, group in by_len.items():
+        Y = np.stack([index.series(k) for k in group])
+        if T < 4:  # tiny series, same defaults as _holt_cv_select
+            params = [(0.5, 0.3, None)] * len(group)
+        else:
+            split = max(2, int(T*(1.0 - val_frac)))
+            mse = _holt_grid_mse(Y, grid_alpha, grid_beta, split)
+            params = [_select_from_mse(row, grid_alpha, grid_beta) for row in mse]
+        alpha = np.array([p[0] for p in params])
+        beta = np.array([p[1] for p in params])
+        lT, bT = _holt_final_state(Y, alpha, beta)
+        for i, (k, l, b) in enumerate(zip(group, lT.tolist(), bT.tolist())):
+            state[k] = (l, b)
+            if cache is not None:
+                cache.store(k, params[i][0], params[i][1], l, b, Y[i], params[i][2])
+
+    out: List[Tuple[Optional[List[float]], Optional[str]]] = []
+    for (user_index, n), key, err in zip(requests, keys, errors):
+        if key is None:
+            out.append((None, err))
+            continue
+        lT, bT = state[key]
+        out.append(([round(float(lT + (h+1)*bT), 2) for h in range(n)], None))
+    return out
@@ -1,12 +1,29 @@
 # Requires: current_budget_series_model.py and users_current_budget_series.csv
 
-from current_budget_series_model import load_series, predict_from_series_holt as _predict
+from current_budget_series_model import SeriesStore, SpendingProfiles, get_series_store, predict_from_series_holt as _predict, predict_many_holt as _predict_many
 import os
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+def default_series_path():
+    """
+    SERIES_PATH if set (a CSV, a columnar snapshot directory or "SUPABASE"),
+    else Supabase when credentials are configured, otherwise the local CSV.
+    """
+    if os.environ.get("SERIES_PATH"):
+        return os.environ["SERIES_PATH"]
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+    if url and key and "your_supabase_url" not in url:
+        return "SUPABASE"
+    return "users_current_budget_series.csv"
+
+def series_store(series_path=None) -> SeriesStore:
+    """Shared in-memory series for `series_path` (default source if None)."""
+    return get_series_store(series_path or default_series_path())
+
 def forecast(user_index, n, series_path=None):
     """
     Forecast next `n` values of current_budget for a user.
@@ -18,18 +35,33 @@ def forecast(user_index, n, series_path=None):
               "5c8251ce-1fe3-4225-97e8-33ec05f85927" (Igor)
             - int >= 3 for other users (e.g., 884)
         n (int): number of future steps to predict
-        series_path (str): path to users_current_budget_series.csv or "SUPABASE"
+        series_path (str): path to users_current_budget_series.csv, a series snapshot
+            directory (see series_snapshot.py) or "SUPABASE"
 
     Returns:
         list[float]: length n
     """
-    if series_path is None:
-        url = os.environ.get("SUPABASE_URL")
-        key = os.environ.get("SUPABASE_KEY")
-        if url and key and "your_supabase_url" not in url:
-            series_path = "SUPABASE"
-        else:
-            series_path = "users_current_budget_series.csv"
+    store = series_store(series_path)
+    return _predict(user_index, n, store.index(), cache=store.holt_cache)
 
-    df = load_series(series_path)
-    return _predict(user_index, n, df)
+def forecast_many(requests, series_path=None):
+    """
+    Forecast several users in one pass over the shared series.
+
+    Args:
+        requests: list of (user_index, n) pairs, user_index as in `forecast`
+        series_path (str): path to users_current_budget_series.csv, a series snapshot
+            directory (see series_snapshot.py) or "SUPABASE"
+
+    Returns:
+        list[tuple[list[float] | None, str | None]]: (values, error) per request
+    """
+    store = series_store(series_path)
+    return _predict_many(requests, store.index(), cache=store.holt_cache)
+
+def spending_profiles(series_path=None) -> SpendingProfiles:
+    """
+    Per-user expense profiles (recent mean/std of budget drops) for the shared
+    series; rebuilt automatically when the series reloads.
+    """
+    return series_store(series_path).profiles()
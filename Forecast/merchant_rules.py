@@ -0,0 +1,131 @@
+# merchant_rules.py (keyword -> category table for /analyze)
+#
+# Rules live in merchant_rules.json (or MERCHANT_RULES_PATH):
+#   {"default": "General",
+#    "rules": [{"category": "Groceries", "keywords": ["KAUFLAND", "LINELLA"]}, ...]}
+# A keyword matches anywhere in the upper-cased merchant text. When several
+# rules match, the one listed first wins, as in the original if/elif chain.
+#
+# All keywords are compiled into one regex shaped like a trie, so each text
+# position is checked in time proportional to keyword length, not keyword count.
+# The file is re-read when its modification time changes.
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+RULES_PATH = os.getenv("MERCHANT_RULES_PATH", os.path.join(os.path.dirname(__file__), "merchant_rules.json"))
+RULES_CHECK_SECONDS = float(os.getenv("MERCHANT_RULES_CHECK_SECONDS", "2"))   # how often to stat the file
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """Regex matching any of `words`, preferring the longest one at a given position."""
+    trie: dict = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            # Greedy optional group: try the longer keyword first
+            return "(?:" + body + ")?" if len(branches) == 1 else body + "?"
+        return body
+
+    return build(trie)
+
+
+class MerchantRules:
+    """Compiled rule table with hot reload; thread-safe."""
+
+    def __init__(self, path: str = RULES_PATH, check_seconds: float = RULES_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = float(check_seconds)
+        self.version = 0
+        # (regex, keyword -> index of the first rule listing it, categories, default), swapped as one
+        self._table: Tuple[Optional[re.Pattern], Dict[str, int], List[str], str] = (None, {}, [], "General")
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+        self._load()
+
+    def on_reload(self, callback: Callable[[], None]) -> None:
+        """Call `callback` after every successful reload (e.g. to clear result caches)."""
+        self._listeners.append(callback)
+
+    def _load(self) -> None:
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, encoding="utf-8") as f:
+            cfg = json.load(f)
+
+        priority: Dict[str, int] = {}
+        categories: List[str] = []
+        for i, rule in enumerate(cfg.get("rules", [])):
+            categories.append(str(rule["category"]))
+            for kw in rule.get("keywords", []):
+                kw = str(kw).upper()
+                if kw:
+                    priority.setdefault(kw, i)
+
+        # Lookahead so every start position is tried, including overlapping matches
+        regex = re.compile("(?=(" + _trie_pattern(list(priority)) + "))") if priority else None
+        self._table = (regex, priority, categories, str(cfg.get("default", "General")))
+        self._mtime = mtime
+        self.version += 1
+
+    def reload_if_changed(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return False
+        with self._lock:
+            if now - self._checked_at < self.check_seconds:
+                return False
+            self._checked_at = now
+            try:
+                if os.path.getmtime(self.path) == self._mtime:
+                    return False
+                self._load()
+            except (OSError, ValueError, KeyError, re.error) as e:
+                # Keep serving the rules we have
+                print(f"Warning: could not reload merchant rules from {self.path}: {e}")
+                return False
+        for cb in self._listeners:
+            cb()
+        return True
+
+    def categorize(self, merchant: Optional[str]) -> str:
+        self.reload_if_changed()
+        regex, priority, categories, default = self._table
+        if not merchant or regex is None:
+            return default
+
+        best = len(categories)
+        for m in regex.finditer(merchant.upper()):
+            word = m.group(1)
+            # The trie returns the longest keyword at this position; shorter ones are its prefixes
+            for end in range(len(word), 0, -1):
+                p = priority.get(word[:end])
+                if p is not None and p < best:
+                    best = p
+            if best == 0:
+                break
+        return categories[best] if best < len(categories) else default
+
+    def stats(self) -> dict:
+        _, priority, categories, _ = self._table
+        return {
+            "path": self.path,
+            "version": self.version,
+            "rules": len(categories),
+            "keywords": len(priority),
+        }
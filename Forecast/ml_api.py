@@ -1,13 +1,19 @@
-from typing import List, Optional
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional, Union
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+import json
 import os
 import random
+import numpy as np
 from starlette.middleware.base import BaseHTTPMiddleware
 
 # Reuse forecast logic
-from forecast import forecast as _forecast
+from forecast import forecast as _forecast, forecast_many as _forecast_many, series_store as _series_store, spending_profiles as _spending_profiles
+from Classify.merchant_cache import MerchantCache
+from merchant_rules import MerchantRules
 
 
 class AnalyzeRequest(BaseModel):
@@ -31,15 +37,67 @@ class AnalyzeResponse(BaseModel):
     advice: List[str]
 
 
+class AnalyzeBatchRequest(BaseModel):
+    items: List[AnalyzeRequest]
+    format: Literal["rows", "columns", "ndjson"] = Field(
+        "rows", description="rows: list of results; columns: one array per field; ndjson: one result per line"
+    )
+
+
+class AnalyzeBatchResponse(BaseModel):
+    results: List[AnalyzeResponse]
+
+
+class AnalyzeBatchColumns(BaseModel):
+    category: List[str]
+    flag: List[bool]
+    level: List[str]
+    reasons: List[List[str]]
+    advice: List[List[str]]
+
+
 class ForecastResponse(BaseModel):
     user_id: str
     n: int
     values: List[float]
 
 
+class BatchForecastItem(BaseModel):
+    user_id: str
+    n: int = 6
+
+
+class BatchForecastRequest(BaseModel):
+    items: List[BatchForecastItem]
+    clamp: bool = Field(True, description="Apply the same 50..300 UI bounds as GET /forecast")
+
+
+class BatchForecastResult(BaseModel):
+    user_id: str
+    n: int
+    values: Optional[List[float]] = None
+    error: Optional[str] = None
+
+
+class BatchForecastResponse(BaseModel):
+    results: List[BatchForecastResult]
+
+
 ALLOW_ORIGINS = [o.strip() for o in os.getenv("ML_API_CORS", "*").split(",") if o.strip()]
+ANALYZE_BATCH_MAX_ITEMS = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", "10000"))
+# With a spending profile, an expense is flagged when it is this many std above the user's mean
+ANALYZE_Z_THRESHOLD = float(os.getenv("ANALYZE_Z_THRESHOLD", "3.0"))
+
+
+# Restores and persists the category cache (hooks defined next to it below)
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    _load_category_cache()
+    yield
+    _save_category_cache()
 
-app = FastAPI(title="ML Advisor API", version="0.1.0")
+
+app = FastAPI(title="ML Advisor API", version="0.1.0", lifespan=_lifespan)
 
 # Configure CORS: if wildcard requested, use regex with credentials disabled
 allow_all = "*" in ALLOW_ORIGINS
@@ -67,6 +125,21 @@ class EnsureCORSHeaderMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(EnsureCORSHeaderMiddleware)
 
+# Categories keyed on normalised merchant text; set ANALYZE_CACHE_PATH to keep them across restarts
+_category_cache = MerchantCache(path=os.getenv("ANALYZE_CACHE_PATH"))
+
+# Keyword rules from merchant_rules.json; cached categories are dropped when the file changes
+_rules = MerchantRules()
+_rules.on_reload(_category_cache.clear)
+
+
+def _load_category_cache():
+    _category_cache.load()
+
+
+def _save_category_cache():
+    _category_cache.save()
+
 
 @app.get("/health")
 def health():
@@ -74,65 +147,156 @@ def health():
 
 
 def _guess_category(merchant: Optional[str]) -> str:
-    if not merchant:
-        return "General"
-    m = merchant.upper()
-    import re
-
-    if re.search(r"(KAUFLAND|LINELLA|GREEN HILLS|SUPERMARKET|MARKET)", m):
-        return "Groceries"
-    if re.search(r"(LUKOIL|MOL|PETROM|ROMPETROL|VENTO)", m):
-        return "Fuel"
-    if re.search(r"(ORANGE|MOLDTELECOM|DIGI|VODAFONE|MTS)", m):
-        return "Utilities"
-    if re.search(r"(PHARM|APTEKA|FARM)", m):
-        return "Health"
-    if re.search(r"(UBER|YANGO|TAXI|PARK)", m):
-        return "Transport"
-    if re.search(r"(H&M|ZARA|UNIQLO|CCC|LC WAIKIKI)", m):
-        return "Shopping"
-    return "General"
-
-
-def _risk_and_advice(amount: float, category: str) -> Risk:
-    # Simple heuristics for demo
-    reasons: List[str] = []
-    flag = False
-    level = "low"
+    return _rules.categorize(merchant)
 
-    # Amount-based heuristic
-    if amount <= -1000:  # expense over 1000
-        flag = True
-        level = "medium"
-        reasons.append("Large expense detected (> 1000)")
-    if category == "Shopping" and amount <= -500:
-        flag = True
-        level = "high"
-        reasons.append("High shopping spend")
-    if category == "Fuel" and amount <= -300:
-        flag = True
-        reasons.append("Unusually high fuel purchase")
 
-    return Risk(flag=flag, level=level, reasons=reasons)
+# Rule outcomes are encoded as bits so a whole batch is evaluated with numpy
+# and each row's reasons/advice are looked up instead of built
+_REASONS = (
+    "Large expense detected (> 1000)",  # expense over 1000
+    "High shopping spend",
+    "Unusually high fuel purchase",
+    "Expense far above your usual spending",
+)
+_LEVELS = np.array(["low", "medium", "high"])
+_REASON_LISTS = [[r for bit, r in enumerate(_REASONS) if code >> bit & 1] for code in range(1 << len(_REASONS))]
+_ADVICE_HIGH = "Consider setting a weekly cap for Shopping and review subscriptions."
+_ADVICE_FUEL = "Check if this is a bulk purchase; consider fuel discount programs."
+_ADVICE_FLAGGED = "Move discretionary spend to 'General' budget envelope."
+_ADVICE_OK = "Looks normal. Keep tracking to stay on budget."
+# Indexed by flag | high << 1 | fuel << 2 (advice does not depend on which rule fired)
+_ADVICE_LISTS = [
+    ([_ADVICE_HIGH] if code & 2 else []) + ([_ADVICE_FUEL] if code & 4 else []) + [_ADVICE_FLAGGED]
+    if code & 1 else [_ADVICE_OK]
+    for code in range(8)
+]
+
+
+def _risk_columns(amounts: np.ndarray, categories: np.ndarray,
+                  profile_mean: Optional[np.ndarray] = None, profile_std: Optional[np.ndarray] = None):
+    """
+    Evaluate the risk rules over whole arrays (amount is signed; negative = expense).
+    Where the user's spending profile is known (non-NaN mean/std), the large-expense
+    rule compares against their own history instead of the fixed 1000 cutoff.
+    Returns (flag, level index into _LEVELS, reason bit codes, advice codes).
+    """
+    # Simple heuristics for demo
+    large = amounts <= -1000
+    unusual = np.zeros(len(amounts), dtype=bool)
+    if profile_mean is not None:
+        known = ~np.isnan(profile_mean)
+        # Floor the spread so users with very regular spending are not flagged for small deviations
+        spread = np.fmax(profile_std, 0.1 * profile_mean)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (-amounts - profile_mean) / spread
+        unusual = known & (amounts < 0) & (z >= ANALYZE_Z_THRESHOLD)
+        large = large & ~known
+    shopping = (categories == "Shopping") & (amounts <= -500)
+    fuel_cat = categories == "Fuel"
+    fuel = fuel_cat & (amounts <= -300)
+
+    reason_codes = large.astype(np.int64) | shopping << 1 | fuel << 2 | unusual << 3
+    flag = reason_codes > 0
+    level = np.where(shopping, 2, np.where(large | unusual, 1, 0))
+    advice_codes = flag.astype(np.int64) | (level == 2) << 1 | fuel_cat << 2
+    return flag, level, reason_codes, advice_codes
+
+
+def _risk_and_advice(amount: float, category: str, profile: Optional[tuple] = None) -> Risk:
+    """`profile` is (mean, std, count) of the user's recent expenses, if known."""
+    mean, std = (np.array([profile[0]]), np.array([profile[1]])) if profile else (None, None)
+    flag, level, reason_codes, _ = _risk_columns(
+        np.array([amount], dtype=float), np.array([category], dtype=object), mean, std
+    )
+    return Risk(flag=bool(flag[0]), level=str(_LEVELS[level[0]]), reasons=list(_REASON_LISTS[reason_codes[0]]))
+
+
+def _profile_key(user_id: Optional[str]) -> Optional[str]:
+    if user_id is None or not str(user_id).strip():
+        return None
+    return str(_user_index(str(user_id)))
+
+
+def _load_profiles():
+    try:
+        return _spending_profiles()
+    except Exception:
+        # No series available (the store logs load failures and backs off
+        # between retries): fall back to the fixed thresholds
+        return None
 
 
 @app.post("/analyze", response_model=AnalyzeResponse)
 def analyze(req: AnalyzeRequest):
     # Note: amount is signed; negative = expense in app's ledger
-    category = _guess_category(req.merchant or "")
-    risk = _risk_and_advice(req.amount, category)
+    _rules.reload_if_changed()  # before the cache, so edited rules take effect on cached merchants too
+    category = _category_cache.get_or_compute(req.merchant or "", _guess_category)
+    key = _profile_key(req.user_id)
+    profiles = _load_profiles() if key else None
+    risk = _risk_and_advice(req.amount, category, profiles.lookup(key) if profiles else None)
 
-    advice: List[str] = []
-    if risk.flag:
-        if risk.level == "high":
-            advice.append("Consider setting a weekly cap for Shopping and review subscriptions.")
-        if "Fuel" == category:
-            advice.append("Check if this is a bulk purchase; consider fuel discount programs.")
-        advice.append("Move discretionary spend to 'General' budget envelope.")
-    else:
-        advice.append("Looks normal. Keep tracking to stay on budget.")
+    advice_code = int(risk.flag) | (risk.level == "high") << 1 | (category == "Fuel") << 2
+    return AnalyzeResponse(category=category, risk=risk, advice=list(_ADVICE_LISTS[advice_code]))
 
-    return AnalyzeResponse(category=category, risk=risk, advice=advice)
+
+@app.post(
+    "/analyze/batch",
+    response_model=Union[AnalyzeBatchResponse, AnalyzeBatchColumns],
+    responses={200: {"content": {"application/x-ndjson": {}}}},
+)
+def analyze_batch(req: AnalyzeBatchRequest):
+    """
+    /analyze for a whole statement: one category lookup per distinct merchant,
+    risk rules evaluated over arrays. Results are in request order, as
+    AnalyzeBatchResponse (rows), AnalyzeBatchColumns (columns) or one
+    AnalyzeResponse per line (ndjson, streamed without validation).
+    """
+    if len(req.items) > ANALYZE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {ANALYZE_BATCH_MAX_ITEMS} items per request")
+
+    _rules.reload_if_changed()
+    merchants = [it.merchant or "" for it in req.items]
+    by_merchant = {m: _category_cache.get_or_compute(m, _guess_category) for m in dict.fromkeys(merchants)}
+    categories = np.array([by_merchant[m] for m in merchants], dtype=object)
+    amounts = np.array([it.amount for it in req.items], dtype=float)
+
+    mean = std = None
+    keys = [_profile_key(it.user_id) for it in req.items]
+    profiles = _load_profiles() if any(keys) else None
+    if profiles is not None:
+        by_user = {k: profiles.lookup(k) if k else None for k in dict.fromkeys(keys)}
+        mean = np.array([by_user[k][0] if by_user[k] else np.nan for k in keys], dtype=float)
+        std = np.array([by_user[k][1] if by_user[k] else np.nan for k in keys], dtype=float)
+
+    flag, level, reason_codes, advice_codes = _risk_columns(amounts, categories, mean, std)
+    cols = AnalyzeBatchColumns(
+        category=categories.tolist(),
+        flag=flag.tolist(),
+        level=_LEVELS[level].tolist(),
+        reasons=[_REASON_LISTS[c] for c in reason_codes.tolist()],
+        advice=[_ADVICE_LISTS[c] for c in advice_codes.tolist()],
+    )
+    if req.format == "columns":
+        return cols
+
+    rows = (
+        {"category": c, "risk": {"flag": f, "level": lv, "reasons": r}, "advice": a}
+        for c, f, lv, r, a in zip(cols.category, cols.flag, cols.level, cols.reasons, cols.advice)
+    )
+    if req.format == "ndjson":
+        return StreamingResponse((json.dumps(row) + "\n" for row in rows), media_type="application/x-ndjson")
+    return {"results": list(rows)}
+
+
+def _user_index(user_id: str):
+    """Query/body ids arrive as strings; int-like ones address the numeric users."""
+    uid = user_id.strip()
+    return int(uid) if uid.isdigit() else uid
+
+
+def _clamp(vals: List[float]) -> List[float]:
+    # ensure sane bounds for demo UI
+    return [float(max(50.0, min(300.0, v))) for v in vals]
 
 
 @app.get("/forecast", response_model=ForecastResponse)
@@ -146,12 +310,11 @@ def get_forecast(user_id: str, n: int = 6):
         return vals
 
     try:
-        vals = _forecast(user_id, n)
-        # ensure sane bounds for demo UI
+        vals = _forecast(_user_index(user_id), n)
         if not vals or not isinstance(vals, list):
             vals = _fallback(n)
         else:
-            vals = [float(max(50.0, min(300.0, v))) for v in vals]
+            vals = _clamp(vals)
     except Exception as e:
         # In dev, never fail CORS due to backend compute; return fallback
         print("/forecast error:", e)
@@ -159,6 +322,36 @@ def get_forecast(user_id: str, n: int = 6):
     return ForecastResponse(user_id=str(user_id), n=n, values=vals)
 
 
+@app.post("/forecast/batch", response_model=BatchForecastResponse)
+def forecast_batch(req: BatchForecastRequest):
+    """Forecast many users in one call; failures are reported per item."""
+    try:
+        out = _forecast_many([(_user_index(it.user_id), it.n) for it in req.items])
+    except Exception as e:
+        # Series could not be loaded at all: every item fails the same way
+        print("/forecast/batch error:", e)
+        out = [(None, str(e))] * len(req.items)
+
+    results: List[BatchForecastResult] = []
+    for it, (vals, err) in zip(req.items, out):
+        if vals is not None and req.clamp:
+            vals = _clamp(vals)
+        results.append(BatchForecastResult(user_id=it.user_id, n=it.n, values=vals, error=err))
+    return BatchForecastResponse(results=results)
+
+
+@app.get("/analyze/stats")
+def analyze_stats():
+    """Hit/miss counters of the merchant category cache and the loaded rule table."""
+    return {"cache": _category_cache.stats(), "rules": _rules.stats()}
+
+
+@app.get("/forecast/stats")
+def forecast_stats():
+    """State of the shared series cache used by /forecast."""
+    return _series_store().stats()
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("ML_API_PORT", "8091"))
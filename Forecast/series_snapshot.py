@@ -0,0 +1,102 @@
+# series_snapshot.py (columnar, memory-mapped copy of the budget series)
+#
+# A snapshot is a directory of .npy column files plus manifest.json:
+#   user_keys  <U   one entry per user (dictionary for user_code)
+#   offsets    i8   user i owns rows offsets[i]:offsets[i+1]
+#   user_code  i4   per-row index into user_keys
+#   date       i8   ns since epoch (NaT as int64 min)
+#   tx_id      i8 / <U
+#   current_budget f8
+# Rows are sorted by (user_id, date, tx_id). Readers memory-map the columns, so
+# worker processes share the same page-cache pages and startup does no parsing.
+#
+# Usage:
+#   python series_snapshot.py users_current_budget_series.csv users_current_budget_series.snapshot
+#   python series_snapshot.py SUPABASE users_current_budget_series.snapshot
+
+import json
+import os
+import sys
+import time
+import uuid
+import numpy as np
+from typing import Union
+import pandas as pd
+
+from current_budget_series_model import SeriesIndex, load_series
+
+SNAPSHOT_VERSION = 1
+_COLUMNS = ("user_keys", "offsets", "user_code", "date", "tx_id", "current_budget")
+
+
+def write_snapshot(series: Union[pd.DataFrame, SeriesIndex], path: str) -> dict:
+    """
+    Write `series` as a snapshot directory at `path` and return its manifest.
+
+    Column files carry a fresh id in their names and manifest.json is replaced
+    last, so readers (including ones holding memory maps of the previous
+    version) never see a partially written snapshot.
+    """
+    index = series if isinstance(series, SeriesIndex) else SeriesIndex.from_frame(series)
+    os.makedirs(path, exist_ok=True)
+    snap_id = uuid.uuid4().hex[:12]
+
+    counts = np.diff(index.offsets)
+    tx_ids = np.asarray(index.tx_ids)
+    if not np.issubdtype(tx_ids.dtype, np.number):
+        tx_ids = tx_ids.astype(str)
+    columns = {
+        "user_keys": np.asarray(index.keys, dtype=str),
+        "offsets": np.asarray(index.offsets, dtype=np.int64),
+        "user_code": np.repeat(np.arange(len(index), dtype=np.int32), counts),
+        "date": np.asarray(index.dates, dtype=np.int64),
+        "tx_id": tx_ids,
+        "current_budget": np.asarray(index.values, dtype=np.float64),
+    }
+    files = {}
+    for name, arr in columns.items():
+        fname = f"{name}.{snap_id}.npy"
+        np.save(os.path.join(path, fname), np.ascontiguousarray(arr), allow_pickle=False)
+        files[name] = fname
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "id": snap_id,
+        "created_at": time.time(),
+        "rows": index.n_rows,
+        "users": len(index),
+        "files": files,
+    }
+    tmp = os.path.join(path, f"manifest.{snap_id}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(path, "manifest.json"))
+
+    # Unlinking old column files is safe for readers that still map them
+    for fname in os.listdir(path):
+        if fname.endswith(".npy") and fname not in files.values():
+            os.remove(os.path.join(path, fname))
+    return manifest
+
+
+def read_snapshot(path: str) -> SeriesIndex:
+    """Open a snapshot directory as a SeriesIndex backed by read-only memory maps."""
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported series snapshot version: {manifest.get('version')!r}")
+    cols = {
+        name: np.load(os.path.join(path, manifest["files"][name]), mmap_mode="r", allow_pickle=False)
+        for name in _COLUMNS
+    }
+    keys = np.asarray(cols["user_keys"].tolist(), dtype=object)
+    return SeriesIndex(keys, cols["offsets"], cols["current_budget"], cols["date"], cols["tx_id"])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python series_snapshot.py <series.csv | SUPABASE> <output.snapshot>")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    m = write_snapshot(load_series(sys.argv[1]), sys.argv[2])
+    print(f"Wrote {m['rows']} rows / {m['users']} users to {sys.argv[2]} in {time.perf_counter() - t0:.2f}s")
@@ -1,29 +1,158 @@
-
 import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client
 import pandas as pd
 
 # Load environment variables from .env file
 load_dotenv()
 
-def fetch_series_from_supabase() -> pd.DataFrame:
+SERIES_TABLE = "users_current_budget_series"
+SERIES_COLUMNS = ["user_id", "tx_id", "date", "current_budget"]
+
+# Rows per request. Keep it at or below the server's max-rows (1000 on Supabase).
+PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+
+_CLIENTS: Dict[Tuple[str, str, str], object] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client():
+    """
+    Shared query client, created once per (url, key) and reused so requests go
+    over its pooled HTTP connections.
+
+    If SUPABASE_REST_URL is set, talk to that PostgREST endpoint directly (for
+    example a local PostgREST in front of a test database) instead of
+    SUPABASE_URL/rest/v1.
+    """
     url: str = os.environ.get("SUPABASE_URL")
     key: str = os.environ.get("SUPABASE_KEY")
-    
-    if not url or not key:
-        raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables must be set.")
-
-    supabase: Client = create_client(url, key)
-    
-    # Fetch all data from users_current_budget_series
-    # Note: Supabase limits rows by default (usually 1000). 
-    # For a real app, you might need pagination or filtering by user_id.
-    response = supabase.table("users_current_budget_series").select("*").execute()
-    
-    data = response.data
-    if not data:
-        return pd.DataFrame(columns=['user_id', 'tx_id', 'date', 'current_budget'])
-        
-    df = pd.DataFrame(data)
-    return df
+    rest_url = os.environ.get("SUPABASE_REST_URL", "")
+
+    if rest_url:
+        ident = ("rest", rest_url, key or "")
+    else:
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables must be set.")
+        ident = ("supabase", url, key)
+
+    client = _CLIENTS.get(ident)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(ident)
+            if client is None:
+                if rest_url:
+                    from postgrest import SyncPostgrestClient
+                    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+                    if key:
+                        headers.update(apikey=key, Authorization=f"Bearer {key}")
+                    client = SyncPostgrestClient(rest_url.rstrip("/"), headers=headers)
+                else:
+                    client = create_client(url, key)
+                _CLIENTS[ident] = client
+    return client
+
+
+def _quote(value) -> str:
+    # PostgREST logic-tree values must be quoted when they contain , . : ( )
+    s = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{s}"'
+
+
+KEYSET = ("user_id", "date", "tx_id")
+
+
+def _key(row: dict) -> tuple:
+    return tuple(row.get(col) for col in KEYSET)
+
+
+def _after(last: dict, inclusive: bool = False) -> Optional[str]:
+    """
+    `or=` filter selecting rows after `last` in (user_id, date, tx_id) order
+    with NULLs last (with `inclusive`, also rows with the same key), or None
+    when nothing can match. A NULL key of `last` is matched with `is.null`
+    (`eq`/`gt` never match NULL).
+    """
+    branches: List[str] = []
+    equal: List[str] = []   # conditions for "same key as `last` so far"
+    for col in KEYSET:
+        value = last.get(col)
+        if value is None:
+            # Nothing sorts after NULL in this column; ties continue on the next one
+            equal.append(f"{col}.is.null")
+            continue
+        q = _quote(value)
+        after = f"or({col}.gt.{q},{col}.is.null)"
+        branches.append(f"and({','.join(equal + [after])})" if equal else after)
+        equal.append(f"{col}.eq.{q}")
+    if inclusive:
+        branches.append(f"and({','.join(equal)})")
+    return ",".join(branches) or None
+
+
+def fetch_series_from_supabase(
+    user_ids: Optional[Iterable[str]] = None,
+    since: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    page_size: int = PAGE_SIZE,
+) -> pd.DataFrame:
+    """
+    Fetch rows of users_current_budget_series, page by page.
+
+    Args:
+        user_ids: only these users (server-side `user_id=in.(...)`)
+        since: only rows with `date >= since` (ISO timestamp watermark)
+        columns: columns to select, defaults to the four the model needs
+        page_size: rows per request
+
+    Pages are ordered by (user_id, date, tx_id), NULLs last, and each request
+    asks for rows from the last key seen onwards (keyset pagination), so results
+    are complete regardless of the server's row limit. Rows with a NULL date or
+    tx_id are included. The key need not be unique: each page starts again at
+    the previous page's last key, so a run of rows sharing one (e.g. two NULL
+    tx_ids on the same user and date) comes back whole and replaces the part
+    already kept. Only a run longer than a whole page falls back to "strictly
+    after", which can skip the rest of that run.
+    """
+    columns = columns or SERIES_COLUMNS
+    # The keyset columns must come back even if the caller did not ask for them
+    select = list(dict.fromkeys(list(columns) + list(KEYSET)))
+    client = get_client()
+
+    rows: List[dict] = []
+    last: Optional[dict] = None
+    ties = 0   # rows at the end of `rows` with the same key as `last`
+    while True:
+        inclusive = last is not None and ties < page_size
+        query = client.table(SERIES_TABLE).select(",".join(select))
+        if user_ids is not None:
+            query = query.in_("user_id", [str(u) for u in user_ids])
+        if since is not None:
+            query = query.gte("date", since)
+        if last is not None:
+            after = _after(last, inclusive)
+            if after is None:
+                break
+            query = query.or_(after)
+        for col in KEYSET:
+            query = query.order(col, nullsfirst=False)
+        query = query.limit(page_size)
+
+        page = query.execute().data or []
+        if not page:
+            break
+        if inclusive:
+            # The page starts over at last's key: drop the rows with that key kept so far
+            del rows[len(rows) - ties:]
+        rows.extend(page)
+        key = _key(page[-1])
+        if inclusive and key == _key(last) and len(page) < page_size:
+            break  # only rows with the last key were left
+        ties = next((i for i, row in enumerate(reversed(page)) if _key(row) != key), len(page))
+        last = page[-1]
+
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(rows, columns=select)[columns]
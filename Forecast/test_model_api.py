@@ -32,5 +32,37 @@ def test_forecast_api():
     except requests.exceptions.ConnectionError:
         print(f"\n❌ Could not connect to {base_url}. Is the server running?")
 
+def test_forecast_batch_api():
+    url = "http://localhost:8091/forecast/batch"
+    body = {
+        "items": [
+            {"user_id": "698841bd-189c-4407-b582-9d5fa2689336", "n": 6},
+            {"user_id": "5c8251ce-1fe3-4225-97e8-33ec05f85927", "n": 3},
+            {"user_id": "not-a-user", "n": 3},
+        ]
+    }
+
+    try:
+        print(f"\nSending POST request to {url} with {len(body['items'])} items")
+        response = requests.post(url, json=body)
+
+        if response.status_code == 200:
+            results = response.json()["results"]
+            print("\n✅ Batch API Call Successful!")
+            print(json.dumps(results, indent=2))
+
+            ok = [r for r in results if r["error"] is None]
+            if len(results) == 3 and results[2]["error"] and all(len(r["values"]) == r["n"] for r in ok):
+                print("\n✅ Per-user values and errors look right.")
+            else:
+                print("\n❌ Unexpected batch results.")
+        else:
+            print(f"\n❌ Batch API Call Failed with status code: {response.status_code}")
+            print(response.text)
+
+    except requests.exceptions.ConnectionError:
+        print(f"\n❌ Could not connect to {url}. Is the server running?")
+
 if __name__ == "__main__":
     test_forecast_api()
+    test_forecast_batch_api()
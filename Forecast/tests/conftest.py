@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The Forecast modules import each other as top-level modules
+FORECAST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FORECAST_DIR)
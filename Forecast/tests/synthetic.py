@@ -0,0 +1,43 @@
+# synthetic.py (fixed-seed budget series and merchant texts shared by the tests)
+import json
+import random
+
+import numpy as np
+import pandas as pd
+
+from merchant_rules import RULES_PATH
+
+
+def budget_frame(seed: int = 0, n_users: int = 12, rows: int = 400, string_tx: bool = False) -> pd.DataFrame:
+    """Budget rows for users "3".."n+2", with repeated dates and tx_ids, NaT dates and NULL keys."""
+    rng = np.random.default_rng(seed)
+    user_ids = rng.integers(3, 3 + n_users, size=rows).astype(str).astype(object)
+    dates = pd.Series(pd.to_datetime("2024-01-01") + pd.to_timedelta(rng.integers(0, 30, size=rows), unit="D"))
+    dates[rng.random(rows) < 0.03] = pd.NaT
+    tx_ids = rng.integers(0, 50, size=rows).astype(float)
+    tx_ids[rng.random(rows) < 0.05] = np.nan
+    df = pd.DataFrame({
+        "user_id": user_ids,
+        "tx_id": [None if np.isnan(t) else f"tx{int(t):03d}" for t in tx_ids] if string_tx else tx_ids,
+        "date": dates,
+        "current_budget": np.round(1000 + rng.normal(0, 50, size=rows).cumsum(), 2),
+    })
+    df.loc[rng.choice(rows, size=5, replace=False), "user_id"] = None
+    return df
+
+
+def merchants(n=3000, seed=0):
+    """Merchant texts with zero to three keywords (often overlapping ones like MOLDTELECOM/MOL) in noise."""
+    with open(RULES_PATH, encoding="utf-8") as f:
+        keywords = [kw for rule in json.load(f)["rules"] for kw in rule["keywords"]]
+    rng = random.Random(seed)
+    noise = ["", " ", "SRL ", "nr.12 ", "s.a. ", "shop ", "-", "Chisinau ", "m", "a"]
+    out = ["", None, "   ", "general store"]
+    for _ in range(n):
+        parts = [rng.choice(noise)]
+        for _ in range(rng.randint(0, 3)):
+            kw = rng.choice(keywords)
+            parts.append(kw.lower() if rng.random() < 0.3 else kw)
+            parts.append(rng.choice(noise))
+        out.append("".join(parts))
+    return out
@@ -0,0 +1,118 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import ml_api
+import reference
+from synthetic import merchants
+
+
+def _items(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    texts = merchants(n, seed)[:n]
+    # Amounts around every threshold (-300, -500, -1000), both signs
+    amounts = rng.choice([-1500, -1000, -999.99, -700, -500, -499.5, -300, -299, -20, 0, 50, 2000], size=n)
+    return [{"merchant": m, "amount": float(a)} for m, a in zip(texts, amounts)]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # No spending profiles: the fixed thresholds of the baseline apply
+    monkeypatch.setattr(ml_api, "_load_profiles", lambda: None)
+    return TestClient(ml_api.app)
+
+
+def test_risk_columns_match_the_baseline_rules():
+    items = _items()
+    categories = np.array([reference._guess_category(it["merchant"]) for it in items], dtype=object)
+    amounts = np.array([it["amount"] for it in items], dtype=float)
+    flag, level, reason_codes, advice_codes = ml_api._risk_columns(amounts, categories)
+    for i, it in enumerate(items):
+        expected = reference.analyze(it["merchant"], it["amount"])
+        assert bool(flag[i]) == expected["risk"]["flag"]
+        assert ml_api._LEVELS[level[i]] == expected["risk"]["level"]
+        assert ml_api._REASON_LISTS[reason_codes[i]] == expected["risk"]["reasons"]
+        assert ml_api._ADVICE_LISTS[advice_codes[i]] == expected["advice"]
+
+
+def test_analyze_matches_the_baseline(client):
+    for it in _items(100, seed=1):
+        assert client.post("/analyze", json=it).json() == reference.analyze(it["merchant"], it["amount"])
+
+
+def test_batch_formats_match_the_baseline(client):
+    items = _items(seed=2)
+    expected = [reference.analyze(it["merchant"], it["amount"]) for it in items]
+
+    rows = client.post("/analyze/batch", json={"items": items}).json()
+    assert rows == {"results": expected}
+
+    cols = client.post("/analyze/batch", json={"items": items, "format": "columns"}).json()
+    assert cols == {
+        "category": [e["category"] for e in expected],
+        "flag": [e["risk"]["flag"] for e in expected],
+        "level": [e["risk"]["level"] for e in expected],
+        "reasons": [e["risk"]["reasons"] for e in expected],
+        "advice": [e["advice"] for e in expected],
+    }
+
+    resp = client.post("/analyze/batch", json={"items": items, "format": "ndjson"})
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in resp.text.splitlines()] == expected
+
+
+class _Profiles:
+    def __init__(self, by_user):
+        self.by_user = by_user
+
+    def lookup(self, key):
+        return self.by_user.get(key)
+
+
+def test_batch_with_profiles_matches_single_requests(monkeypatch):
+    profiles = _Profiles({"3": (40.0, 10.0, 30), "4": (800.0, 300.0, 30), "5": (50.0, 0.0, 30)})
+    monkeypatch.setattr(ml_api, "_load_profiles", lambda: profiles)
+    client = TestClient(ml_api.app)
+    rng = np.random.default_rng(3)
+    items = [dict(it, user_id=str(rng.choice(["3", "4", "5", "6"])) if rng.random() < 0.8 else None)
+             for it in _items(200, seed=3)]
+
+    batch = client.post("/analyze/batch", json={"items": items}).json()["results"]
+    assert batch == [client.post("/analyze", json=it).json() for it in items]
+    # Profiles change the outcome: user 3 is flagged for a 100 expense ...
+    assert batch != [reference.analyze(it["merchant"], it["amount"]) for it in items]
+    one = client.post("/analyze", json={"user_id": "3", "merchant": "cafe", "amount": -100}).json()
+    assert one["risk"]["flag"] and "Expense far above your usual spending" in one["risk"]["reasons"]
+    # ... and user 4 is not flagged for a 1000 expense, unlike the fixed cutoff
+    four = client.post("/analyze", json={"user_id": "4", "merchant": "cafe", "amount": -1000}).json()
+    assert not four["risk"]["flag"]
+
+
+def test_batch_size_limit(client, monkeypatch):
+    monkeypatch.setattr(ml_api, "ANALYZE_BATCH_MAX_ITEMS", 3)
+    resp = client.post("/analyze/batch", json={"items": _items(4)})
+    assert resp.status_code == 413
+
+
+def test_batch_response_models_are_documented(client):
+    schema = client.get("/openapi.json").json()
+    content = schema["paths"]["/analyze/batch"]["post"]["responses"]["200"]["content"]
+    assert "application/x-ndjson" in content
+    refs = json.dumps(content["application/json"]["schema"])
+    assert "AnalyzeBatchResponse" in refs and "AnalyzeBatchColumns" in refs
+
+
+def test_lifespan_restores_and_persists_the_category_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ml_api, "_load_profiles", lambda: None)
+    monkeypatch.setattr(ml_api._category_cache, "path", str(tmp_path / "categories.json"))
+    ml_api._category_cache.clear()
+    with TestClient(ml_api.app) as client:
+        client.post("/analyze", json={"merchant": "Kaufland 12", "amount": -5})
+    assert (tmp_path / "categories.json").exists()
+
+    ml_api._category_cache.clear()
+    with TestClient(ml_api.app):
+        assert ml_api._category_cache.get("Kaufland 12") == "Groceries"
+    assert not ml_api.app.router.on_startup and not ml_api.app.router.on_shutdown
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import reference
+from current_budget_series_model import HoltStateCache, SeriesIndex, predict_many_holt
+from synthetic import budget_frame
+
+
+def _expected(requests, df):
+    out = []
+    for user, n in requests:
+        try:
+            out.append((reference.predict_from_series_holt(user, n, df), None))
+        except (ValueError, TypeError):
+            out.append((None, "error"))
+    return out
+
+
+def _requests(n_users: int = 12):
+    rng = np.random.default_rng(5)
+    users = list(range(3, 3 + n_users)) + [2, 999, "not-a-uuid", 3, 3]   # bad ids and repeats
+    return [(u, int(rng.integers(1, 10))) for u in users]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_many_matches_one_at_a_time(seed):
+    df = budget_frame(seed=seed, rows=300)
+    requests = _requests()
+    got = predict_many_holt(requests, SeriesIndex.from_frame(df))
+    assert [(v, None if e is None else "error") for v, e in got] == _expected(requests, df)
+
+
+def test_many_with_cache_and_custom_grid():
+    df = budget_frame(seed=4)
+    index = SeriesIndex.from_frame(df)
+    requests = _requests()
+    cache = HoltStateCache()
+    first = predict_many_holt(requests, index, cache=cache)
+    assert predict_many_holt(requests, index, cache=cache) == first
+    assert cache.hits > 0
+    grid = [0.3, 0.6]
+    assert (predict_many_holt(requests, index, grid_alpha=grid, grid_beta=grid, cache=cache)
+            == predict_many_holt(requests, index, grid_alpha=grid, grid_beta=grid))
+
+
+def test_batch_endpoint(tmp_path, monkeypatch):
+    df = budget_frame(seed=6).dropna(subset=["user_id"])
+    path = tmp_path / "series.csv"
+    df.assign(date=df["date"].dt.strftime("%d/%m/%Y %H:%M")).to_csv(path, index=False)
+    monkeypatch.setenv("SERIES_PATH", str(path))
+    import ml_api
+
+    items = [{"user_id": "3", "n": 4}, {"user_id": "7", "n": 2}, {"user_id": "999", "n": 3}]
+    body = TestClient(ml_api.app).post("/forecast/batch", json={"items": items, "clamp": False}).json()
+    results = body["results"]
+    assert results[0]["values"] == reference.predict_from_series_holt(3, 4, df)
+    assert results[1]["values"] == reference.predict_from_series_holt(7, 2, df)
+    assert results[2]["values"] is None and "999" in results[2]["error"]
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+import reference
+from current_budget_series_model import HoltStateCache, SeriesIndex, predict_from_series_holt
+
+
+def _index(y) -> SeriesIndex:
+    return SeriesIndex.from_frame(pd.DataFrame({
+        "user_id": "3",
+        "tx_id": np.arange(len(y)),
+        "date": pd.date_range("2024-01-01", periods=len(y), freq="h"),
+        "current_budget": y,
+    }))
+
+
+def _walk(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.round(1000 + rng.normal(-5, 40, size=n).cumsum(), 2)
+
+
+def _forecast(y, a, b, n=7):
+    _, l, t = reference._holt_one_step(np.asarray(y, dtype=float), a, b)
+    return [round(float(l + (h + 1) * t), 2) for h in range(n)]
+
+
+def test_unchanged_series_is_a_hit_with_the_baseline_answer():
+    y = _walk(120)
+    cache = HoltStateCache()
+    first = predict_from_series_holt(3, 7, _index(y), cache=cache)
+    assert predict_from_series_holt(3, 7, _index(y), cache=cache) == first == reference.predict_from_series_holt(
+        3, 7, _index(y).to_frame())
+    assert (cache.refits, cache.hits) == (1, 1)
+
+
+def test_new_rows_advance_the_stored_fit():
+    y = _walk(140, seed=1)
+    cache = HoltStateCache()
+    predict_from_series_holt(3, 7, _index(y[:120]), cache=cache)
+    got = predict_from_series_holt(3, 7, _index(y), cache=cache)
+    # Same parameters as selected on the first 120 rows, run over all 140
+    a, b = reference._holt_cv_select(y[:120])
+    assert got == _forecast(y, a, b)
+    assert (cache.refits, cache.advanced_rows) == (1, 20)
+
+
+def test_edited_or_removed_rows_force_a_refit():
+    y = _walk(120, seed=2)
+    for changed in (np.where(np.arange(120) == 10, y + 500, y), y[:110], np.delete(y, 50)):
+        cache = HoltStateCache()
+        predict_from_series_holt(3, 7, _index(y), cache=cache)
+        got = predict_from_series_holt(3, 7, _index(changed), cache=cache)
+        assert cache.refits == 2
+        assert got == reference.predict_from_series_holt(3, 7, _index(changed).to_frame())
+
+
+def test_drift_and_age_force_a_refit():
+    y = _walk(120, seed=3)
+    cache = HoltStateCache(drift_ratio=2.0, drift_min_points=5)
+    predict_from_series_holt(3, 7, _index(y), cache=cache)
+    jumpy = np.concatenate([y, y[-1] + np.array([5000.0, -5000.0] * 5)])
+    assert predict_from_series_holt(3, 7, _index(jumpy), cache=cache) == reference.predict_from_series_holt(
+        3, 7, _index(jumpy).to_frame())
+    assert cache.refits == 2
+
+    stale = HoltStateCache(refit_seconds=0)
+    predict_from_series_holt(3, 7, _index(y), cache=stale)
+    predict_from_series_holt(3, 7, _index(y), cache=stale)
+    assert stale.refits == 2
+
+
+def test_custom_grid_bypasses_the_cache():
+    y = _walk(80, seed=4)
+    cache = HoltStateCache()
+    predict_from_series_holt(3, 7, _index(y), cache=cache)
+    grid = [0.25, 0.75]
+    got = predict_from_series_holt(3, 7, _index(y), grid_alpha=grid, grid_beta=grid, cache=cache)
+    assert got == _forecast(y, *reference._holt_cv_select(y, grid, grid))
+    assert (cache.refits, cache.hits) == (1, 0)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+import reference
+from current_budget_series_model import HOLT_GRID, _holt_cv_select, _holt_grid_mse
+
+
+def _walks(seed: int, lengths):
+    rng = np.random.default_rng(seed)
+    return [np.round(1000 + rng.normal(-5, 40, size=n).cumsum(), 2) for n in lengths]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_select_matches_nested_loops(seed):
+    for y in _walks(seed, list(range(1, 40)) + [100, 500]):
+        assert _holt_cv_select(y) == reference._holt_cv_select(y)
+
+
+@pytest.mark.parametrize("val_frac", [0.1, 0.2, 0.5])
+def test_select_matches_with_custom_grid_and_split(val_frac):
+    grid_a, grid_b = [0.05, 0.4, 0.95], [0.15, 0.6]
+    for y in _walks(7, [5, 17, 64, 250]):
+        assert (_holt_cv_select(y, grid_a, grid_b, val_frac)
+                == reference._holt_cv_select(y, grid_a, grid_b, val_frac))
+
+
+def test_ties_and_missing_values_pick_the_same_pair():
+    flat = np.full(30, 250.0)                      # every pair has zero error: first one wins
+    assert _holt_cv_select(flat) == reference._holt_cv_select(flat) == (0.1, 0.1)
+    holes = _walks(3, [40])[0]
+    holes[35] = np.nan                             # NaN validation error: defaults
+    assert _holt_cv_select(holes) == reference._holt_cv_select(holes)
+
+
+def test_stacked_series_match_one_at_a_time():
+    Y = np.stack(_walks(11, [60] * 8))
+    stacked = _holt_grid_mse(Y, HOLT_GRID, HOLT_GRID, 48)
+    for row, y in zip(stacked, Y):
+        np.testing.assert_array_equal(row, _holt_grid_mse(y, HOLT_GRID, HOLT_GRID, 48))
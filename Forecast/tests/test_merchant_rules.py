@@ -0,0 +1,62 @@
+import json
+import os
+
+import pytest
+
+import reference
+from merchant_rules import MerchantRules
+from synthetic import merchants
+
+
+def test_shipped_rules_match_the_baseline_chain():
+    rules = MerchantRules()
+    for merchant in merchants():
+        assert rules.categorize(merchant) == reference._guess_category(merchant), merchant
+
+
+@pytest.mark.parametrize("merchant, category", [
+    ("MOLDTELECOM", "Fuel"),          # "MOL" is a Fuel keyword and Fuel comes first
+    ("ORANGE MARKET", "Groceries"),
+    ("UBER TO FARMACIA", "Health"),
+    ("LC WAIKIKI PARK", "Transport"),
+    ("Zara", "Shopping"),
+])
+def test_first_listed_rule_wins(merchant, category):
+    assert MerchantRules().categorize(merchant) == category == reference._guess_category(merchant)
+
+
+def _write(path, rules, default="General"):
+    with open(path, "w") as f:
+        json.dump({"default": default, "rules": rules}, f)
+
+
+def test_prefix_keywords_in_later_rules(tmp_path):
+    path = str(tmp_path / "rules.json")
+    _write(path, [{"category": "Long", "keywords": ["ABCD"]}, {"category": "Short", "keywords": ["AB", "ABC"]}],
+           default="Other")
+    rules = MerchantRules(path, check_seconds=0)
+    assert rules.categorize("xabcdx") == "Long"
+    assert rules.categorize("xabcx") == "Short"
+    assert rules.categorize("xyz") == "Other"
+    assert rules.categorize(None) == "Other"
+
+
+def test_reload_on_change_and_keep_rules_on_bad_file(tmp_path):
+    path = str(tmp_path / "rules.json")
+    _write(path, [{"category": "Fuel", "keywords": ["LUKOIL"]}])
+    rules = MerchantRules(path, check_seconds=0)
+    reloads = []
+    rules.on_reload(lambda: reloads.append(rules.version))
+    assert rules.categorize("lukoil") == "Fuel"
+
+    _write(path, [{"category": "Petrol", "keywords": ["LUKOIL"]}])
+    os.utime(path, (1, 1))   # a new mtime even on coarse-grained filesystems
+    assert rules.categorize("lukoil") == "Petrol"
+    assert reloads == [2]
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    os.utime(path, (2, 2))
+    assert rules.categorize("lukoil") == "Petrol"
+    assert reloads == [2]
+    assert rules.stats()["rules"] == 1
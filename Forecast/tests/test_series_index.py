@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import reference
+from current_budget_series_model import SeriesIndex, predict_from_series_holt
+from synthetic import budget_frame
+
+
+def _baseline_rows(df: pd.DataFrame, key: str) -> np.ndarray:
+    s = df[df["user_id"] == key].sort_values(["date", "tx_id"])
+    return s["current_budget"].astype(float).to_numpy()
+
+
+@pytest.mark.parametrize("string_tx", [False, True])
+def test_series_matches_filter_and_sort(string_tx):
+    df = budget_frame(string_tx=string_tx)
+    index = SeriesIndex.from_frame(df)
+    keys = sorted(df["user_id"].dropna().unique())
+    assert list(index.keys) == keys
+    for key in keys:
+        np.testing.assert_array_equal(index.series(key), _baseline_rows(df, key))
+
+
+def test_null_user_id_rows_are_left_out():
+    df = budget_frame()
+    index = SeriesIndex.from_frame(df)
+    assert index.n_rows == df["user_id"].notna().sum()
+    assert None not in set(index.keys) and "None" not in index and "nan" not in index
+
+
+def test_null_tx_id_sorts_last_within_a_date():
+    df = pd.DataFrame({
+        "user_id": ["3", "3", "3"],
+        "tx_id": [None, "b", "a"],
+        "date": pd.to_datetime(["2024-01-01"] * 3),
+        "current_budget": [3.0, 2.0, 1.0],
+    })
+    np.testing.assert_array_equal(SeriesIndex.from_frame(df).series("3"), [1.0, 2.0, 3.0])
+
+
+@pytest.mark.parametrize("string_tx", [False, True])
+def test_forecast_matches_baseline(string_tx):
+    df = budget_frame(seed=1, string_tx=string_tx)
+    index = SeriesIndex.from_frame(df)
+    for user in range(3, 15):
+        assert predict_from_series_holt(user, 7, index) == reference.predict_from_series_holt(user, 7, df)
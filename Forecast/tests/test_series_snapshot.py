@@ -0,0 +1,75 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import reference
+from current_budget_series_model import SeriesIndex, SeriesStore, predict_from_series_holt
+from series_snapshot import read_snapshot, write_snapshot
+from synthetic import budget_frame
+
+
+def _assert_same_index(a: SeriesIndex, b: SeriesIndex):
+    assert list(a.keys) == list(b.keys)
+    np.testing.assert_array_equal(a.offsets, b.offsets)
+    np.testing.assert_array_equal(a.values, b.values)
+    np.testing.assert_array_equal(np.asarray(a.dates, dtype=np.int64), np.asarray(b.dates, dtype=np.int64))
+    for key in a.keys:
+        np.testing.assert_array_equal(a.series(key), b.series(key))
+
+
+def test_round_trip_numeric_tx(tmp_path):
+    df = budget_frame(seed=2)
+    index = SeriesIndex.from_frame(df)
+    manifest = write_snapshot(df, str(tmp_path))
+    loaded = read_snapshot(str(tmp_path))
+    assert manifest["rows"] == loaded.n_rows == index.n_rows
+    assert manifest["users"] == len(loaded) == len(index)
+    _assert_same_index(index, loaded)
+    np.testing.assert_array_equal(loaded.tx_ids, index.tx_ids)   # NaN tx_ids included
+    assert isinstance(loaded.values, np.memmap)
+
+
+def test_round_trip_string_tx(tmp_path):
+    df = budget_frame(seed=2, string_tx=True)
+    index = SeriesIndex.from_frame(df)
+    write_snapshot(index, str(tmp_path))
+    _assert_same_index(index, read_snapshot(str(tmp_path)))
+
+
+@pytest.mark.parametrize("string_tx", [False, True])
+def test_forecasts_from_snapshot_match_baseline(tmp_path, string_tx):
+    df = budget_frame(seed=3, string_tx=string_tx)
+    write_snapshot(df, str(tmp_path))
+    loaded = read_snapshot(str(tmp_path))
+    for user in range(3, 15):
+        assert predict_from_series_holt(user, 7, loaded) == reference.predict_from_series_holt(user, 7, df)
+
+
+def test_to_frame_rebuilds_the_rows(tmp_path):
+    df = budget_frame(seed=4)
+    write_snapshot(df, str(tmp_path))
+    _assert_same_index(SeriesIndex.from_frame(df), SeriesIndex.from_frame(read_snapshot(str(tmp_path)).to_frame()))
+
+
+def test_rewrite_replaces_the_column_files(tmp_path):
+    first = write_snapshot(budget_frame(seed=5), str(tmp_path))
+    second = write_snapshot(budget_frame(seed=6), str(tmp_path))
+    assert first["id"] != second["id"]
+    assert sorted(f for f in os.listdir(tmp_path) if f.endswith(".npy")) == sorted(second["files"].values())
+    _assert_same_index(SeriesIndex.from_frame(budget_frame(seed=6)), read_snapshot(str(tmp_path)))
+
+
+def test_unknown_version_is_refused(tmp_path):
+    write_snapshot(budget_frame(), str(tmp_path))
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps(dict(json.loads(path.read_text()), version=99)))
+    with pytest.raises(ValueError):
+        read_snapshot(str(tmp_path))
+
+
+def test_series_store_reads_a_snapshot_directory(tmp_path):
+    df = budget_frame(seed=7)
+    write_snapshot(df, str(tmp_path))
+    _assert_same_index(SeriesIndex.from_frame(df), SeriesStore(str(tmp_path)).index())
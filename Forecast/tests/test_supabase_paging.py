@@ -0,0 +1,165 @@
+import random
+import re
+
+import pytest
+
+import supabase_client
+from supabase_client import KEYSET, _after, fetch_series_from_supabase
+
+
+# --- a fake PostgREST: evaluates the `or=` logic tree and orders NULLs last ---
+
+def _split(s: str):
+    parts, depth, cur = [], 0, ""
+    for ch in s:
+        if ch == "," and depth == 0:
+            parts.append(cur)
+            cur = ""
+            continue
+        depth += (ch == "(") - (ch == ")")
+        cur += ch
+    return parts + [cur]
+
+
+def _unquote(v: str) -> str:
+    if v.startswith('"'):
+        return v[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return v
+
+
+def _matches(expr: str, row: dict) -> bool:
+    m = re.match(r"^(and|or)\((.*)\)$", expr)
+    if m:
+        results = [_matches(part, row) for part in _split(m.group(2))]
+        return all(results) if m.group(1) == "and" else any(results)
+    col, op, value = expr.split(".", 2)
+    x = row[col]
+    if op == "is":
+        assert value == "null"
+        return x is None
+    if x is None:
+        return False   # eq/gt never match NULL
+    v = type(x)(_unquote(value))
+    return {"eq": x == v, "gt": x > v}[op]
+
+
+def _order(row: dict):
+    return tuple((row[c] is None, row[c] if row[c] is not None else 0) for c in KEYSET)
+
+
+class _Query:
+    def __init__(self, client):
+        self.client, self.filter, self.n, self.ordered = client, None, None, []
+
+    def select(self, *_):
+        return self
+
+    def in_(self, *_):
+        return self
+
+    def gte(self, *_):
+        return self
+
+    def or_(self, f):
+        self.filter = f
+        return self
+
+    def order(self, col, nullsfirst=None):
+        assert nullsfirst is False
+        self.ordered.append(col)
+        return self
+
+    def limit(self, n):
+        self.n = n
+        return self
+
+    def execute(self):
+        assert tuple(self.ordered) == KEYSET
+        self.client.requests += 1
+        hits = [r for r in self.client.rows if self.filter is None or _matches(f"or({self.filter})", r)]
+        # Ties come back in arbitrary order, like a real server
+        self.client.rng.shuffle(hits)
+        return type("Response", (), {"data": sorted(hits, key=_order)[:self.n]})
+
+
+class _Client:
+    def __init__(self, rows, seed=0):
+        self.rows, self.requests, self.rng = rows, 0, random.Random(seed)
+
+    def table(self, _):
+        return _Query(self)
+
+
+def _rows(seed=0):
+    """Every (user_id, date, tx_id) key, NULLs included, on one to three rows."""
+    rng = random.Random(seed)
+    rows = []
+    for user in ("a", "b", None):
+        for date in (None, "2024-01-02", "2024-01-03", "2024-02-01T10:00:00"):
+            for tx in (None, 1, 2, 3):
+                for _ in range(rng.randint(1, 3)):
+                    # current_budget tells rows with the same key apart
+                    rows.append({"user_id": user, "date": date, "tx_id": tx, "current_budget": float(len(rows))})
+    return rows
+
+
+def _keys(df):
+    return [_order(r) for r in df[list(KEYSET)].astype(object).where(df[list(KEYSET)].notna(), None).to_dict("records")]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    c = _Client(_rows())
+    monkeypatch.setattr(supabase_client, "get_client", lambda: c)
+    return c
+
+
+@pytest.mark.parametrize("page_size", [3, 4, 7, 40, 1000])
+def test_paging_returns_every_row_once(client, page_size):
+    # Runs of equal keys (up to 3 rows) straddle page boundaries at every size
+    df = fetch_series_from_supabase(page_size=page_size)
+    assert sorted(df["current_budget"]) == [r["current_budget"] for r in client.rows]
+    assert _keys(df) == sorted(_keys(df))
+
+
+@pytest.mark.parametrize("page_size", [1, 2])
+def test_runs_longer_than_a_page_still_reach_every_key(client, page_size):
+    df = fetch_series_from_supabase(page_size=page_size)
+    assert sorted(set(_keys(df))) == sorted({_order(r) for r in client.rows})
+    assert df["current_budget"].is_unique
+
+
+def test_unique_keys_page_without_repeats(monkeypatch):
+    rows = [{"user_id": u, "date": f"2024-01-{d:02d}", "tx_id": t, "current_budget": 1.0}
+            for u in ("a", "b") for d in range(1, 11) for t in range(5)]
+    c = _Client(rows)
+    monkeypatch.setattr(supabase_client, "get_client", lambda: c)
+    df = fetch_series_from_supabase(page_size=10)
+    assert len(df) == len(rows)
+    assert c.requests <= len(rows) // 10 + 2
+
+
+def test_empty_table(monkeypatch):
+    monkeypatch.setattr(supabase_client, "get_client", lambda: _Client([]))
+    df = fetch_series_from_supabase(columns=["user_id", "current_budget"])
+    assert df.empty and list(df.columns) == ["user_id", "current_budget"]
+
+
+def test_after_filter():
+    last = {"user_id": "a", "date": "2024-01-02T10:00:00", "tx_id": 5}
+    assert _after(last) == (
+        'or(user_id.gt."a",user_id.is.null),'
+        'and(user_id.eq."a",or(date.gt."2024-01-02T10:00:00",date.is.null)),'
+        'and(user_id.eq."a",date.eq."2024-01-02T10:00:00",or(tx_id.gt."5",tx_id.is.null))'
+    )
+    assert _after(last, inclusive=True).endswith(
+        ',and(user_id.eq."a",date.eq."2024-01-02T10:00:00",tx_id.eq."5")')
+
+
+def test_after_filter_with_null_keys():
+    last = {"user_id": "a", "date": None, "tx_id": None}
+    assert _after(last) == 'or(user_id.gt."a",user_id.is.null)'
+    assert _after(last, inclusive=True) == (
+        'or(user_id.gt."a",user_id.is.null),and(user_id.eq."a",date.is.null,tx_id.is.null)')
+    # Nothing sorts after an all-NULL key
+    assert _after({"user_id": None, "date": None, "tx_id": None}) is None
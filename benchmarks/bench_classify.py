@@ -0,0 +1,112 @@
+# bench_classify.py (category classifier: latency and throughput by batch size and torch threads)
+#
+# Uses Classify/category_classifier.pth when it holds real weights; otherwise a
+# randomly initialised model of the same shape (timings do not depend on the
+# weights). Uses the GPT-2 tokenizer when tiktoken has it cached; otherwise a
+# byte-level stand-in. Both choices are recorded in the results.
+
+import os
+
+import numpy as np
+
+from common import CLASSIFY_DIR, add_path, measure
+
+# Same as BASE_CONFIG in Classify/api.py
+BASE_CONFIG = {
+    "vocab_size": 50257,
+    "context_length": 1024,
+    "emb_dim": 768,
+    "n_heads": 12,
+    "n_layers": 12,
+    "drop_rate": 0.0,
+    "qkv_bias": True,
+}
+NUM_CLASSES = 16
+
+_MERCHANTS = ["KAUFLAND", "LINELLA", "GREEN HILLS", "NETFLIX", "UBER", "YANGO", "LUKOIL", "ORANGE", "APTEKA",
+              "STARBUCKS", "ZARA", "H&M", "SALARY", "RENT", "MOLDTELECOM", "FELICIA"]
+_SUFFIXES = ["CHISINAU", "BALTI", "monthly subscription", "trip", "card *4821", "store #0871", "online", ""]
+
+
+class _ByteTokenizer:
+    """Offline stand-in for the GPT-2 encoding: one token per byte."""
+
+    def encode(self, text, **kwargs):
+        return list(text.encode("utf-8"))
+
+    def encode_batch(self, texts, **kwargs):
+        return [self.encode(t) for t in texts]
+
+
+def synthetic_texts(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    return [f"{rng.choice(_MERCHANTS)} {rng.integers(1, 9999)} {rng.choice(_SUFFIXES)}".strip() for _ in range(n)]
+
+
+def _load_model(torch, GPTModel):
+    torch.manual_seed(0)
+    model = GPTModel(BASE_CONFIG)
+    model.out_head = torch.nn.Linear(BASE_CONFIG["emb_dim"], NUM_CLASSES)
+    weights = "random"
+    path = os.path.join(CLASSIFY_DIR, "category_classifier.pth")
+    try:
+        model.load_state_dict(torch.load(path, map_location="cpu", weights_only=True))
+        weights = "category_classifier.pth"
+    except Exception:
+        pass  # missing, or a Git LFS pointer
+    model.eval()
+    return model, weights
+
+
+def _load_tokenizer():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("gpt2"), "gpt2"
+    except Exception:
+        return _ByteTokenizer(), "bytes"
+
+
+def run(quick: bool = False) -> dict:
+    add_path(CLASSIFY_DIR)
+    import torch
+    from classify import GPTModel, eval as classify_eval, eval_batch
+
+    model, weights = _load_model(torch, GPTModel)
+    tokenizer, tokenizer_name = _load_tokenizer()
+    batch_sizes = [1, 8, 32] if quick else [1, 8, 32, 64, 128]
+    threads = sorted({1, os.cpu_count() or 1} if quick else {1, 2, 4, os.cpu_count() or 1})
+    n_texts = 64 if quick else 128
+    texts = synthetic_texts(n_texts)
+    repeat = 2 if quick else 3
+
+    out = {"model": {"weights": weights, "tokenizer": tokenizer_name, "texts": n_texts}, "eval": {}}
+    default_threads = torch.get_num_threads()
+    try:
+        for t in threads:
+            torch.set_num_threads(t)
+            for bs in batch_sizes:
+                if bs == 1:
+                    # classify.eval: one text per forward pass, as POST /classify without batching
+                    texts_1 = texts[: max(8, n_texts // 8)]
+
+                    def fn():
+                        with torch.no_grad():
+                            for text in texts_1:
+                                classify_eval(text, model, tokenizer, "cpu")
+                    per_call = len(texts_1)
+                else:
+                    chunks = [texts[i:i + bs] for i in range(0, n_texts, bs)]
+
+                    def fn():
+                        with torch.no_grad():
+                            for chunk in chunks:
+                                eval_batch(chunk, model, tokenizer, "cpu")
+                    per_call = n_texts
+                # ms per text; per_s = texts per second
+                result = measure(fn, repeat=repeat, per_call=per_call)
+                # and latency of a whole batch, as a caller waiting for it sees it
+                result["batch_latency_ms"] = round(result["median_ms"] * bs, 4)
+                out["eval"][f"threads{t}_batch{bs}"] = result
+    finally:
+        torch.set_num_threads(default_threads)
+    return out
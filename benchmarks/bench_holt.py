@@ -0,0 +1,63 @@
+# bench_holt.py (Holt forecasting: grid selection and per-user prediction on synthetic series)
+
+import numpy as np
+import pandas as pd
+
+from common import FORECAST_DIR, add_path, measure
+
+
+def synthetic_series(n_users: int, length: int, seed: int = 0) -> pd.DataFrame:
+    """`n_users` users (ids 3, 4, ...) with `length` budget values each: a drifting random walk."""
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(-5.0, 40.0, size=(n_users, length))
+    budgets = np.round(1000.0 + np.cumsum(steps, axis=1), 2)
+    start = np.datetime64("2024-01-01T00:00")
+    hours = np.sort(rng.integers(0, 24 * 365, size=(n_users, length)), axis=1)
+    return pd.DataFrame({
+        "user_id": np.repeat(np.arange(3, 3 + n_users), length),
+        "tx_id": np.tile(np.arange(length), n_users),
+        "date": (start + hours.astype("timedelta64[h]")).ravel(),
+        "current_budget": budgets.ravel(),
+    })
+
+
+def run(quick: bool = False) -> dict:
+    add_path(FORECAST_DIR)
+    from current_budget_series_model import (HoltStateCache, SeriesIndex, _holt_cv_select,
+                                             predict_from_series_holt, predict_many_holt)
+
+    lengths = [20, 100] if quick else [20, 100, 500, 2000]
+    user_counts = [100] if quick else [100, 1000]
+    repeat = 3 if quick else 7
+    out = {"holt_cv_select": {}, "predict_from_series_holt": {}, "predict_many_holt": {}}
+
+    for length in lengths:
+        y = synthetic_series(1, length, seed=length)["current_budget"].to_numpy()
+        out["holt_cv_select"][f"len{length}"] = measure(lambda: _holt_cv_select(y), repeat=repeat)
+
+    for n_users in user_counts:
+        for length in lengths:
+            index = SeriesIndex.from_frame(synthetic_series(n_users, length, seed=n_users + length))
+            users = list(range(3, 3 + min(n_users, 50)))
+            case = f"users{n_users}_len{length}"
+
+            def cold():
+                for u in users:
+                    predict_from_series_holt(u, 7, index)
+
+            cache = HoltStateCache()
+            for u in users:
+                predict_from_series_holt(u, 7, index, cache=cache)
+
+            def cached():
+                for u in users:
+                    predict_from_series_holt(u, 7, index, cache=cache)
+
+            out["predict_from_series_holt"][case] = {
+                "cold": measure(cold, repeat=repeat, per_call=len(users)),
+                "cached": measure(cached, repeat=repeat, per_call=len(users)),
+            }
+            requests = [(u, 7) for u in range(3, 3 + n_users)]
+            out["predict_many_holt"][case] = measure(lambda: predict_many_holt(requests, index), repeat=repeat,
+                                                     per_call=n_users)
+    return out
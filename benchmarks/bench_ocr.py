@@ -0,0 +1,48 @@
+# bench_ocr.py (run_ocr end to end on receipt fixtures)
+#
+# Fixtures: every .jpg/.png in benchmarks/fixtures/receipts (or --ocr-images),
+# else the rendered receipts from ocr-api/bench_prep.py (fixed seed). Needs
+# EasyOCR and its model files; the suite is skipped when they are missing.
+
+import os
+
+from common import OCR_DIR, ROOT, add_path, measure, summarize
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures", "receipts")
+
+
+def run(quick: bool = False, images_dir: str = None) -> dict:
+    add_path(OCR_DIR)
+    try:
+        import easyocr  # noqa: F401
+        import ocr_server as o
+        from bench_prep import load_images, synthetic_receipts
+    except ImportError as e:
+        return {"skipped": f"OCR dependencies missing: {e}"}
+
+    images_dir = images_dir or (FIXTURES_DIR if os.path.isdir(FIXTURES_DIR) else None)
+    samples = load_images(images_dir) if images_dir else []
+    source = images_dir
+    if not samples:
+        samples = synthetic_receipts(3 if quick else 8)
+        source = f"synthetic:{len(samples)}"
+    if quick:
+        samples = samples[:3]
+
+    decoded = [(name, o._decode_image(raw)) for name, raw, _ in samples]
+    o.MODELS.get()  # model load is not part of the timings
+
+    out = {"fixtures": {"source": source, "images": len(decoded)}, "run_ocr": {}, "stages": {}}
+    for prep in o.PREP_MODES:
+        stages = {}
+
+        def fn():
+            for _, img in decoded:
+                info = {}
+                o.run_ocr(img, prep=prep, info=info)
+                for stage, ms in info["timings_ms"].items():
+                    stages.setdefault(stage, []).append(ms)
+
+        out["run_ocr"][prep] = measure(fn, repeat=1 if quick else 3, warmup=1, per_call=len(decoded))
+        out["stages"][prep] = {stage: summarize(ms) for stage, ms in stages.items()}
+    return out
@@ -0,0 +1,109 @@
+# common.py (timing, run metadata and result comparison shared by the benchmark suites)
+
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORECAST_DIR = os.path.join(ROOT, "Forecast")
+CLASSIFY_DIR = os.path.join(FORECAST_DIR, "Classify")
+OCR_DIR = os.path.join(ROOT, "finance-assistant", "fintech-ui", "ocr-api")
+
+
+def add_path(path: str) -> None:
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, warmup: int = 1, per_call: int = 1) -> dict:
+    """
+    Run `fn` `warmup` times untimed, then `repeat` times timed.
+    Times are in ms per call; with `per_call` > 1 each run counts as that many calls
+    (e.g. one batch of 64 texts) and `per_s` is calls per second.
+    """
+    for _ in range(warmup):
+        fn()
+    runs: List[float] = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000.0 / per_call)
+    return summarize(runs)
+
+
+def summarize(runs_ms: List[float]) -> dict:
+    runs = sorted(runs_ms)
+    median = statistics.median(runs)
+    return {
+        "median_ms": round(median, 4),
+        "p95_ms": round(runs[min(len(runs) - 1, int(0.95 * len(runs)))], 4),
+        "min_ms": round(runs[0], 4),
+        "runs": len(runs),
+        "per_s": round(1000.0 / median, 2) if median > 0 else None,
+    }
+
+
+def _version(module: str) -> Optional[str]:
+    try:
+        return getattr(__import__(module), "__version__", "unknown")
+    except Exception:
+        return None
+
+
+def run_metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": _version("numpy"),
+        "pandas": _version("pandas"),
+        "torch": _version("torch"),
+        "opencv": _version("cv2"),
+    }
+
+
+def _timings(results: dict, prefix: str = "") -> Dict[str, float]:
+    """Flatten {"suite": {"case": {"median_ms": ...}}} into {"suite.case": median_ms}."""
+    out = {}
+    for key, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        name = f"{prefix}.{key}" if prefix else key
+        if "median_ms" in value:
+            out[name] = value["median_ms"]
+        else:
+            out.update(_timings(value, name))
+    return out
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.15) -> dict:
+    """Cases whose median got slower (or faster) than `baseline` by more than `threshold`."""
+    old, new = _timings(baseline.get("results", {})), _timings(current.get("results", {}))
+    slower, faster = [], []
+    for name in sorted(set(old) & set(new)):
+        if old[name] <= 0:
+            continue
+        ratio = new[name] / old[name]
+        row = {"case": name, "baseline_ms": old[name], "current_ms": new[name], "ratio": round(ratio, 3)}
+        if ratio > 1 + threshold:
+            slower.append(row)
+        elif ratio < 1 - threshold:
+            faster.append(row)
+    return {
+        "baseline_commit": baseline.get("meta", {}).get("commit"),
+        "threshold": threshold,
+        "compared": len(set(old) & set(new)),
+        "regressions": slower,
+        "improvements": faster,
+    }
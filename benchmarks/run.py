@@ -0,0 +1,77 @@
+# run.py (offline benchmark harness)
+#
+#   python benchmarks/run.py                          # all suites, JSON to stdout
+#   python benchmarks/run.py --suite holt,classify --quick
+#   python benchmarks/run.py --out bench-$(git rev-parse --short HEAD).json
+#   python benchmarks/run.py --compare bench-main.json --threshold 0.15
+#
+# Suites: holt (Forecast Holt model), classify (category classifier),
+# ocr (run_ocr on receipt fixtures). Everything runs on synthetic or fixture
+# data with fixed seeds; no server, database or network is needed.
+# With --compare, cases whose median is slower than the baseline by more than
+# --threshold are listed and the exit status is 1.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import compare, run_metadata  # noqa: E402
+
+SUITES = ("holt", "classify", "ocr")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Offline benchmarks for the forecast, classifier and OCR hot paths")
+    ap.add_argument("--suite", default=",".join(SUITES), help=f"comma-separated subset of {SUITES}")
+    ap.add_argument("--quick", action="store_true", help="smaller inputs and fewer repeats (smoke run)")
+    ap.add_argument("--ocr-images", help="receipt photos for the ocr suite (default benchmarks/fixtures/receipts)")
+    ap.add_argument("--out", help="write the JSON results to this file")
+    ap.add_argument("--compare", help="baseline JSON from an earlier run")
+    ap.add_argument("--threshold", type=float, default=0.15, help="relative slowdown that counts as a regression")
+    args = ap.parse_args()
+
+    suites = [s.strip() for s in args.suite.split(",") if s.strip()]
+    unknown = [s for s in suites if s not in SUITES]
+    if unknown:
+        ap.error(f"unknown suite(s) {unknown}; expected any of {SUITES}")
+
+    report = {"meta": {**run_metadata(), "quick": args.quick, "suites": suites}, "results": {}}
+    for suite in suites:
+        t0 = time.perf_counter()
+        print(f"running {suite}...", file=sys.stderr)
+        if suite == "holt":
+            import bench_holt
+            result = bench_holt.run(args.quick)
+        elif suite == "classify":
+            import bench_classify
+            result = bench_classify.run(args.quick)
+        else:
+            import bench_ocr
+            result = bench_ocr.run(args.quick, args.ocr_images)
+        report["results"][suite] = result
+        report["meta"][f"{suite}_seconds"] = round(time.perf_counter() - t0, 1)
+
+    status = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(baseline, report, args.threshold)
+        for row in report["comparison"]["regressions"]:
+            print(f"SLOWER  {row['case']}: {row['baseline_ms']} -> {row['current_ms']} ms (x{row['ratio']})",
+                  file=sys.stderr)
+        status = 1 if report["comparison"]["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
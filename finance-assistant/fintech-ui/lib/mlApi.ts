@@ -19,6 +19,10 @@ export type AnalyzeResponse = {
   advice: string[];
 };
 
+export type AnalyzeBatchResponse = {
+  results: AnalyzeResponse[];
+};
+
 export type ForecastResponse = {
   user_id: string;
   n: number;
@@ -30,9 +34,9 @@ const BASE =
   process.env.ML_API_URL?.replace(/\/$/, "") ||
   "http://localhost:8091";
 
-async function doJson<T>(path: string, init?: RequestInit): Promise<T> {
+async function doJson<T>(path: string, init?: RequestInit, timeoutMs = 8000): Promise<T> {
   const ctrl = new AbortController();
-  const t = setTimeout(() => ctrl.abort(), 8000);
+  const t = setTimeout(() => ctrl.abort(), timeoutMs);
   try {
     const method = ((init?.method as string) || "GET").toUpperCase();
     const hdrs: Record<string, string> = { ...(init?.headers as any) };
@@ -62,6 +66,18 @@ export async function analyzeTransaction(body: AnalyzeRequest): Promise<AnalyzeR
   });
 }
 
+// Analyze many transactions (e.g. an imported statement) in one request.
+// Results come back in the same order as `items`.
+export async function analyzeTransactions(items: AnalyzeRequest[]): Promise<AnalyzeResponse[]> {
+  if (!items.length) return [];
+  const resp = await doJson<AnalyzeBatchResponse>(
+    `/analyze/batch`,
+    { method: "POST", body: JSON.stringify({ items }) },
+    30000
+  );
+  return resp.results;
+}
+
 export async function getForecast(user_id: string | number, n = 6): Promise<ForecastResponse> {
   const qs = new URLSearchParams({ user_id: String(user_id), n: String(n) }).toString();
   return doJson<ForecastResponse>(`/forecast?${qs}`);
@@ -0,0 +1,155 @@
+# bench_prep.py
+# Compare the standard and fast preprocessing paths (OCR_PREP) on speed and OCR accuracy.
+#
+#   python bench_prep.py                        # 8 synthetic receipts, both modes, with EasyOCR
+#   python bench_prep.py --images ./receipts    # your photos; r1.jpg + r1.txt (ground truth) if available
+#   python bench_prep.py --no-ocr --repeat 5    # preprocessing time only (no models needed)
+#   python bench_prep.py --out prep.json
+#
+# Accuracy is the character similarity (difflib ratio) of the OCR text against the
+# ground truth; for photos without a .txt, against the standard path's text.
+# Whether the extracted total matches is reported as well.
+
+import argparse
+import difflib
+import glob
+import json
+import os
+import statistics
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+_ITEMS = ["PAINE ALBA", "LAPTE 2.5% 1L", "CAFEA LAVAZZA", "BANANE KG", "APA PLATA 2L", "OUA 10 BUC",
+          "CASCAVAL", "ROSII", "ZAHAR 1KG", "ULEI FLOARE", "CIOCOLATA", "IAURT NATURAL"]
+_MERCHANTS = ["KAUFLAND SRL", "LINELLA SRL", "GREEN HILLS MARKET", "FELICIA SRL"]
+
+
+def synthetic_receipts(n: int = 8, seed: int = 0) -> List[Tuple[str, bytes, str]]:
+    """(name, jpeg bytes, ground-truth text) for `n` rendered receipts photographed at an angle."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for k in range(n):
+        lines = [_MERCHANTS[k % len(_MERCHANTS)], "STR. TEST 1 CHISINAU",
+                 f"{rng.integers(1, 28):02d}.0{rng.integers(1, 9)}.2024 {rng.integers(8, 21):02d}:{rng.integers(0, 59):02d}"]
+        total = 0.0
+        for name in rng.choice(_ITEMS, size=int(rng.integers(4, 10)), replace=False):
+            price = round(float(rng.integers(5, 200)) + float(rng.integers(0, 99)) / 100, 2)
+            total += price
+            lines.append(f"{name}  {price:.2f}".replace(".", ","))
+        lines.append(f"TOTAL  {total:.2f} MDL".replace(".", ",", 1))
+
+        # Paper: 80 mm wide receipt, ~10 px per mm
+        scale = float(rng.uniform(0.9, 1.3))
+        paper = np.full((int((len(lines) * 60 + 120) * scale), int(800 * scale), 3), 250, np.uint8)
+        for i, line in enumerate(lines):
+            cv2.putText(paper, line, (int(40 * scale), int((80 + i * 60) * scale)), cv2.FONT_HERSHEY_SIMPLEX,
+                        1.1 * scale, (30, 30, 30), max(1, int(2 * scale)), cv2.LINE_AA)
+
+        # Photo: paper warped onto a darker table with some perspective
+        ph, pw = paper.shape[:2]
+        H, W = int(ph * 1.4), int(pw * 1.8)
+        src = np.float32([[0, 0], [pw, 0], [0, ph], [pw, ph]])
+        jitter = rng.uniform(-0.04, 0.04, size=(4, 2)) * [pw, ph]
+        dst = np.float32([[0.35 * pw, 0.15 * ph], [1.35 * pw, 0.15 * ph], [0.35 * pw, 1.2 * ph], [1.35 * pw, 1.2 * ph]]) + jitter
+        photo = cv2.warpPerspective(paper, cv2.getPerspectiveTransform(src, dst.astype(np.float32)), (W, H),
+                                    borderValue=(70, 60, 50))
+        noise = rng.normal(0, 6, photo.shape)
+        photo = np.clip(photo.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+        jpg = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 88])[1].tobytes()
+        out.append((f"synthetic_{k:02d}", jpg, "\n".join(lines)))
+    return out
+
+
+def load_images(folder: str) -> List[Tuple[str, bytes, Optional[str]]]:
+    out = []
+    for path in sorted(glob.glob(os.path.join(folder, "*"))):
+        if os.path.splitext(path)[1].lower() not in (".jpg", ".jpeg", ".png"):
+            continue
+        with open(path, "rb") as f:
+            raw = f.read()
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        truth = open(truth_path, encoding="utf-8").read() if os.path.exists(truth_path) else None
+        out.append((os.path.basename(path), raw, truth))
+    return out
+
+
+def _similarity(a: str, b: str) -> float:
+    norm = lambda s: " ".join(s.upper().split())
+    return difflib.SequenceMatcher(None, norm(a), norm(b), autojunk=False).ratio()
+
+
+def _summary(values: List[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+    return {
+        "median": round(statistics.median(values), 2),
+        "p95": round(values[min(len(values) - 1, int(0.95 * len(values)))], 2),
+        "mean": round(statistics.fmean(values), 2),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compare OCR preprocessing modes")
+    ap.add_argument("--images", help="folder of receipt photos (optional .txt ground truth next to each)")
+    ap.add_argument("--synthetic", type=int, default=8, help="rendered receipts to use without --images")
+    ap.add_argument("--modes", default="standard,fast")
+    ap.add_argument("--repeat", type=int, default=3, help="preprocessing runs per image (median is kept)")
+    ap.add_argument("--no-ocr", action="store_true", help="only time preprocessing")
+    ap.add_argument("--out", help="write the JSON report here as well")
+    args = ap.parse_args()
+
+    import ocr_server as o
+
+    samples = load_images(args.images) if args.images else synthetic_receipts(args.synthetic)
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    report = {"images": len(samples), "source": args.images or f"synthetic:{args.synthetic}", "modes": {}}
+    texts = {}
+
+    for mode in modes:
+        stages, sizes, ocr_ms, sims, totals = {}, [], [], [], []
+        for name, raw, truth in samples:
+            img = o._decode_image(raw)
+            runs = []
+            for _ in range(max(1, args.repeat)):
+                timings = {}
+                t0 = time.perf_counter()
+                prep = o.rectify_receipt_fast(img, timings=timings) if mode == "fast" else o.rectify_receipt(img)
+                timings["rectify"] = (time.perf_counter() - t0) * 1000.0
+                runs.append(timings)
+            for stage in runs[0]:
+                stages.setdefault(stage, []).append(statistics.median(r[stage] for r in runs))
+            sizes.append(max(prep.shape[:2]))
+
+            if args.no_ocr:
+                continue
+            info = {}
+            text, _, _ = o.run_ocr(img, strategy="sequential", prep=mode, info=info)
+            ocr_ms.append(info["timings_ms"]["total"])
+            texts[(mode, name)] = text
+            ref = truth if truth is not None else texts.get((modes[0], name))
+            if ref is not None:
+                sims.append(_similarity(text, ref))
+                want = o.extract_fields(ref.splitlines())["total"]
+                if want is not None:
+                    totals.append(o.extract_fields(text.splitlines())["total"] == want)
+
+        report["modes"][mode] = {
+            "prep_ms": {stage: _summary(v) for stage, v in stages.items()},
+            "output_long_edge_px": _summary([float(s) for s in sizes]),
+            "ocr_total_ms": _summary(ocr_ms),
+            "text_similarity": round(statistics.fmean(sims), 4) if sims else None,
+            "total_match_rate": round(sum(totals) / len(totals), 4) if totals else None,
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
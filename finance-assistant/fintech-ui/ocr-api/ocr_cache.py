@@ -0,0 +1,213 @@
+# ocr_cache.py
+# Remembers OCR results so re-uploads of the same receipt skip rectification and EasyOCR.
+#
+# Two keys per result:
+#   - sha256 of the uploaded bytes: the client retrying the very same file
+#   - a 256-bit difference hash (dHash) of the downscaled grayscale image: the same
+#     photo re-encoded, resized or re-shared through a messenger
+# Near-duplicate matching is off by default (OCR_CACHE_NEAR_BITS=0): receipts share a
+# layout, so a coarse hash alone cannot tell two of them apart. When enabled, a candidate
+# must be within `near_bits` differing bits, have the same aspect ratio, come from the
+# same `scope` (the uploading user) and pass a pixel comparison of small grayscale
+# thumbnails; anything else is a miss.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+HASH_W, HASH_H = 17, 16          # 16 x 16 horizontal gradients = 256 bits
+ASPECT_TOLERANCE = 0.03
+THUMB_W = 256                    # width of the confirmation thumbnail
+THUMB_TILE = 8
+# Same photo re-encoded/resized: mean |diff| <1.5 grey levels, worst 8x8 tile <12.
+# Two different receipts: mean ~10, worst tile >70. The same receipt with one
+# price changed: mean ~0.04 (a whole-image figure cannot see it), worst tile ~30.
+THUMB_MAX_MEAN = 2.0
+THUMB_MAX_TILE = 14.0
+
+
+def content_key(raw) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def image_dhash(raw) -> Optional[Tuple[bytes, float, np.ndarray]]:
+    """
+    (dHash as 32 bytes, width / height, THUMB_W-wide grayscale thumbnail) of an
+    encoded image, or None if it does not decode.
+    """
+    # Full-resolution decode: a 1/8-scale one blurs text too much for the thumbnail check
+    gray = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None or gray.size == 0:
+        return None
+    small = cv2.resize(gray, (HASH_W, HASH_H), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = small[:, 1:] > small[:, :-1]
+    thumb_h = max(1, int(round(THUMB_W * gray.shape[0] / gray.shape[1])))
+    thumb = cv2.resize(gray, (THUMB_W, thumb_h), interpolation=cv2.INTER_AREA)
+    return np.packbits(bits).tobytes(), gray.shape[1] / gray.shape[0], thumb
+
+
+def same_picture(a: np.ndarray, b: np.ndarray) -> bool:
+    """Whether two thumbnails show the same photo (up to re-encoding and resizing)."""
+    if a.shape != b.shape:
+        b = cv2.resize(b, (a.shape[1], a.shape[0]), interpolation=cv2.INTER_AREA)
+    diff = cv2.absdiff(a, b)
+    # Mean |diff| per tile: one changed digit is a small dense blob that resampling noise is not
+    tiles = cv2.resize(diff, (max(1, diff.shape[1] // THUMB_TILE), max(1, diff.shape[0] // THUMB_TILE)),
+                       interpolation=cv2.INTER_AREA)
+    return float(diff.mean()) <= THUMB_MAX_MEAN and float(tiles.max()) <= THUMB_MAX_TILE
+
+
+class ResultCache:
+    """
+    Size-bounded LRU of OCR response bodies with a per-entry TTL. Thread-safe.
+
+    Entries are stored per `variant` (OCR strategy and preprocessing mode), so
+    a result computed one way is never served for a request asking for another.
+    Exact (byte-identical) hits are served to anyone; near-duplicate hits only
+    within the same `scope`. With `path` set, load()/save() keep the entries
+    across restarts (without the thumbnails, so restored entries only match exactly).
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 3600.0, near_bits: int = 0,
+                 path: Optional[str] = None):
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl)
+        self.near_bits = max(0, int(near_bits))
+        self.path = path or None
+        # "<sha256>:<variant>" -> (body, dhash bytes or None, aspect, stored_at, scope, thumbnail or None)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Packed dHashes of all entries, rebuilt lazily after a change
+        self._matrix: Optional[Tuple[list, np.ndarray, np.ndarray]] = None
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(sha: str, variant: str) -> str:
+        return f"{sha}:{variant}"
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def get(self, key: str) -> Optional[Tuple[dict, float]]:
+        """(body, age in seconds) for an exact match, else None."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry[3], now):
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0], now - entry[3]
+
+    def get_near(self, dhash: Optional[Tuple[bytes, float, np.ndarray]], variant: str,
+                 scope: Optional[str]) -> Optional[Tuple[dict, float, int]]:
+        """(body, age, differing bits) of the closest confirmed near-duplicate from `scope`, else None."""
+        if not self.near_bits or dhash is None or not scope:
+            self.misses += 1
+            return None
+        bits, aspect, thumb = dhash
+        now = time.time()
+        with self._lock:
+            keys, hashes, aspects = self._hash_matrix()
+            if not keys:
+                self.misses += 1
+                return None
+            query = np.frombuffer(bits, dtype=np.uint8)
+            dist = np.unpackbits(hashes ^ query, axis=1).sum(axis=1)
+            dist[np.abs(aspects - aspect) > ASPECT_TOLERANCE * aspect] = 1 << 16
+            suffix = f":{variant}"
+            for i in np.argsort(dist, kind="stable").tolist():
+                if dist[i] > self.near_bits:
+                    break
+                entry = self._data.get(keys[i])
+                if (keys[i].endswith(suffix) and entry is not None and not self._expired(entry[3], now)
+                        and entry[4] == scope and entry[5] is not None and same_picture(thumb, entry[5])):
+                    self._data.move_to_end(keys[i])
+                    self.near_hits += 1
+                    return entry[0], now - entry[3], int(dist[i])
+            self.misses += 1
+            return None
+
+    def _hash_matrix(self):
+        if self._matrix is None:
+            items = [(k, e[1], e[2]) for k, e in self._data.items() if e[1] is not None]
+            keys = [k for k, _, _ in items]
+            hashes = (np.frombuffer(b"".join(h for _, h, _ in items), dtype=np.uint8).reshape(len(items), -1)
+                      if items else np.zeros((0, 32), dtype=np.uint8))
+            aspects = np.array([a for _, _, a in items], dtype=float)
+            self._matrix = (keys, hashes, aspects)
+        return self._matrix
+
+    def put(self, key: str, body: dict, dhash: Optional[Tuple[bytes, float, np.ndarray]] = None,
+            scope: Optional[str] = None) -> None:
+        bits, aspect, thumb = dhash if dhash is not None else (None, 0.0, None)
+        with self._lock:
+            self._data[key] = (body, bits, aspect, time.time(), scope or None, thumb)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._matrix = None
+
+    def save(self) -> None:
+        """Write the live entries to `path` (atomically); no-op without a path."""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[k, body, t] for k, (body, _, _, t, _, _) in self._data.items() if not self._expired(t, now)]
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"entries": entries}, f)
+        os.replace(tmp, self.path)
+
+    def load(self) -> int:
+        """Restore entries from `path`; returns how many were loaded."""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring OCR cache file {self.path}: {e}")
+            return 0
+        now = time.time()
+        with self._lock:
+            for entry in saved.get("entries", [])[-self.max_size:]:
+                if len(entry) != 3:
+                    continue  # written by an older version
+                key, body, stored_at = entry
+                if not self._expired(stored_at, now):
+                    self._data[key] = (body, None, 0.0, stored_at, None, None)
+            self._matrix = None
+            return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "near_bits": self.near_bits,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "persisted": bool(self.path),
+        }
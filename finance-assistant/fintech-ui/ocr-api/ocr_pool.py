@@ -0,0 +1,348 @@
+# ocr_pool.py
+# Runs OCR jobs off the event loop: on worker processes (each with its own EasyOCR
+# Reader) or, with workers=0, on a single background thread in the server process.
+#
+# Every job gets a Job record that can be awaited directly (POST /ocr). Jobs passed
+# to track() can also be polled later by id (POST /ocr/jobs + GET /ocr/jobs/{id});
+# untracked jobs and their results are dropped once nobody holds them.
+
+import asyncio
+import multiprocessing as mp
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+
+class PoolBusy(Exception):
+    """The job queue is full."""
+
+
+class JobTimeout(Exception):
+    """A job ran longer than the pool's timeout."""
+
+
+class JobFailed(Exception):
+    """The job raised, or its worker died."""
+
+
+def _worker_main(conn, initializer: Optional[Callable[[], None]]) -> None:
+    # Entry point of a worker process: run jobs until the pipe closes
+    if initializer is not None:
+        initializer()
+    conn.send(("ready", None))
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+        fn, args, kwargs = msg
+        try:
+            conn.send(("ok", fn(*args, **kwargs)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, ctx, initializer):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, initializer), daemon=True)
+        self.proc.start()
+        child.close()
+        self.started_at = time.time()
+
+    def kill(self) -> None:
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(5)
+        self.conn.close()
+
+
+def _wait_ready(worker: _Worker) -> bool:
+    try:
+        return worker.conn.recv()[0] == "ready"
+    except (EOFError, OSError):
+        return False
+
+
+def _roundtrip(worker: _Worker, msg, timeout: float):
+    """Send one job to `worker` and wait for its reply. Runs on a waiter thread."""
+    try:
+        worker.conn.send(msg)
+        if not worker.conn.poll(timeout if timeout > 0 else None):
+            return "timeout", None
+        return worker.conn.recv()
+    except (EOFError, OSError, BrokenPipeError):
+        return "dead", None
+
+
+class Job:
+    __slots__ = ("id", "status", "result", "error", "created_at", "started_at", "finished_at",
+                 "_task", "_worker", "_pool")
+
+    def __init__(self, pool: "OcrPool"):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"           # queued | running | done | failed | cancelled
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._worker = None
+        self._pool = pool
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    async def wait(self):
+        """Result of the job; raises JobTimeout/JobFailed/CancelledError like the job did."""
+        return await asyncio.shield(self._task)
+
+    def add_done_callback(self, fn: Callable[["Job"], None]) -> None:
+        """Call `fn(job)` on the event loop once the job has finished, however it ended."""
+        self._task.add_done_callback(lambda _: fn(self))
+
+    def cancel(self) -> bool:
+        """Cancel a queued job, or stop a running one (its worker process is replaced)."""
+        if self.finished:
+            return False
+        self.status = "cancelled"
+        self.finished_at = time.time()
+        if isinstance(self._worker, _Worker):
+            self._worker.kill()
+        self._task.cancel()
+        return True
+
+    def to_dict(self) -> dict:
+        out = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "done":
+            out["result"] = self.result
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class OcrPool:
+    """
+    Bounded OCR execution.
+
+    - workers > 0: that many worker processes, started with `start_method`
+      ("spawn" by default, so no torch state is inherited across fork). Each
+      runs `initializer` once (e.g. to build its own Reader). A job that
+      exceeds `timeout` seconds, or is cancelled while running, has its
+      worker killed and replaced.
+    - workers = 0: jobs run one at a time on a background thread of this
+      process. A timed-out job is reported as failed but cannot be
+      interrupted, so the thread stays busy until it returns.
+
+    At most `max_queue` jobs wait for a worker; beyond that submit() raises PoolBusy.
+    Tracked jobs are kept `job_ttl` seconds after finishing for polling.
+    """
+
+    def __init__(self, workers: int = 0, max_queue: int = 16, timeout: float = 60.0,
+                 initializer: Optional[Callable[[], None]] = None, start_method: str = "spawn",
+                 job_ttl: float = 600.0):
+        self.workers = max(0, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.timeout = float(timeout)
+        self.initializer = initializer
+        self.job_ttl = float(job_ttl)
+        self._ctx = mp.get_context(start_method) if self.workers else None
+        # Threads that block on worker pipes (or run OCR inline when workers=0)
+        self._threads = ThreadPoolExecutor(max_workers=max(1, 2 * self.workers), thread_name_prefix="ocr")
+        self._idle: Optional[asyncio.Queue] = None
+        self._procs: set = set()
+        self.jobs: Dict[str, Job] = {}
+        # Metrics
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.start_failures = 0   # consecutive workers that died before becoming ready
+
+    # -- lifecycle --
+
+    def start(self) -> None:
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        if self.workers == 0:
+            self._idle.put_nowait("inline")
+        for _ in range(self.workers):
+            self._spawn()
+
+    def _spawn(self) -> None:
+        loop = asyncio.get_running_loop()
+        worker = _Worker(self._ctx, self.initializer)
+        self._procs.add(worker)
+
+        def _ready(fut):
+            if self._idle is None:
+                return
+            if fut.result():
+                self.start_failures = 0
+                self._idle.put_nowait(worker)
+                return
+            # Back off so a broken setup (e.g. missing model files) does not spin
+            self.start_failures += 1
+            delay = min(30.0, 0.5 * 2 ** self.start_failures)
+            print(f"OCR worker failed to start; retrying in {delay:g}s")
+            self._retire(worker, respawn=False)
+            loop.call_later(delay, self._respawn)
+
+        loop.run_in_executor(self._threads, _wait_ready, worker).add_done_callback(_ready)
+
+    def _retire(self, worker: _Worker, respawn: bool) -> None:
+        worker.kill()
+        self._procs.discard(worker)
+        if respawn:
+            self._respawn()
+
+    def _respawn(self) -> None:
+        if self._idle is not None:
+            self.restarts += 1
+            self._spawn()
+
+    def shutdown(self) -> None:
+        for worker in list(self._procs):
+            worker.kill()
+        self._procs.clear()
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._idle = None
+
+    @property
+    def ready_workers(self) -> int:
+        """Workers that finished starting (idle or busy)."""
+        if self._idle is None:
+            return 0
+        if self.workers == 0:
+            return 1
+        return self._idle.qsize() + self.running
+
+    # -- jobs --
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Job:
+        if self._idle is None:
+            self.start()
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise PoolBusy(f"{self.queued} OCR jobs already queued")
+        job = Job(self)
+        self.queued += 1
+        job._task = asyncio.get_running_loop().create_task(self._execute(job, fn, args, kwargs))
+        # Jobs nobody awaits (polled ones) must not log "exception was never retrieved"
+        job._task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return job
+
+    def track(self, job: Job) -> Job:
+        """Make `job` fetchable with get() until `job_ttl` seconds after it finishes."""
+        self._prune()
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self.jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.job_ttl
+        for job_id in [j.id for j in self.jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+
+    async def _execute(self, job: Job, fn, args, kwargs):
+        loop = asyncio.get_running_loop()
+        try:
+            worker = await self._idle.get()
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        finally:
+            self.queued -= 1
+
+        job.status = "running"
+        job.started_at = time.time()
+        job._worker = worker
+        self.running += 1
+        if worker == "inline":
+            fut = loop.run_in_executor(self._threads, lambda: ("ok", fn(*args, **kwargs)))
+        else:
+            fut = loop.run_in_executor(self._threads, _roundtrip, worker, (fn, args, kwargs), self.timeout)
+        # The worker goes back to the pool (or is replaced) once it is really done,
+        # even if the caller stopped waiting
+        fut.add_done_callback(lambda f: self._recycle(worker, f))
+
+        try:
+            if worker == "inline" and self.timeout > 0:
+                status, value = await asyncio.wait_for(asyncio.shield(fut), self.timeout)
+            else:
+                status, value = await asyncio.shield(fut)
+        except asyncio.TimeoutError:
+            status, value = "timeout", None
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            status, value = "error", f"{type(e).__name__}: {e}"
+        finally:
+            job._worker = None
+            job.finished_at = job.finished_at or time.time()
+
+        if job.status == "cancelled":
+            raise asyncio.CancelledError()
+        if status == "ok":
+            job.status, job.result = "done", value
+            self.completed += 1
+            return value
+
+        job.status = "failed"
+        self.failed += 1
+        if status == "timeout":
+            self.timeouts += 1
+            job.error = f"OCR took longer than {self.timeout:g}s"
+            raise JobTimeout(job.error)
+        job.error = "OCR worker exited unexpectedly" if status == "dead" else value
+        raise JobFailed(job.error)
+
+    def _recycle(self, worker, fut) -> None:
+        self.running -= 1
+        if self._idle is None:
+            return
+        if worker == "inline":
+            self._idle.put_nowait(worker)
+            return
+        status = fut.result()[0] if not fut.cancelled() and fut.exception() is None else "dead"
+        if status in ("timeout", "dead"):
+            self._retire(worker, respawn=True)
+        else:
+            self._idle.put_nowait(worker)
+
+    def stats(self) -> dict:
+        return {
+            "mode": "process" if self.workers else "thread",
+            "workers": self.workers,
+            "ready_workers": self.ready_workers,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "start_failures": self.start_failures,
+            "timeout_s": self.timeout,
+            "jobs_tracked": len(self.jobs),
+        }
@@ -2,19 +2,29 @@
 # FastAPI OCR microservice for receipt photos (RO + EN) with rectification
 # Requires: fastapi, uvicorn, easyocr, opencv-python, numpy, pytesseract, python-multipart
 
+import asyncio
 import base64
 import io
+import json
 import os
 import re
-from typing import List, Tuple
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
 
 import cv2
 import numpy as np
 import pytesseract
-from fastapi import FastAPI, File, Query, UploadFile
+from fastapi import FastAPI, File, Header, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from easyocr import Reader
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ocr_cache import ResultCache, content_key, image_dhash
+from ocr_pool import JobTimeout, OcrPool, PoolBusy
+from receipt_fields import extract_fields, group_lines
 
 # ----------------------------
 # Config
@@ -23,11 +33,133 @@ from easyocr import Reader
 ALLOW_ORIGINS = os.getenv("OCR_CORS", "*").split(",")
 USE_GPU = os.getenv("OCR_GPU", "0") in ("1", "true", "TRUE")
 
-# Initialize OCR reader (download models on first run)
-# If GPU isn't available in your env, set USE_GPU=0
-READER = Reader(["ro", "en"], gpu=USE_GPU)
+# Uploads larger than this are refused with 413 (read in chunks, never buffered past the limit)
+MAX_UPLOAD_BYTES = int(float(os.getenv("OCR_MAX_UPLOAD_MB", "15")) * 1024 * 1024)
+UPLOAD_CHUNK = 1024 * 1024
+# Photos are decoded at 1/2, 1/4 or 1/8 scale as long as the long edge stays at least this big.
+# rectify_receipt warps the paper to 1400 px, so there is no point decoding 12 MP+ at full size.
+DECODE_MIN_SIDE = int(os.getenv("OCR_DECODE_MIN_SIDE", "1800"))
+# Include the base64 JPEG of the rectified image in responses (also per request with ?debug=1)
+DEBUG_PREVIEW = os.getenv("OCR_DEBUG_PREVIEW", "0") in ("1", "true", "TRUE")
+
+# Preprocessing before EasyOCR:
+#   standard - warp to 1400 px (cubic), contrast, sharpen, adaptive threshold, morphology
+#   fast     - warp size from the measured text height, gray-first linear warp into reused
+#              buffers, no binarization unless OCR_FAST_BINARIZE=1 (see rectify_receipt_fast)
+PREP_MODES = ("standard", "fast")
+PREP_MODE = os.getenv("OCR_PREP", "standard").lower()
+FAST_TEXT_PX = float(os.getenv("OCR_FAST_TEXT_PX", "20"))     # target text height after the warp
+FAST_BINARIZE = os.getenv("OCR_FAST_BINARIZE", "0") in ("1", "true", "TRUE")
+if PREP_MODE not in PREP_MODES:
+    raise ValueError(f"OCR_PREP must be one of {PREP_MODES}, got {PREP_MODE!r}")
+
+# Execution: 0 = one background thread in this process; N = N worker processes, each with its own Reader.
+# With 0, /ocr/batch items run one at a time (the single Reader is not shared between threads);
+# set OCR_WORKERS > 0 where batches matter (each worker loads its own Reader into memory).
+WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+# Torch/OpenCV threads per worker process, 0 = split the machine's cores evenly between workers
+WORKER_THREADS = int(os.getenv("OCR_WORKER_THREADS", "0"))
+MAX_QUEUE = int(os.getenv("OCR_MAX_QUEUE", "16"))          # receipts waiting for a worker before 503
+JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "60"))    # seconds per receipt, 0 = no limit
+JOB_TTL = float(os.getenv("OCR_JOB_TTL", "600"))           # how long finished async jobs can be fetched
+# Results of earlier uploads, reused for byte-identical or near-duplicate images (see ocr_cache.py)
+CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "512"))            # entries, 0 = no cache
+CACHE_TTL = float(os.getenv("OCR_CACHE_TTL", "3600"))           # seconds, 0 = forever
+# Near-duplicate hits: max differing dHash bits (of 256), 0 = exact only (default). Only for
+# requests that send X-User-Id, only among that user's uploads, and confirmed by a thumbnail check
+CACHE_NEAR_BITS = int(os.getenv("OCR_CACHE_NEAR_BITS", "0"))
+CACHE_PATH = os.getenv("OCR_CACHE_PATH", "")                    # JSON file to keep the cache across restarts
+# POST /ocr/batch: uploads per request, and items (images + PDF pages) per request
+BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "50"))
+BATCH_MAX_ITEMS = int(os.getenv("OCR_BATCH_MAX_ITEMS", "200"))
+BATCH_MAX_BYTES = int(float(os.getenv("OCR_BATCH_MAX_MB", "100")) * 1024 * 1024)  # all uploads of one batch
+PDF_DPI = float(os.getenv("OCR_PDF_DPI", "200"))            # PDF pages are rendered at this resolution
+# When the server process loads the EasyOCR models:
+#   background - start loading at startup, serve /health meanwhile (default)
+#   eager      - on import, before serving (use with `gunicorn --preload` to share weights across forks)
+#   lazy       - on the first OCR request
+PRELOAD = os.getenv("OCR_PRELOAD", "background").lower()
+# How worker processes start: spawn (own Reader each) or fork (inherit the server's loaded Reader, copy-on-write)
+POOL_START = os.getenv("OCR_POOL_START", "spawn").lower()
+
+
+class ModelManager:
+    """
+    Loads the EasyOCR Reader once per process, on first use or in the
+    background, and records how long it took. Thread-safe.
+    """
+
+    def __init__(self, langs: List[str], gpu: bool):
+        self.langs = langs
+        self.gpu = gpu
+        self._reader = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.state = "not_loaded"        # not_loaded | loading | ready | failed
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._reader is not None
+
+    def get(self):
+        """The Reader, loading it first if needed (blocks while another thread loads it)."""
+        if self._reader is None:
+            with self._lock:
+                if self._reader is None:
+                    self._load()
+        return self._reader
+
+    def _load(self) -> None:
+        self.state = "loading"
+        t0 = time.perf_counter()
+        try:
+            # Imported here so importing this module (tests, reload parent, pool workers) stays fast
+            from easyocr import Reader
+
+            # Initialize OCR reader (download models on first run)
+            # If GPU isn't available in your env, set USE_GPU=0
+            self._reader = Reader(self.langs, gpu=self.gpu)
+        except Exception as e:
+            self.state, self.error = "failed", str(e)
+            raise
+        self.load_seconds = time.perf_counter() - t0
+        self.state, self.error = "ready", None
+        print(f"EasyOCR loaded in {self.load_seconds:.1f}s. GPU={self.gpu}")
+
+    def load_in_background(self) -> None:
+        if self._reader is not None or self._thread is not None:
+            return
+
+        def _run():
+            try:
+                self.get()
+            except Exception as e:
+                print("EasyOCR load failed:", e)
+
+        self._thread = threading.Thread(target=_run, name="ocr-model-load", daemon=True)
+        self._thread.start()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
 
-app = FastAPI(title="Receipt OCR API", version="1.0")
+
+MODELS = ModelManager(["ro", "en"], gpu=USE_GPU)
+if PRELOAD == "eager" or (POOL_START == "fork" and WORKERS > 0):
+    # Forked workers can only share weights that are loaded before the fork
+    MODELS.get()
+
+
+# Starts the pool and restores the result cache; the hooks sit next to POOL and CACHE below
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    await _start_pool()
+    yield
+    await _stop_pool()
+
+
+app = FastAPI(title="Receipt OCR API", version="1.0", lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +169,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ----------------------------
+# Upload handling
+# ----------------------------
+
+async def _read_upload(file: UploadFile, limit: Optional[int] = None) -> bytearray:
+    """Read the upload in chunks, stopping with 413 as soon as it exceeds `limit` (default MAX_UPLOAD_BYTES)."""
+    limit = MAX_UPLOAD_BYTES if limit is None else limit
+    if file.size is not None and file.size > limit:
+        raise HTTPException(status_code=413, detail=f"Upload larger than {limit / (1024 * 1024):g} MB")
+    buf = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK)
+        if not chunk:
+            return buf
+        buf += chunk
+        if len(buf) > limit:
+            raise HTTPException(status_code=413, detail=f"Upload larger than {limit / (1024 * 1024):g} MB")
+
+
+def _image_size(raw) -> Optional[Tuple[int, int]]:
+    """(width, height) from a JPEG or PNG header without decoding, else None."""
+    data = memoryview(raw)
+    if len(data) >= 24 and bytes(data[:8]) == b"\x89PNG\r\n\x1a\n":
+        w, h = struct.unpack(">II", data[16:24])
+        return w, h
+    if len(data) < 4 or bytes(data[:2]) != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            i += 2
+            continue
+        seg_len = struct.unpack(">H", data[i + 2:i + 4])[0]
+        # SOF0..SOF15 except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h, w = struct.unpack(">HH", data[i + 5:i + 9])
+            return w, h
+        i += 2 + seg_len
+    return None
+
+
+_REDUCED = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def _decode_image(raw, min_side: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    Decode to BGR, at a reduced scale when the photo is much larger than needed.
+    JPEG decodes directly at 1/2, 1/4 or 1/8 size, so the full-size bitmap is never allocated.
+    """
+    min_side = DECODE_MIN_SIDE if min_side is None else min_side
+    arr = np.frombuffer(raw, np.uint8)
+    size = _image_size(raw)
+    flags = cv2.IMREAD_COLOR
+    if size is not None:
+        for factor, reduced in _REDUCED:
+            if max(size) // factor >= min_side:
+                flags = reduced
+                break
+    return cv2.imdecode(arr, flags)
+
+
 # ----------------------------
 # Image utilities
 # ----------------------------
@@ -56,11 +255,11 @@ def _ordered_corners(pts: np.ndarray) -> np.ndarray:
     )
 
 
-def rectify_receipt(img_bgr: np.ndarray) -> np.ndarray:
+def _find_paper(img_bgr: np.ndarray):
     """
-    Find the largest quadrilateral (the paper), warp to bird's-eye,
-    then apply strong binarization and sharpening tailored for receipts.
-    Returns a single-channel (grayscale/binary) image.
+    Locate the receipt on a 900 px copy of the photo.
+    Returns (quad in full-image coordinates or None, inverted text mask of the copy,
+    copy-to-full scale), or None when no contour is found at all.
     """
     h, w = img_bgr.shape[:2]
     scale = 900.0 / max(h, w)
@@ -82,24 +281,44 @@ def rectify_receipt(img_bgr: np.ndarray) -> np.ndarray:
 
     cnts, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     if not cnts:
-        gray0 = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
-        return gray0
+        return None
 
     cnt = max(cnts, key=cv2.contourArea)
     peri = cv2.arcLength(cnt, True)
     approx = cv2.approxPolyDP(cnt, 0.02 * peri, True)
 
+    inv = 1.0 / scale if scale < 1.0 else 1.0
+    quad = None
     if len(approx) == 4:
-        inv = 1.0 / scale if scale < 1.0 else 1.0
         quad = (approx.reshape(4, 2) * inv).astype("float32")
         quad = _ordered_corners(quad)
+    return quad, th, inv
 
-        widthA = np.linalg.norm(quad[2] - quad[3])
-        widthB = np.linalg.norm(quad[1] - quad[0])
-        heightA = np.linalg.norm(quad[1] - quad[3])
-        heightB = np.linalg.norm(quad[0] - quad[2])
-        maxW = int(max(widthA, widthB))
-        maxH = int(max(heightA, heightB))
+
+def _paper_size(quad: np.ndarray) -> Tuple[float, float]:
+    widthA = np.linalg.norm(quad[2] - quad[3])
+    widthB = np.linalg.norm(quad[1] - quad[0])
+    heightA = np.linalg.norm(quad[1] - quad[3])
+    heightB = np.linalg.norm(quad[0] - quad[2])
+    return max(widthA, widthB), max(heightA, heightB)
+
+
+def rectify_receipt(img_bgr: np.ndarray) -> np.ndarray:
+    """
+    Find the largest quadrilateral (the paper), warp to bird's-eye,
+    then apply strong binarization and sharpening tailored for receipts.
+    Returns a single-channel (grayscale/binary) image.
+    """
+    found = _find_paper(img_bgr)
+    if found is None:
+        gray0 = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+        return gray0
+    quad = found[0]
+
+    if quad is not None:
+        paperW, paperH = _paper_size(quad)
+        maxW = int(paperW)
+        maxH = int(paperH)
         s_up = 1400.0 / max(maxW, maxH)
         maxW = int(maxW * s_up)
         maxH = int(maxH * s_up)
@@ -125,82 +344,532 @@ def rectify_receipt(img_bgr: np.ndarray) -> np.ndarray:
     return bin_img
 
 
+def _text_height(mask: np.ndarray) -> Optional[float]:
+    """Median height in px of character-like blobs in an inverted (text = 255) mask."""
+    n, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if n <= 1:
+        return None
+    h_img, w_img = mask.shape[:2]
+    ws, hs, areas = stats[1:, cv2.CC_STAT_WIDTH], stats[1:, cv2.CC_STAT_HEIGHT], stats[1:, cv2.CC_STAT_AREA]
+    glyph = (hs >= 3) & (hs <= h_img * 0.05) & (ws <= hs * 3) & (areas >= 6)
+    if glyph.sum() < 20:
+        return None
+    return float(np.median(hs[glyph]))
+
+
+_SCRATCH = threading.local()
+
+
+def _scratch(name: str, h: int, w: int) -> np.ndarray:
+    """A (h, w) uint8 work buffer owned by the calling thread, grown but never shrunk."""
+    flat = getattr(_SCRATCH, name, None)
+    if flat is None or flat.size < h * w:
+        flat = np.empty(int(h * w * 1.25), dtype=np.uint8)
+        setattr(_SCRATCH, name, flat)
+    return flat[: h * w].reshape(h, w)
+
+
+def rectify_receipt_fast(img_bgr: np.ndarray, binarize: Optional[bool] = None,
+                         timings: Optional[dict] = None) -> np.ndarray:
+    """
+    Cheaper variant of rectify_receipt for PREP_MODE=fast.
+
+    - The warp size is chosen so the text comes out about FAST_TEXT_PX tall
+      (measured on the detection copy), capped at rectify_receipt's 1400 px.
+    - The photo is converted to gray before warping, with INTER_LINEAR.
+    - Every stage writes into per-thread buffers (dst=) instead of new arrays.
+    - Adaptive threshold + morphology only run with `binarize` (default
+      FAST_BINARIZE); EasyOCR reads the enhanced grayscale as well.
+
+    The returned array is one of those buffers: it is overwritten by the next
+    call on the same thread, so copy it to keep it. Stage times in ms go to `timings`.
+    """
+    binarize = FAST_BINARIZE if binarize is None else binarize
+    stage_t = time.perf_counter()
+
+    def _stage(name):
+        nonlocal stage_t
+        now = time.perf_counter()
+        if timings is not None:
+            timings[name] = round((now - stage_t) * 1000.0, 1)
+        stage_t = now
+
+    h, w = img_bgr.shape[:2]
+    found = _find_paper(img_bgr)
+    quad, mask, inv = found if found is not None else (None, None, 1.0)
+    _stage("prep_detect")
+
+    gray_full = _scratch("gray", h, w)
+    cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY, dst=gray_full)
+    if quad is not None:
+        paperW, paperH = _paper_size(quad)
+        s_up = 1400.0 / max(paperW, paperH)
+        text_h = _text_height(mask) if mask is not None else None
+        if text_h:
+            s_up = min(s_up, FAST_TEXT_PX / (text_h * inv))
+        outW, outH = max(1, int(paperW * s_up)), max(1, int(paperH * s_up))
+        dst = np.array([[0, 0], [outW - 1, 0], [0, outH - 1], [outW - 1, outH - 1]], dtype="float32")
+        M = cv2.getPerspectiveTransform(quad, dst)
+        gray = _scratch("warp", outH, outW)
+        cv2.warpPerspective(gray_full, M, (outW, outH), dst=gray, flags=cv2.INTER_LINEAR)
+    else:
+        gray = gray_full
+    _stage("prep_warp")
+
+    gh, gw = gray.shape
+    clahe = getattr(_SCRATCH, "clahe_op", None)
+    if clahe is None:
+        clahe = _SCRATCH.clahe_op = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    cl = _scratch("clahe", gh, gw)
+    clahe.apply(gray, dst=cl)
+    blur = _scratch("blur", gh, gw)
+    cv2.GaussianBlur(cl, (0, 0), 1.0, dst=blur)
+    sharp = _scratch("sharp", gh, gw)
+    cv2.addWeighted(cl, 1.6, blur, -0.6, 0, dst=sharp)
+    _stage("prep_enhance")
+    if not binarize:
+        return sharp
+
+    cv2.adaptiveThreshold(sharp, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 12, dst=cl)
+    cv2.morphologyEx(cl, cv2.MORPH_CLOSE, np.ones((2, 2), np.uint8), dst=blur)
+    _stage("prep_binarize")
+    return blur
+
+
+def _group_lines(results) -> str:
+    """Join EasyOCR boxes into text lines (by vertical overlap), left to right."""
+    return "\n".join(group_lines(results)).strip()
+
+
+def _mean_confidence(results) -> float:
+    """Text-length weighted mean confidence of EasyOCR results (1.0 when there are none)."""
+    total = weight = 0.0
+    for r in results:
+        if isinstance(r, (list, tuple)) and len(r) >= 3:
+            n = len(str(r[1]).strip())
+            total += float(r[2]) * n
+            weight += n
+    return total / weight if weight else 1.0
+
+
+def _is_weak(text: str) -> bool:
+    return len(text.splitlines()) < 3 or len(text) < 15
+
+
+def _tesseract(prep: np.ndarray) -> str:
+    try:
+        config = "--oem 1 --psm 6 -l ron+eng"
+        return pytesseract.image_to_string(prep, config=config)
+    except Exception:
+        return ""
+
+
+# EasyOCR strategies:
+#   sequential - beam search, then Tesseract if the text is weak (the original behaviour)
+#   greedy     - greedy decoding first; beam search only if its confidence is below
+#                OCR_ESCALATE_CONF or the text is weak; then Tesseract if still weak
+#   parallel   - beam search and Tesseract at the same time, keep the better text
+STRATEGIES = ("sequential", "greedy", "parallel")
+STRATEGY = os.getenv("OCR_STRATEGY", "sequential").lower()
+ESCALATE_CONF = float(os.getenv("OCR_ESCALATE_CONF", "0.6"))
+if STRATEGY not in STRATEGIES:
+    raise ValueError(f"OCR_STRATEGY must be one of {STRATEGIES}, got {STRATEGY!r}")
+
+_TESS_THREADS = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tesseract")
+
+
 def run_ocr(
     image_bgr: np.ndarray,
     paragraph: bool = False,
     mag_ratio: float = 2.2,
     text_th: float = 0.6,
     low_text: float = 0.3,
+    strategy: Optional[str] = None,
+    info: Optional[dict] = None,
+    prep: Optional[str] = None,
 ):
     """
-    Preprocess + EasyOCR with robust tuple/dict handling.
-    Falls back to Tesseract if output is too short.
-    Returns (text, results, preprocessed_image)
+    Preprocess + EasyOCR with robust tuple/dict handling, per `strategy`
+    (default OCR_STRATEGY, see STRATEGIES) and `prep` (default OCR_PREP, see PREP_MODES).
+    Returns (text, results, preprocessed_image). If `info` is given it is filled
+    with the strategy, the engine whose text was kept, the EasyOCR confidence and
+    per-stage timings in milliseconds.
     """
-    prep = rectify_receipt(image_bgr)
+    strategy = (strategy or STRATEGY).lower()
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown OCR strategy {strategy!r}; expected one of {STRATEGIES}")
+    prep_mode = (prep or PREP_MODE).lower()
+    if prep_mode not in PREP_MODES:
+        raise ValueError(f"Unknown preprocessing mode {prep_mode!r}; expected one of {PREP_MODES}")
+    timings = {}
+    t_start = time.perf_counter()
+
+    def _timed(stage, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[stage] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    if prep_mode == "fast":
+        prep = _timed("rectify", rectify_receipt_fast, image_bgr, timings=timings)
+    else:
+        prep = _timed("rectify", rectify_receipt, image_bgr)
 
-    results = READER.readtext(
-        prep,
+    reader = MODELS.get()
+    params = dict(
         detail=1,
         paragraph=paragraph,
         text_threshold=float(text_th),
         low_text=float(low_text),
         mag_ratio=float(mag_ratio),
-        decoder="beamsearch",
-        beamWidth=5,
     )
 
-    # Group by line (approx by y)
-    line_map = {}
-    for r in results:
-        if isinstance(r, dict):
-            box, txt = r.get("box"), r.get("text", "")
-        elif isinstance(r, (list, tuple)):
-            # easyocr often returns (box, text, conf) or (box, text)
-            box, txt = r[0], r[1]
-        else:
-            continue
-
-        if not txt or not str(txt).strip():
-            continue
-
-        try:
-            y = int(sum(p[1] for p in box) / 4) // 20
-        except Exception:
-            y = 0
-        line_map.setdefault(y, []).append((box, str(txt)))
-
-    lines: List[str] = []
-    for k in sorted(line_map):
-        row = sorted(line_map[k], key=lambda t: min(p[0] for p in t[0]))
-        lines.append(" ".join(t[1] for t in row).strip())
-
-    text = "\n".join(lines).strip()
+    def _easyocr(decoder: str):
+        extra = {"beamWidth": 5} if decoder == "beamsearch" else {}
+        return _timed(f"easyocr_{decoder}", reader.readtext, prep, decoder=decoder, **params, **extra)
+
+    engine = "easyocr"
+    tess_future = None
+    if strategy == "parallel":
+        # Tesseract runs in its own process, so it overlaps with EasyOCR for real
+        tess_future = _TESS_THREADS.submit(_timed, "tesseract", _tesseract, prep)
+
+    if strategy == "greedy":
+        results = _easyocr("greedy")
+        text = _group_lines(results)
+        if _mean_confidence(results) < ESCALATE_CONF or _is_weak(text):
+            results = _easyocr("beamsearch")
+            text = _group_lines(results)
+    else:
+        results = _easyocr("beamsearch")
+        text = _group_lines(results)
 
     # Fallback to Tesseract if EasyOCR is too weak
-    if len(text.splitlines()) < 3 or len(text) < 15:
-        try:
-            config = "--oem 1 --psm 6 -l ron+eng"
-            t_text = pytesseract.image_to_string(prep, config=config)
-            if len(t_text.strip()) > len(text.strip()):
-                text = t_text
-        except Exception:
-            pass
+    if tess_future is not None or _is_weak(text):
+        t_text = tess_future.result() if tess_future is not None else _timed("tesseract", _tesseract, prep)
+        if _is_weak(text) and len(t_text.strip()) > len(text.strip()):
+            text = t_text
+            engine = "tesseract"
 
     # Clean up whitespace
     text = re.sub(r"[^\S\r\n]+", " ", text)
     text = re.sub(r"\n{3,}", "\n\n", text).strip()
 
+    if info is not None:
+        timings["total"] = round((time.perf_counter() - t_start) * 1000.0, 1)
+        info.update(strategy=strategy, prep=prep_mode, engine=engine,
+                    confidence=round(_mean_confidence(results), 3), timings_ms=timings)
     return text, results, prep
 
 
+# ----------------------------
+# Jobs
+# ----------------------------
+
+def _init_worker() -> None:
+    """Runs once in each OCR worker process; the worker counts as ready once its Reader is loaded."""
+    threads = WORKER_THREADS or max(1, (os.cpu_count() or 1) // max(1, WORKERS))
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    MODELS.get()  # already loaded when forked from a preloaded server
+
+
+def _ocr_job(raw: bytes, debug: bool = False, strategy: Optional[str] = None,
+             prep: Optional[str] = None) -> Tuple[int, dict]:
+    """Decode + OCR one upload. Returns (status_code, body); runs on a pool worker."""
+    t0 = time.perf_counter()
+    img = _decode_image(raw)
+    decode_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+    del raw
+    if img is None:
+        return 400, {"ok": False, "error": "Invalid image"}
+    return _ocr_image(img, decode_ms, debug, strategy, prep)
+
+
+def _ocr_image(img: np.ndarray, decode_ms: float, debug: bool, strategy: Optional[str],
+               prep: Optional[str]) -> Tuple[int, dict]:
+    info = {}
+    text, results, pre_img = run_ocr(img, paragraph=False, strategy=strategy, info=info, prep=prep)
+    del img
+    t0 = time.perf_counter()
+    fields = extract_fields(text.splitlines())
+    info["timings_ms"] = {"decode": decode_ms, **info["timings_ms"],
+                          "fields": round((time.perf_counter() - t0) * 1000.0, 1)}
+
+    out_debug = {
+        "lines": text.splitlines(),
+        "n_regions": len(results),
+    }
+    if debug or DEBUG_PREVIEW:
+        # small preview of rectified image for debugging
+        _, pre_jpg = cv2.imencode(".jpg", pre_img)
+        out_debug["rectified_preview_jpg_b64"] = base64.b64encode(pre_jpg.tobytes()).decode("ascii")
+
+    return 200, {
+        "ok": True,
+        "text": text,
+        "fields": fields,
+        "ocr": info,
+        "debug": out_debug,
+    }
+
+
+POOL = OcrPool(workers=WORKERS, max_queue=MAX_QUEUE, timeout=JOB_TIMEOUT,
+               initializer=_init_worker, start_method=POOL_START, job_ttl=JOB_TTL)
+
+
+CACHE = ResultCache(max_size=CACHE_SIZE, ttl=CACHE_TTL, near_bits=CACHE_NEAR_BITS, path=CACHE_PATH) if CACHE_SIZE > 0 else None
+_INFLIGHT = {}   # cache key -> Job still running for it, so concurrent retries share one OCR pass
+
+
+async def _start_pool():
+    POOL.start()
+    if CACHE is not None:
+        loaded = CACHE.load()
+        if loaded:
+            print(f"Loaded {loaded} cached OCR results from {CACHE.path}")
+    # With worker processes the models live in the workers; the server only needs them in thread mode
+    if WORKERS == 0 and PRELOAD == "background":
+        MODELS.load_in_background()
+
+
+async def _stop_pool():
+    POOL.shutdown()
+    if CACHE is not None:
+        try:
+            CACHE.save()
+        except OSError as e:
+            print(f"Warning: could not save OCR cache to {CACHE.path}: {e}")
+
+
+def _check_strategy(strategy: Optional[str], prep: Optional[str] = None) -> None:
+    if strategy is not None and strategy.lower() not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"strategy must be one of {STRATEGIES}")
+    if prep is not None and prep.lower() not in PREP_MODES:
+        raise HTTPException(status_code=400, detail=f"prep must be one of {PREP_MODES}")
+
+
+def _with_cache_info(body: dict, hit: Optional[str], **extra) -> dict:
+    # Cached bodies are shared; annotate a copy
+    return {**body, "ocr": {**body.get("ocr", {}), "cache": {"hit": hit, **extra}}}
+
+
+async def _submit_cached(raw: bytes, debug: bool, strategy: Optional[str], prep: Optional[str] = None,
+                         scope: Optional[str] = None):
+    """
+    Look `raw` up in the result cache; on a miss submit it to the pool.
+    Returns (cached (status, body) or None, job or None, cache info).
+    Requests with debug=1 bypass the cache (cached bodies carry no preview).
+    Near-duplicate hits need a `scope` (the uploading user) and only come from that scope.
+    """
+    if CACHE is None or debug:
+        return None, POOL.submit(_ocr_job, raw, debug, strategy, prep), {"hit": None}
+
+    variant = f"{(strategy or STRATEGY).lower()}/{(prep or PREP_MODE).lower()}"
+    key = CACHE.key(content_key(raw), variant)
+    hit = CACHE.get(key)
+    if hit is not None:
+        return (200, hit[0]), None, {"hit": "exact", "age_s": round(hit[1], 1)}
+    dhash = await asyncio.to_thread(image_dhash, raw) if CACHE.near_bits and scope else None
+    # Checked after the last await, so concurrent retries cannot both miss it
+    job = _INFLIGHT.get(key)
+    if job is not None:
+        return None, job, {"hit": "inflight"}
+    near = CACHE.get_near(dhash, variant, scope)
+    if near is not None:
+        body, age, dist = near
+        # Remember the new bytes too, so the next retry of this file is an exact hit
+        CACHE.put(key, body, dhash, scope)
+        return (200, body), None, {"hit": "near", "age_s": round(age, 1), "distance": dist}
+
+    job = POOL.submit(_ocr_job, raw, debug, strategy, prep)
+    _INFLIGHT[key] = job
+
+    def _done(j):
+        _INFLIGHT.pop(key, None)
+        if j.status == "done" and j.result[0] == 200:
+            CACHE.put(key, j.result[1], dhash, scope)
+
+    job.add_done_callback(_done)
+    return None, job, {"hit": None}
+
+
+def _error_status(e: Exception) -> Tuple[int, str]:
+    if isinstance(e, PoolBusy):
+        return 503, f"OCR busy: {e}"
+    if isinstance(e, JobTimeout):
+        return 504, str(e)
+    if isinstance(e, HTTPException):
+        return e.status_code, e.detail
+    if isinstance(e, asyncio.CancelledError):
+        return 409, "OCR job cancelled"
+    print("OCR error:", e)
+    return 500, str(e)
+
+
+def _job_error(e: Exception) -> JSONResponse:
+    status, error = _error_status(e)
+    headers = {"Retry-After": "2"} if status == 503 else None
+    return JSONResponse({"ok": False, "error": error}, status_code=status, headers=headers)
+
+
+# ----------------------------
+# Batches
+# ----------------------------
+
+def _is_pdf(raw) -> bool:
+    return bytes(raw[:5]) == b"%PDF-"
+
+
+def _pdf_page_count(raw: bytes) -> int:
+    import pypdfium2 as pdfium  # optional: only needed for PDF uploads
+
+    pdf = pdfium.PdfDocument(raw)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _render_pdf_page(raw: bytes, index: int) -> bytes:
+    """One PDF page rendered at PDF_DPI, as PNG bytes (lossless, and small for text pages)."""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(raw)
+    try:
+        page = pdf[index]
+        arr = page.render(scale=PDF_DPI / 72.0).to_numpy()
+        img = cv2.cvtColor(arr, cv2.COLOR_BGRA2BGR) if arr.ndim == 3 and arr.shape[2] == 4 else arr
+        page.close()
+    finally:
+        pdf.close()
+    ok, png = cv2.imencode(".png", img, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise ValueError("PNG encoding failed")
+    return png.tobytes()
+
+
+async def _batch_items(files: List[UploadFile]) -> List[dict]:
+    """One item per image and per PDF page; unreadable PDFs become error items."""
+    too_large = HTTPException(status_code=413, detail=f"Batch larger than {BATCH_MAX_BYTES / (1024 * 1024):g} MB")
+    if sum(f.size or 0 for f in files) > BATCH_MAX_BYTES:
+        raise too_large
+    items = []
+    total = 0
+    for f in files:
+        raw = bytes(await _read_upload(f))
+        total += len(raw)
+        if total > BATCH_MAX_BYTES:
+            raise too_large
+        item = {"filename": f.filename, "page": None, "raw": raw, "error": None}
+        if not _is_pdf(raw):
+            items.append(item)
+            continue
+        try:
+            pages = await asyncio.to_thread(_pdf_page_count, raw)
+        except ImportError:
+            items.append({**item, "raw": None, "error": (415, "PDF uploads need pypdfium2 (pip install pypdfium2)")})
+            continue
+        except Exception as e:
+            items.append({**item, "raw": None, "error": (400, f"Invalid PDF: {e}")})
+            continue
+        items.extend({**item, "page": p} for p in range(pages))
+        if len(items) > BATCH_MAX_ITEMS:
+            break
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch has more than {BATCH_MAX_ITEMS} images/pages")
+    return items
+
+
+async def _batch_one(item: dict, debug: bool, strategy: Optional[str], prep: Optional[str],
+                     scope: Optional[str] = None) -> Tuple[int, dict]:
+    if item["error"] is not None:
+        status, error = item["error"]
+        return status, {"ok": False, "error": error}
+    raw = item["raw"]
+    if item["page"] is not None:
+        # Render here so only the page image, not the whole PDF, is sent to a worker
+        try:
+            raw = await asyncio.to_thread(_render_pdf_page, raw, item["page"])
+        except Exception as e:
+            return 400, {"ok": False, "error": f"Could not render PDF page {item['page'] + 1}: {e}"}
+    while True:
+        try:
+            cached, job, cache_info = await _submit_cached(raw, debug, strategy, prep, scope)
+            if cached is not None:
+                return 200, _with_cache_info(cached[1], **cache_info)
+            break
+        except PoolBusy:
+            # Other requests filled the queue; wait for room instead of failing the item
+            await asyncio.sleep(0.2)
+    status, body = await job.wait()
+    return status, (_with_cache_info(body, **cache_info) if status == 200 else body)
+
+
+async def _batch_stream(items: List[dict], debug: bool, strategy: Optional[str], prep: Optional[str],
+                        scope: Optional[str] = None):
+    """NDJSON lines, one per item as it completes, then a summary line."""
+    t0 = time.perf_counter()
+    # Enough items in flight to keep every worker busy without taking over the shared queue
+    window = max(1, POOL.workers) * 2
+    pending = {}
+    next_index = 0
+    ok = failed = 0
+    try:
+        while pending or next_index < len(items):
+            while next_index < len(items) and len(pending) < window:
+                task = asyncio.ensure_future(_batch_one(items[next_index], debug, strategy, prep, scope))
+                pending[task] = next_index
+                next_index += 1
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                item = items[index]
+                item["raw"] = None
+                try:
+                    status, body = task.result()
+                except (Exception, asyncio.CancelledError) as e:
+                    status, error = _error_status(e)
+                    body = {"ok": False, "error": error}
+                ok, failed = (ok + 1, failed) if status == 200 else (ok, failed + 1)
+                line = {"index": index, "filename": item["filename"], "page": item["page"], "status": status, **body}
+                yield json.dumps(line) + "\n"
+    finally:
+        # Client went away: stop waiting; jobs already running finish (and fill the cache)
+        for task in pending:
+            task.cancel()
+    yield json.dumps({"done": True, "items": len(items), "ok": ok, "failed": failed,
+                      "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1)}) + "\n"
+
+
 # ----------------------------
 # Routes
 # ----------------------------
 
 @app.get("/health")
 async def health():
-    return {"ok": True, "gpu": USE_GPU}
+    """Liveness: the server is up and answering, whether or not the models are loaded."""
+    return {"ok": True, "gpu": USE_GPU, "models": MODELS.stats(), "pool": POOL.stats(),
+            "cache": CACHE.stats() if CACHE is not None else None}
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: 200 once a receipt can be processed without waiting for a model load
+    (with OCR_PRELOAD=lazy, as soon as the server is up; the first request pays for the load).
+    """
+    if WORKERS:
+        is_ready = POOL.ready_workers > 0
+    else:
+        is_ready = MODELS.ready or PRELOAD == "lazy"
+    body = {"ready": is_ready, "models": MODELS.stats(), "ready_workers": POOL.ready_workers}
+    return body if is_ready else JSONResponse(body, status_code=503)
 
 
 @app.post("/ocr")
@@ -208,32 +877,107 @@ async def ocr(
     file: UploadFile = File(...),
     lang: str = Query("ro+en"),      # kept for UI compatibility; EasyOCR uses ['ro','en'] above
     pre: int = Query(1),             # 1 = enable preprocessing (always on in this build)
+    debug: int = Query(0),           # 1 = include the rectified preview (or set OCR_DEBUG_PREVIEW=1)
+    strategy: Optional[str] = Query(None, description=f"one of {STRATEGIES}; default OCR_STRATEGY"),
+    prep: Optional[str] = Query(None, description=f"one of {PREP_MODES}; default OCR_PREP"),
+    x_user_id: Optional[str] = Header(None),  # scopes near-duplicate cache hits to this user's uploads
 ):
     try:
-        raw = await file.read()
-        arr = np.frombuffer(raw, np.uint8)
-        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-        if img is None:
-            return JSONResponse({"ok": False, "error": "Invalid image"}, status_code=400)
+        _check_strategy(strategy, prep)
+        raw = await _read_upload(file)
+        cached, job, cache_info = await _submit_cached(bytes(raw), bool(debug), strategy, prep, x_user_id)
+        del raw
+        status, body = cached if cached is not None else await job.wait()
+        if status != 200:
+            return JSONResponse(body, status_code=status)
+        return _with_cache_info(body, **cache_info)
+    except asyncio.CancelledError:
+        return JSONResponse({"ok": False, "error": "OCR job cancelled"}, status_code=409)
+    except Exception as e:
+        return _job_error(e)
 
-        text, results, pre_img = run_ocr(img, paragraph=False)
 
-        # small preview of rectified image for debugging (optional)
-        _, pre_jpg = cv2.imencode(".jpg", pre_img)
-        pre_b64 = base64.b64encode(pre_jpg.tobytes()).decode("ascii")
-
-        return {
-            "ok": True,
-            "text": text,
-            "debug": {
-                "lines": text.splitlines(),
-                "rectified_preview_jpg_b64": pre_b64,
-                "n_regions": len(results),
-            },
-        }
+@app.post("/ocr/batch")
+async def ocr_batch(
+    files: List[UploadFile] = File(...),
+    debug: int = Query(0),
+    strategy: Optional[str] = Query(None, description=f"one of {STRATEGIES}; default OCR_STRATEGY"),
+    prep: Optional[str] = Query(None, description=f"one of {PREP_MODES}; default OCR_PREP"),
+    x_user_id: Optional[str] = Header(None),  # scopes near-duplicate cache hits to this user's uploads
+):
+    """
+    OCR several receipts in one request: images, and PDFs (one item per page; needs pypdfium2).
+    At most OCR_BATCH_MAX_FILES uploads and OCR_BATCH_MAX_MB in total (413 otherwise).
+    Items run in parallel on the OCR worker processes, so batch throughput needs
+    OCR_WORKERS > 0: with the default of 0 they run one at a time on the server's
+    single OCR thread. The response streams NDJSON, one line per item in completion order:
+        {"index": 0, "filename": "a.pdf", "page": 0, "status": 200, "ok": true, "text": ..., ...}
+    followed by {"done": true, "items": N, "ok": ..., "failed": ..., "elapsed_ms": ...}.
+    """
+    try:
+        _check_strategy(strategy, prep)
+        if len(files) > BATCH_MAX_FILES:
+            raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_FILES} files per batch")
+        items = await _batch_items(files)
+    except Exception as e:
+        return _job_error(e)
+    return StreamingResponse(_batch_stream(items, bool(debug), strategy, prep, x_user_id), media_type="application/x-ndjson")
+
+
+@app.post("/ocr/jobs", status_code=202)
+async def submit_ocr_job(
+    file: UploadFile = File(...),
+    debug: int = Query(0),
+    strategy: Optional[str] = Query(None, description=f"one of {STRATEGIES}; default OCR_STRATEGY"),
+    prep: Optional[str] = Query(None, description=f"one of {PREP_MODES}; default OCR_PREP"),
+    x_user_id: Optional[str] = Header(None),  # scopes near-duplicate cache hits to this user's uploads
+):
+    """
+    Queue a receipt and return at once; fetch the result from GET /ocr/jobs/{job_id}.
+    A receipt already in the result cache is answered directly with status "done" and no job id.
+    """
+    try:
+        _check_strategy(strategy, prep)
+        raw = await _read_upload(file)
+        cached, job, cache_info = await _submit_cached(bytes(raw), bool(debug), strategy, prep, x_user_id)
     except Exception as e:
-        print("OCR error:", e)
-        return JSONResponse({"ok": False, "error": str(e)}, status_code=500)
+        return _job_error(e)
+    if job is not None:
+        POOL.track(job)  # only polled jobs are kept after they finish
+    if cached is not None:
+        return JSONResponse({"job_id": None, "status": "done", "result": _with_cache_info(cached[1], **cache_info)},
+                            status_code=200)
+    return _job_body(job)
+
+
+def _job_body(job) -> dict:
+    body = job.to_dict()
+    if job.status == "done":
+        # Jobs return (status_code, body); expose the body as the result
+        status, result = job.result
+        body["result"] = result
+        if status != 200:
+            body["status"] = "failed"
+            body["error"] = result.get("error")
+    return body
+
+
+@app.get("/ocr/jobs/{job_id}")
+async def get_ocr_job(job_id: str):
+    job = POOL.get(job_id)
+    if job is None:
+        return JSONResponse({"ok": False, "error": "Unknown or expired job"}, status_code=404)
+    return _job_body(job)
+
+
+@app.delete("/ocr/jobs/{job_id}")
+async def cancel_ocr_job(job_id: str):
+    job = POOL.get(job_id)
+    if job is None:
+        return JSONResponse({"ok": False, "error": "Unknown or expired job"}, status_code=404)
+    if not job.cancel():
+        return JSONResponse({"ok": False, "error": f"Job already {job.status}"}, status_code=409)
+    return _job_body(job)
 
 
 # ----------------------------
@@ -244,5 +988,7 @@ if __name__ == "__main__":
     import uvicorn
 
     # Allow: OCR_GPU=1 python ocr_server.py to try GPU if available
-    print(f"EasyOCR initialized. GPU={USE_GPU}")
-    uvicorn.run(app, host="0.0.0.0", port=8080, reload=True)
+    reload = os.getenv("OCR_RELOAD", "1") in ("1", "true", "TRUE")
+    print(f"Starting OCR API. GPU={USE_GPU}, workers={WORKERS}, preload={PRELOAD}, reload={reload}")
+    # reload needs the import string; the reloader parent does not load any models
+    uvicorn.run("ocr_server:app", host="0.0.0.0", port=8080, reload=reload)
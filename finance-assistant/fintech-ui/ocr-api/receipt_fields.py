@@ -0,0 +1,320 @@
+# receipt_fields.py
+# Post-processing of OCR output: EasyOCR boxes -> text lines -> structured receipt fields
+# (merchant, date/time, currency, line items, VAT, total), so clients do not re-parse the text.
+# The field rules follow lib/receipt-parser-advanced.ts in the app.
+
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# ----------------------------
+# Line grouping
+# ----------------------------
+
+def _boxes_and_texts(results) -> Tuple[np.ndarray, List[str]]:
+    boxes, texts = [], []
+    for r in results:
+        if isinstance(r, dict):
+            box, txt = r.get("box"), r.get("text", "")
+        elif isinstance(r, (list, tuple)):
+            # easyocr often returns (box, text, conf) or (box, text)
+            box, txt = r[0], r[1]
+        else:
+            continue
+        if not txt or not str(txt).strip():
+            continue
+        try:
+            pts = np.asarray(box, dtype=float).reshape(-1, 2)
+            boxes.append((pts[:, 0].min(), pts[:, 1].min(), pts[:, 1].max()))
+        except Exception:
+            boxes.append((0.0, 0.0, 0.0))
+        texts.append(str(txt))
+    return np.asarray(boxes, dtype=float).reshape(-1, 3), texts
+
+
+def group_lines(results) -> List[str]:
+    """
+    Join EasyOCR boxes into text lines.
+
+    Boxes are taken in order of their vertical centre; a box joins the current
+    line when its centre falls inside the line's (mean) top..bottom band, i.e.
+    when it overlaps the line by at least half its own height. This adapts to
+    the text size instead of using fixed-height buckets. Each line is then
+    ordered left to right.
+    """
+    geom, texts = _boxes_and_texts(results)
+    if not texts:
+        return []
+    left, top, bottom = geom[:, 0], geom[:, 1], geom[:, 2]
+    center = (top + bottom) / 2.0
+
+    order = np.argsort(center, kind="stable")
+    line_of = np.empty(len(texts), dtype=np.int64)
+    line = -1
+    band_top = band_bottom = 0.0
+    n_in_line = 0
+    for i in order.tolist():
+        if line < 0 or not (band_top <= center[i] <= band_bottom):
+            line += 1
+            band_top, band_bottom, n_in_line = top[i], bottom[i], 0
+        else:
+            band_top += (top[i] - band_top) / (n_in_line + 1)
+            band_bottom += (bottom[i] - band_bottom) / (n_in_line + 1)
+        n_in_line += 1
+        line_of[i] = line
+
+    lines: List[List[str]] = [[] for _ in range(line + 1)]
+    for i in np.lexsort((left, line_of)).tolist():
+        lines[line_of[i]].append(texts[i])
+    return [" ".join(parts).strip() for parts in lines]
+
+
+# ----------------------------
+# Field extraction
+# ----------------------------
+
+_PRICE = r"[0-9]+(?:[ ]?[0-9]{3})*[.,][0-9]{1,2}"
+PRICE_TRAIL = re.compile(rf"({_PRICE})\s*(?:MDL|LEI|RON|EUR)?\s*$", re.I)
+_ITEM_PRICE = re.compile(rf"^(.*?)(?:[ .]{{2,}})?({_PRICE})$")
+_UNITS = r"(?:BUC|PCS|KG|G|L|ML)"
+_QTY_X_PRICE = re.compile(rf"(\d+(?:[.,]\d+)?)\s*{_UNITS}?\s*[x×@*]\s*({_PRICE})", re.I)
+_QTY_LINE = re.compile(rf"^(\d+(?:[.,]\d+)?)\s*{_UNITS}?\s*[x×@*]\s*({_PRICE})(?:\s+({_PRICE}))?$", re.I)
+_QTY_NAME_PRICE = re.compile(rf"^(\d+(?:[.,]\d+)?)\s*{_UNITS}?\s+(.+?)\s+({_PRICE})$", re.I)
+_DISCOUNT = re.compile(r"REDUCERE|DISCOUNT|^-+\s*\d", re.I)
+_DISCOUNT_VALUE = re.compile(r"-?\s*([0-9]+(?:[.,][0-9]{1,2})?)")
+_DATE = re.compile(r"\b(\d{1,2})[./-](\d{1,2})[./-](\d{2,4})\b|\b(\d{4})-(\d{2})-(\d{2})\b")
+_TIME = re.compile(r"\b([01]?\d|2[0-3])[:.]([0-5]\d)(?:[:.][0-5]\d)?\b")
+_VAT = re.compile(r"\bTVA\b|\bT\.V\.A\b|\bVAT\b", re.I)
+_SRL = re.compile(r"\bS\.?R\.?L\b|\bS\.?A\b\.?$|\bI\.?I\.?\b", re.I)
+_HEADER_NOISE = re.compile(r"BON|FISCAL|CASA|CHECK|COD FISCAL|IDNO|^\d{2,}$", re.I)
+# OCR confusions inside numbers only ("1O,5O" -> "10,50"); words are left alone
+_NUMERIC_TOKEN = re.compile(r"(?<![A-Za-z])[0-9OoSlI]*[0-9][0-9OoSlI]*[.,][0-9OoSlI]{1,2}(?![A-Za-z])")
+_DIGIT_FIXES = str.maketrans({"O": "0", "o": "0", "S": "5", "l": "1", "I": "1"})
+
+KNOWN_MERCHANTS = ("KAUFLAND", "LINELLA", "GREEN HILLS", "FELICIA", "FOXY", "NR1", "FIDESCO",
+                   "METRO", "LIDL", "MEGA IMAGE", "CARREFOUR", "PROFI", "AUCHAN", "PENNY")
+_MERCHANT = re.compile("|".join(re.escape(m) for m in KNOWN_MERCHANTS))
+
+_CURRENCIES = (
+    ("MDL", re.compile(r"\bMDL\b|\bLEI\b", re.I)),
+    ("RON", re.compile(r"\bRON\b", re.I)),
+    ("EUR", re.compile(r"\bEUR\b|€")),
+    ("USD", re.compile(r"\bUSD\b|\$")),
+)
+
+
+def _num(s: str) -> float:
+    return float(re.sub(r"[^\d.\-]", "", s.replace(" ", "").replace(",", ".")) or 0)
+
+
+def _fix_digits(line: str) -> str:
+    return _NUMERIC_TOKEN.sub(lambda m: m.group(0).translate(_DIGIT_FIXES), line)
+
+
+def _is_total_line(line: str) -> bool:
+    # Tolerant of common OCR swaps: SUHA / 5UMA / SUM4 / T0TAL
+    norm = re.sub(r"\s", "", line.upper()).replace("H", "M").replace("4", "A").replace("5", "S").replace("0", "O")
+    return bool(re.search(r"SUMA|SUMĂ|TOTAL|DEPLAT", norm))
+
+
+def _rightmost_price(line: str) -> Optional[float]:
+    m = PRICE_TRAIL.search(line)
+    return round(_num(m.group(1)), 2) if m else None
+
+
+def _find_date(text: str) -> Tuple[Optional[str], Optional[str]]:
+    date = time_ = None
+    for m in _DATE.finditer(text):
+        try:
+            if m.group(4):
+                d = datetime(int(m.group(4)), int(m.group(5)), int(m.group(6)))
+            else:
+                year = int(m.group(3))
+                year += 2000 if year < 100 else 0
+                d = datetime(year, int(m.group(2)), int(m.group(1)))
+        except ValueError:
+            continue
+        date = d.date().isoformat()
+        # Time usually follows the date on the same line
+        t = _TIME.search(text, m.end(), m.end() + 16)
+        if t:
+            time_ = f"{int(t.group(1)):02d}:{t.group(2)}"
+        break
+    return date, time_
+
+
+def _merchant(lines: List[str]) -> Optional[str]:
+    head = lines[:8]
+    for line in head:
+        if _MERCHANT.search(line.upper()):
+            return line
+    for line in head:
+        if _SRL.search(line):
+            return line
+    for line in head:
+        letters = sum(ch.isalpha() for ch in line)
+        if letters >= 3 and letters >= len(line) / 2 and not _HEADER_NOISE.search(line):
+            return line
+    return None
+
+
+def _items(body: List[str]) -> List[dict]:
+    """
+    Item lines between the header and the total. A "qty x price [total]" line
+    belongs to the name line(s) just above it, even ones that first looked like
+    the previous item's name wrapping:
+
+    >>> _items(["PAINE 12,50", "LAPTE ZUZU", "1L", "2 BUC x 3,50 7,00"])[1]
+    {'name': 'LAPTE ZUZU', 'qty': 2.0, 'unit_price': 3.5, 'total': 7.0}
+    >>> _items(["PAINE 12,50", "SAPUN LICHID", "ANTIBACTERIAN", "3 x 10,00 30,00"])[1]["name"]
+    'SAPUN LICHID ANTIBACTERIAN'
+    >>> _items(["PAINE 12,50", "2 BUC x 3,50 7,00"])[1]
+    {'name': '', 'qty': 2.0, 'unit_price': 3.5, 'total': 7.0}
+    """
+    items: List[dict] = []
+    # (len(items), its last item's name before wrapping, lines wrapped onto it)
+    wrapped: Optional[Tuple[int, str, List[str]]] = None
+
+    def unwrap() -> List[str]:
+        # Name lines wrapped onto the previous item since it was read, taken back off it
+        nonlocal wrapped
+        if wrapped is None or wrapped[0] != len(items):
+            return []
+        items[-1]["name"] = wrapped[1]
+        lines, wrapped = wrapped[2], None
+        return lines
+
+    i = 0
+    while i < len(body):
+        line = body[i]
+
+        if _DISCOUNT.search(line):
+            m = _DISCOUNT_VALUE.search(line)
+            if m and items:
+                v = -abs(_num(m.group(1)))
+                last = items[-1]
+                last["discount"] = round(last.get("discount", 0.0) + v, 2)
+                last["total"] = round(last["total"] + v, 2)
+            i += 1
+            continue
+
+        # name ... price
+        a = _ITEM_PRICE.match(line)
+        if a and len(a.group(1).strip()) >= 2 and not _QTY_X_PRICE.search(line):
+            price = round(_num(a.group(2)), 2)
+            items.append({"name": a.group(1).strip(" ."), "qty": 1.0, "unit_price": price, "total": price})
+            i += 1
+            continue
+
+        # name  qty x price  [total]
+        q = _QTY_X_PRICE.search(line)
+        if q and len(line[:q.start()].strip()) >= 2:
+            qty, unit = _num(q.group(1)), _num(q.group(2))
+            t = _rightmost_price(line[q.end():]) if line[q.end():].strip() else None
+            items.append({"name": line[:q.start()].strip(" ."), "qty": qty, "unit_price": round(unit, 2),
+                          "total": t if t is not None else round(qty * unit, 2)})
+            i += 1
+            continue
+
+        # "qty x price [total]" alone: the name was on the line(s) above, which
+        # may have been taken for a wrapped continuation of the previous item
+        q = _QTY_LINE.match(line)
+        if q:
+            name = " ".join(unwrap())
+            qty, unit = _num(q.group(1)), _num(q.group(2))
+            items.append({"name": name, "qty": qty, "unit_price": round(unit, 2),
+                          "total": round(_num(q.group(3)), 2) if q.group(3) else round(qty * unit, 2)})
+            i += 1
+            continue
+
+        # name, then "qty x price" (and maybe the line total) on the next line(s)
+        nxt = body[i + 1] if i + 1 < len(body) else ""
+        b = _QTY_X_PRICE.search(nxt)
+        if b and len(line) > 2 and not PRICE_TRAIL.search(line):
+            qty, unit = _num(b.group(1)), _num(b.group(2))
+            total = round(qty * unit, 2)
+            trail = nxt[b.end():]
+            t = _rightmost_price(trail) if trail.strip() else None
+            if t is None and i + 2 < len(body) and len(body[i + 2]) < 12:
+                t = _rightmost_price(body[i + 2])
+                if t is not None:
+                    i += 1
+            items.append({"name": " ".join(unwrap() + [line.strip()]), "qty": qty, "unit_price": round(unit, 2),
+                          "total": t if t is not None else total})
+            i += 2
+            continue
+
+        # qty  name  price
+        c = _QTY_NAME_PRICE.match(line)
+        if c:
+            qty, unit = _num(c.group(1)), _num(c.group(3))
+            items.append({"name": c.group(2).strip(), "qty": qty, "unit_price": round(unit, 2),
+                          "total": round(qty * unit, 2)})
+            i += 1
+            continue
+
+        # name wrapping onto a second line
+        if items and len(line) > 3 and not PRICE_TRAIL.search(line) and len(items[-1]["name"]) < 40:
+            if wrapped is None or wrapped[0] != len(items):
+                wrapped = (len(items), items[-1]["name"], [])
+            wrapped[2].append(line)
+            items[-1]["name"] = f"{items[-1]['name']} {line}".strip()
+        i += 1
+
+    return [it for it in items if it["total"] > 0 or it.get("discount")]
+
+
+def extract_fields(lines: List[str]) -> dict:
+    """Structured fields from receipt text lines (top to bottom)."""
+    lines = [_fix_digits(" ".join(l.split())) for l in lines if l and l.strip()]
+    text = "\n".join(lines)
+    fields = {
+        "merchant": None, "date": None, "time": None, "currency": "MDL",
+        "items": [], "vat": None, "total": None, "total_source": None,
+    }
+    if not lines:
+        return fields
+
+    fields["merchant"] = _merchant(lines)
+    fields["date"], fields["time"] = _find_date(text)
+    fields["currency"] = next((code for code, rx in _CURRENCIES if rx.search(text)), "MDL")
+
+    # Totals: a SUMA/TOTAL line (price on it or on one of the next two lines)
+    total_idx = next((i for i, l in enumerate(lines) if _is_total_line(l)), None)
+    total = None
+    if total_idx is not None:
+        for j in range(total_idx, min(total_idx + 3, len(lines))):
+            total = _rightmost_price(lines[j])
+            if total is not None:
+                fields["total_source"] = "total_line"
+                break
+    if total is None:
+        # largest right-most price in the bottom third
+        bottom = [p for p in map(_rightmost_price, lines[int(len(lines) * 0.66):]) if p is not None]
+        if bottom:
+            total = max(bottom)
+            fields["total_source"] = "bottom_right"
+
+    vat_line = next((l for l in lines if _VAT.search(l)), None)
+    if vat_line is not None:
+        fields["vat"] = _rightmost_price(vat_line)
+
+    # Items sit between the header and the totals
+    start = next((i for i, l in enumerate(lines)
+                  if not _HEADER_NOISE.search(l) and not _is_total_line(l)
+                  and (PRICE_TRAIL.search(l) or _QTY_X_PRICE.search(lines[i + 1] if i + 1 < len(lines) else ""))), None)
+    end = total_idx if total_idx is not None else len(lines)
+    if start is not None and start < end:
+        body = [l for l in lines[start:end] if not _VAT.search(l) and not _DATE.search(l)]
+        fields["items"] = _items(body)
+
+    inferred = round(sum(it["total"] for it in fields["items"]), 2)
+    if total is None and inferred > 0:
+        total, fields["total_source"] = inferred, "items"
+    elif fields["total_source"] == "bottom_right" and inferred > 0 and abs(total - inferred) / max(inferred, 1.0) > 0.6:
+        # a guessed total far from the sum of the items is more likely a misread
+        total, fields["total_source"] = inferred, "items"
+    fields["total"] = total
+    return fields
@@ -0,0 +1,7 @@
+# Run from ocr-api/ with `python -m pytest tests`. These tests cover the pure-Python
+# modules (receipt_fields, ocr_cache) and need only numpy and opencv, not EasyOCR.
+import os
+import sys
+
+OCR_API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, OCR_API_DIR)
@@ -0,0 +1,118 @@
+import cv2
+import numpy as np
+import pytest
+
+import ocr_cache
+from ocr_cache import ResultCache, content_key, image_dhash
+
+
+def _receipt(fmt="ITEM %d  %d,50", seed=1, changed_price=None):
+    rng = np.random.default_rng(seed)
+    img = np.full((1200, 900, 3), 255, np.uint8)
+    for k in range(40):
+        price = rng.integers(10, 99)
+        if k == changed_price:
+            price = price + 1 if price % 10 < 9 else price - 1   # one digit differs
+        cv2.putText(img, fmt % (k, price), (60, 40 + k * 28), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    return img
+
+
+def _jpeg(img, quality=90):
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+@pytest.fixture(scope="module")
+def photos():
+    a = _receipt()
+    return {
+        "a": _jpeg(a),
+        "a_resized": _jpeg(cv2.resize(a, (720, 960)), 70),   # same photo re-shared
+        "a_edited": _jpeg(_receipt(changed_price=20)),       # same receipt but one price
+        "a_cropped": _jpeg(a[:900]),                         # other aspect ratio
+        "b": _jpeg(_receipt("PROD %d  %d,00", seed=2)),      # another receipt
+    }
+
+
+def test_exact_hits_and_variants():
+    cache = ResultCache()
+    key = ResultCache.key(content_key(b"raw"), "auto/standard")
+    assert cache.get(key) is None
+    cache.put(key, {"text": "A"})
+    body, age = cache.get(key)
+    assert body == {"text": "A"} and 0 <= age < 5
+    # Another strategy/preprocessing variant of the same bytes is a different entry
+    assert cache.get(ResultCache.key(content_key(b"raw"), "easyocr/fast")) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ocr_cache.time, "time", lambda: now[0])
+    cache = ResultCache(ttl=60)
+    cache.put("k:v", {"text": "A"})
+    now[0] += 59
+    assert cache.get("k:v") == ({"text": "A"}, 59.0)
+    now[0] += 2
+    assert cache.get("k:v") is None
+    assert ResultCache(ttl=0)._expired(0.0, 1e12) is False
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_size=3)
+    for k in "abc":
+        cache.put(f"{k}:v", {"text": k})
+    cache.get("a:v")                      # a is now the most recently used
+    cache.put("d:v", {"text": "d"})
+    assert cache.get("b:v") is None
+    assert [cache.get(f"{k}:v")[0]["text"] for k in "acd"] == ["a", "c", "d"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_near_hits_need_the_same_photo_variant_and_scope(photos):
+    cache = ResultCache(near_bits=24)
+    cache.put("a:v", {"text": "A"}, image_dhash(photos["a"]), scope="u1")
+
+    body, _, bits = cache.get_near(image_dhash(photos["a_resized"]), "v", "u1")
+    assert body == {"text": "A"} and bits <= 24
+    assert cache.get_near(image_dhash(photos["a_resized"]), "v", "u2") is None    # other user
+    assert cache.get_near(image_dhash(photos["a_resized"]), "v", None) is None    # anonymous
+    assert cache.get_near(image_dhash(photos["a_resized"]), "w", "u1") is None    # other variant
+    assert cache.get_near(image_dhash(photos["a_edited"]), "v", "u1") is None     # thumbnail differs
+    assert cache.get_near(image_dhash(photos["a_cropped"]), "v", "u1") is None    # aspect differs
+    assert cache.get_near(image_dhash(photos["b"]), "v", "u1") is None
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_near_hits_are_off_by_default(photos):
+    cache = ResultCache()
+    cache.put("a:v", {"text": "A"}, image_dhash(photos["a"]), scope="u1")
+    assert cache.get_near(image_dhash(photos["a_resized"]), "v", "u1") is None
+
+
+def test_same_picture(photos):
+    a = _receipt()
+    thumb = image_dhash(photos["a"])[2]
+    for width, quality in [(1800, 85), (900, 30), (720, 70), (600, 40)]:
+        resized = cv2.resize(a, (width, width * 4 // 3), interpolation=cv2.INTER_AREA)
+        assert ocr_cache.same_picture(thumb, image_dhash(_jpeg(resized, quality))[2]), (width, quality)
+    assert not ocr_cache.same_picture(thumb, image_dhash(photos["a_edited"])[2])
+    assert not ocr_cache.same_picture(thumb, image_dhash(photos["b"])[2])
+    assert image_dhash(b"not an image") is None
+
+
+def test_save_and_load(tmp_path, photos):
+    path = str(tmp_path / "cache.json")
+    cache = ResultCache(max_size=2, near_bits=24, path=path)
+    for k in "abc":
+        cache.put(f"{k}:v", {"text": k}, image_dhash(photos["a"]), scope="u1")
+    cache.save()
+
+    restored = ResultCache(near_bits=24, path=path)
+    assert restored.load() == 2
+    assert restored.get("a:v") is None and restored.get("c:v")[0] == {"text": "c"}
+    # Thumbnails are not saved, so restored entries only match exactly
+    assert restored.get_near(image_dhash(photos["a_resized"]), "v", "u1") is None
+
+    (tmp_path / "cache.json").write_text("{broken")
+    assert ResultCache(path=path).load() == 0
+    assert ResultCache().load() == 0
@@ -0,0 +1,115 @@
+import doctest
+import random
+
+import pytest
+
+import receipt_fields
+import reference
+from receipt_fields import extract_fields, group_lines
+
+
+def _box(x, y, w, h):
+    """EasyOCR-style corner list of an axis-aligned box."""
+    return [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+
+
+def _page(rows, height=16, pitch=40, seed=0):
+    """EasyOCR results for rows of words, shuffled, in both result shapes."""
+    rng = random.Random(seed)
+    results = []
+    for r, words in enumerate(rows):
+        x = 20
+        for word in words:
+            w = 12 * len(word)
+            box = _box(x + rng.uniform(-2, 2), r * pitch + 2 + rng.uniform(-2, 2), w, height)
+            results.append({"box": box, "text": word} if rng.random() < 0.5 else (box, word, 0.9))
+            x += w + rng.randint(8, 30)
+    rng.shuffle(results)
+    return results
+
+
+ROWS = [["KAUFLAND"], ["PAINE", "ALBA", "12,50"], ["LAPTE", "2", "x", "15,90", "31,80"], ["SUMA", "44,30"]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_well_separated_lines_match_the_baseline(seed):
+    results = _page(ROWS, seed=seed)
+    assert group_lines(results) == reference.group_lines(results) == [" ".join(r) for r in ROWS]
+
+
+def test_line_across_a_bucket_edge_stays_together():
+    # Centres 18 and 22 px: one line, but on both sides of the baseline's 20 px bucket edge
+    results = [(_box(10, 10, 60, 16), "PAINE"), (_box(90, 14, 40, 16), "12,50"), (_box(10, 50, 60, 16), "SUMA")]
+    assert group_lines(results) == ["PAINE 12,50", "SUMA"]
+    assert reference.group_lines(results) == ["PAINE", "12,50", "SUMA"]
+
+
+def test_tilted_and_tall_lines():
+    tilted = [(_box(10 + 100 * i, 30 + 3 * i, 90, 20), f"w{i}") for i in range(5)]   # drifts 12 px
+    assert group_lines(tilted) == ["w0 w1 w2 w3 w4"]
+    tall = _page([["TOTAL", "99,00"], ["MULTUMIM"]], height=60, pitch=90)
+    assert group_lines(tall) == ["TOTAL 99,00", "MULTUMIM"]
+
+
+def test_blank_and_malformed_results_are_skipped():
+    results = [(_box(10, 10, 50, 16), "  "), ({"box": _box(10, 10, 50, 16), "text": ""}), "junk",
+               (_box(10, 50, 50, 16), "SUMA")]
+    assert group_lines(results) == ["SUMA"] == reference.group_lines(results)
+    assert group_lines([]) == []
+
+
+def test_doctests():
+    assert doctest.testmod(receipt_fields).failed == 0
+
+
+RECEIPT = [
+    "S.C. KAUFLAND MOLDOVA S.R.L.",
+    "COD FISCAL 1003600012345",
+    "BON FISCAL",
+    "PAINE ALBA 12,50",
+    "LAPTE ZUZU 2,5%",
+    "2 BUC x 15,9O 31,80",       # O read for 0
+    "SAPUN LICHID",
+    "ANTIBACTERIAN",
+    "3 x 10,00 30,00",
+    "REDUCERE -5,00",
+    "CAFEA JACOBS .... 89,90",
+    "TVA 20% 27,37",
+    "SUMA TOTALA 159,20 MDL",
+    "12.03.2024 14:35:07",
+]
+
+
+def test_extract_fields():
+    fields = extract_fields(RECEIPT)
+    assert fields["merchant"] == "S.C. KAUFLAND MOLDOVA S.R.L."
+    assert (fields["date"], fields["time"], fields["currency"]) == ("2024-03-12", "14:35", "MDL")
+    assert (fields["total"], fields["total_source"], fields["vat"]) == (159.2, "total_line", 27.37)
+    assert fields["items"] == [
+        {"name": "PAINE ALBA", "qty": 1.0, "unit_price": 12.5, "total": 12.5},
+        {"name": "LAPTE ZUZU 2,5%", "qty": 2.0, "unit_price": 15.9, "total": 31.8},
+        {"name": "SAPUN LICHID ANTIBACTERIAN", "qty": 3.0, "unit_price": 10.0, "total": 25.0, "discount": -5.0},
+        {"name": "CAFEA JACOBS", "qty": 1.0, "unit_price": 89.9, "total": 89.9},
+    ]
+    assert round(sum(it["total"] for it in fields["items"]), 2) == fields["total"]
+
+
+def test_extract_fields_from_grouped_boxes():
+    rows = [line.split() for line in RECEIPT]
+    assert extract_fields(group_lines(_page(rows, seed=3))) == extract_fields(RECEIPT)
+
+
+def test_total_without_a_total_line():
+    lines = ["Magazin Alimentar", "Paine 10,00", "Lapte 20,00", "Oua 30,00", "card", "60,00"]
+    fields = extract_fields(lines)
+    assert (fields["total"], fields["total_source"]) == (60.0, "bottom_right")
+    # Without any price in the bottom third the items are summed
+    fields = extract_fields(["Magazin Alimentar", "Paine 10,00", "Lapte 20,00", "multumim", "la revedere", "pa"])
+    assert (fields["total"], fields["total_source"]) == (30.0, "items")
+
+
+def test_empty_input():
+    assert extract_fields([]) == extract_fields(["  ", ""]) == {
+        "merchant": None, "date": None, "time": None, "currency": "MDL",
+        "items": [], "vat": None, "total": None, "total_source": None,
+    }